@@ -11,6 +11,15 @@ LINES_DELETED = 'lines_deleted'
 # table recognition max time default value
 TABLE_MAX_TIME_VALUE = 400
 
+# page image cache default byte budget
+PAGE_IMAGE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# pages rasterized and inferred at once in batch doc_analyze
+DOC_ANALYZE_WINDOW_SIZE = 64
+
+# pages following a page when its paragraphs are split in streaming mode
+PARA_SPLIT_LOOKAHEAD = 2
+
 # pp_table_result_max_length
 TABLE_MAX_LEN = 480
 
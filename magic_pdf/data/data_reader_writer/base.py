@@ -41,6 +41,18 @@ class DataWriter(ABC):
         """
         pass
 
+    def exists(self, path: str) -> bool:
+        """Check whether the file was written, the writers which can not tell
+        always return False.
+
+        Args:
+            path (str): the target file
+
+        Returns:
+            bool: True if the file exists
+        """
+        return False
+
     def write_string(self, path: str, data: str) -> None:
         """Write the data to file, the data will be encoded to bytes.
 
@@ -51,12 +51,27 @@ class FileBasedDataWriter(DataWriter):
             path (str): the path of file, if the path is relative path, it will be joined with parent_dir.
             data (bytes): the data want to write
         """
-        fn_path = path
-        if not os.path.isabs(fn_path) and len(self._parent_dir) > 0:
-            fn_path = os.path.join(self._parent_dir, path)
+        fn_path = self.__get_fn_path(path)
 
         if not os.path.exists(os.path.dirname(fn_path)) and os.path.dirname(fn_path) != "":
             os.makedirs(os.path.dirname(fn_path), exist_ok=True)
 
         with open(fn_path, 'wb') as f:
             f.write(data)
+
+    def exists(self, path: str) -> bool:
+        """Check whether the file exists.
+
+        Args:
+            path (str): the path of file, if the path is relative path, it will be joined with parent_dir.
+
+        Returns:
+            bool: True if the file exists
+        """
+        return os.path.exists(self.__get_fn_path(path))
+
+    def __get_fn_path(self, path: str) -> str:
+        fn_path = path
+        if not os.path.isabs(fn_path) and len(self._parent_dir) > 0:
+            fn_path = os.path.join(self._parent_dir, path)
+        return fn_path
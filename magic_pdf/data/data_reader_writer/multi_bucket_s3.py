@@ -127,6 +127,16 @@ class MultiBucketS3DataWriter(DataWriter, MultiS3Mixin):
             )
         return self._s3_clients_h[bucket_name]
 
+    def __get_s3_writer_and_key(self, path: str):
+        if path.startswith('s3://'):
+            bucket_name, path = parse_s3path(path)
+            s3_writer = self.__get_s3_client(bucket_name)
+        else:
+            s3_writer = self.__get_s3_client(self.default_bucket)
+            if self.default_prefix:
+                path = self.default_prefix + '/' + path
+        return s3_writer, path
+
     def write(self, path: str, data: bytes) -> None:
         """Write file with data, also select diffect bucket client for each
         request based on the bucket.
@@ -135,11 +145,18 @@ class MultiBucketS3DataWriter(DataWriter, MultiS3Mixin):
             path (str): the path of file, if the path is relative path, it will be joined with parent_dir.
             data (bytes): the data want to write.
         """
-        if path.startswith('s3://'):
-            bucket_name, path = parse_s3path(path)
-            s3_writer = self.__get_s3_client(bucket_name)
-        else:
-            s3_writer = self.__get_s3_client(self.default_bucket)
-            if self.default_prefix:
-                path = self.default_prefix + '/' + path
+        s3_writer, path = self.__get_s3_writer_and_key(path)
         return s3_writer.write(path, data)
+
+    def exists(self, path: str) -> bool:
+        """Check whether the file exists, also select diffect bucket client
+        for each request based on the bucket.
+
+        Args:
+            path (str): the path of file, if the path is relative path, it will be joined with parent_dir.
+
+        Returns:
+            bool: True if the file exists
+        """
+        s3_writer, path = self.__get_s3_writer_and_key(path)
+        return s3_writer.exists(path)
@@ -1,3 +1,5 @@
+import copy
+import mmap
 import os
 from abc import ABC, abstractmethod
 from typing import Callable, Iterator
@@ -7,8 +9,10 @@ from loguru import logger
 
 from magic_pdf.config.enums import SupportedPdfParseMethod
 from magic_pdf.data.schemas import PageInfo
-from magic_pdf.data.utils import fitz_doc_to_image
+from magic_pdf.data.image_cache import PageImageCache
+from magic_pdf.data.utils import fitz_doc_to_image, fitz_doc_to_image_size
 from magic_pdf.filter import classify
+from magic_pdf.libs.hash_utils import compute_md5
 
 
 class PageableData(ABC):
@@ -17,6 +21,16 @@ class PageableData(ABC):
         """Transform data to image."""
         pass
 
+    @abstractmethod
+    def get_image_size(self) -> tuple[int, int]:
+        """Get the size of the image which `get_image` returns, without
+        rasterizing the page.
+
+        Returns:
+            tuple[int, int]: (width, height)
+        """
+        pass
+
     @abstractmethod
     def get_doc(self) -> fitz.Page:
         """Get the pymudoc page."""
@@ -83,6 +97,10 @@ class Dataset(ABC):
         """The bits used to create this dataset."""
         pass
 
+    def data_md5(self) -> str:
+        """The md5 identifying the bits of this dataset."""
+        return compute_md5(self.data_bits())
+
     @abstractmethod
     def get_page(self, page_id: int) -> PageableData:
         """Get the page indexed by page_id.
@@ -95,6 +113,16 @@ class Dataset(ABC):
         """
         pass
 
+    @abstractmethod
+    def get_page_infos(self) -> list[PageInfo]:
+        """The geometry index of all pages, computed once from the page rect,
+        rotation and mediabox without rasterization.
+
+        Returns:
+            list[PageInfo]: the page info of each page
+        """
+        pass
+
     @abstractmethod
     def dump_to_file(self, file_path: str):
         """Dump the file
@@ -134,33 +162,76 @@ class Dataset(ABC):
 
 
 class PymuDocDataset(Dataset):
-    def __init__(self, bits: bytes, lang=None):
-        """Initialize the dataset, which wraps the pymudoc documents.
+    def __init__(self, bits: bytes, lang=None, image_cache_bytes: int | None = None):
+        """Initialize the dataset, which wraps the pymudoc documents. The
+        pages are wrapped lazily when they are first accessed.
 
         Args:
             bits (bytes): the bytes of the pdf
+            lang (str, optional): the language of the pdf, 'auto' means detect it. Defaults to None.
+            image_cache_bytes (int | None, optional): byte budget of the rendered page image cache, 0 disables it.
+                Defaults to None, which means use the env `MINERU_PAGE_IMAGE_CACHE_BYTES` or 512MB
         """
-        self._raw_fitz = fitz.open('pdf', bits)
-        self._records = [Doc(v) for v in self._raw_fitz]
-        self._data_bits = bits
-        self._raw_data = bits
+        self._init(fitz.open('pdf', bits), bits, None, lang, image_cache_bytes)
+
+    @classmethod
+    def from_file(cls, path: str, lang=None, image_cache_bytes: int | None = None):
+        """Initialize the dataset from the pdf file. The pymudoc document reads
+        the file on demand and the file is memory mapped for hashing, so the
+        pdf is loaded into memory as a whole only when `data_bits` is called.
+        Close the dataset with `close` or use it as a context manager to unmap
+        the file.
+
+        Args:
+            path (str): the path of the pdf file
+            lang (str, optional): the language of the pdf, 'auto' means detect it. Defaults to None.
+            image_cache_bytes (int | None, optional): byte budget of the rendered page image cache, 0 disables it.
+                Defaults to None, which means use the env `MINERU_PAGE_IMAGE_CACHE_BYTES` or 512MB
+
+        Returns:
+            PymuDocDataset: the file backed dataset
+        """
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # mmap不能映射空文件，和bytes一样由pymupdf报错
+                return cls(f.read(), lang=lang, image_cache_bytes=image_cache_bytes)
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        dataset = cls.__new__(cls)
+        dataset._init(fitz.open(path, filetype='pdf'), mapped, str(path), lang, image_cache_bytes)
+        dataset._mapped = mapped
+        return dataset
+
+    def _init(self, raw_fitz, raw_data, path, lang, image_cache_bytes):
+        self._raw_fitz = raw_fitz
+        self._image_cache = PageImageCache(image_cache_bytes)
+        self._page_ids = range(self._raw_fitz.page_count)
+        self._records = {}
+        self._page_infos = None
+        self._path = path
+        self._raw_data = raw_data
+        # 文件映射的数据集在第一次调用data_bits时读取文件
+        self._data_bits = raw_data if path is None else None
+        self._data_md5 = None
+        # the mapping is owned by the dataset created by from_file, the pymudoc document by every non view dataset
+        self._mapped = None
+        self._owns_fitz = True
 
         if lang == '':
             self._lang = None
         elif lang == 'auto':
             from magic_pdf.model.sub_modules.language_detection.utils import auto_detect_lang
-            self._lang = auto_detect_lang(bits)
+            self._lang = auto_detect_lang(self._raw_data)
             logger.info(f"lang: {lang}, detect_lang: {self._lang}")
         else:
             self._lang = lang
             logger.info(f"lang: {lang}")
     def __len__(self) -> int:
         """The page number of the pdf."""
-        return len(self._records)
+        return len(self._page_ids)
 
     def __iter__(self) -> Iterator[PageableData]:
         """Yield the page doc object."""
-        return iter(self._records)
+        return (self.get_page(page_id) for page_id in range(len(self)))
 
     def supported_methods(self) -> list[SupportedPdfParseMethod]:
         """The method supported by this dataset.
@@ -171,9 +242,54 @@ class PymuDocDataset(Dataset):
         return [SupportedPdfParseMethod.OCR, SupportedPdfParseMethod.TXT]
 
     def data_bits(self) -> bytes:
-        """The pdf bits used to create this dataset."""
+        """The pdf bits used to create this dataset, a file backed dataset
+        reads the file on the first call. For a page range view, the selected
+        pages are serialized on the first call."""
+        if self._data_bits is None:
+            if self._is_full():
+                self._data_bits = self._raw_data[:]
+            else:
+                # serialize from the original pdf, the drawings on the pages are excluded
+                with self._open_raw() as src:
+                    dst = fitz.open()
+                    dst.insert_pdf(src, from_page=self._page_ids[0], to_page=self._page_ids[-1])
+                    self._data_bits = dst.tobytes()
         return self._data_bits
 
+    def data_md5(self) -> str:
+        """The md5 of the pdf bits, hashed from the mapping for file backed
+        datasets. The serialized bits of a page range view differ from run to
+        run, so the md5 of a view combines the md5 of the source pdf with the
+        selected pages.
+
+        Returns:
+            str: the md5, the same for the same pdf and pages across runs
+        """
+        if self._data_md5 is None:
+            source_md5 = compute_md5(self._raw_data)
+            if self._is_full():
+                self._data_md5 = source_md5
+            else:
+                pages = f'{self._page_ids[0]}-{self._page_ids[-1]}'
+                self._data_md5 = compute_md5(f'{source_md5}:{pages}'.encode('utf-8'))
+        return self._data_md5
+
+    def close(self):
+        """Close the pymudoc document and unmap the file of this dataset. The
+        page range views share both with the dataset they are selected from,
+        the clones own their document and mapping."""
+        if self._owns_fitz:
+            self._raw_fitz.close()
+        if self._mapped is not None:
+            self._mapped.close()
+            self._mapped = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def get_page(self, page_id: int) -> PageableData:
         """The page doc object.
 
@@ -183,7 +299,54 @@ class PymuDocDataset(Dataset):
         Returns:
             PageableData: the page doc object
         """
-        return self._records[page_id]
+        page_no = self._page_ids[page_id]
+        record = self._records.get(page_no)
+        if record is None:
+            record = Doc(self._raw_fitz[page_no], self._image_cache)
+            self._records[page_no] = record
+        return record
+
+    def get_page_infos(self) -> list[PageInfo]:
+        """The geometry index of all pages, computed once from the page rect,
+        rotation and mediabox without rasterization.
+
+        Returns:
+            list[PageInfo]: the page info of each page
+        """
+        if self._page_infos is None:
+            self._page_infos = [page.get_page_info() for page in self]
+        return self._page_infos
+
+    def select_pages(self, start_page_id=0, end_page_id=None):
+        """Select a page range view of this dataset. The view shares the
+        pymudoc document, the pdf bytes and the page image cache with this
+        dataset, so nothing is copied or parsed again.
+
+        Args:
+            start_page_id (int, optional): the first page of the view. Defaults to 0.
+            end_page_id (int, optional): the last page of the view. Defaults to None, which means the last page.
+
+        Returns:
+            PymuDocDataset: the page range view
+        """
+        end_page_id = (
+            end_page_id
+            if end_page_id is not None and end_page_id >= 0
+            else len(self) - 1
+        )
+        if end_page_id > len(self) - 1:
+            logger.warning('end_page_id is out of range, use pdf_docs length')
+            end_page_id = len(self) - 1
+
+        view = copy.copy(self)
+        view._page_ids = self._page_ids[start_page_id: end_page_id + 1]
+        view._page_infos = None
+        view._mapped = None
+        view._owns_fitz = False
+        if not view._is_full():
+            view._data_bits = None
+            view._data_md5 = None
+        return view
 
     def dump_to_file(self, file_path: str):
         """Dump the file
@@ -195,7 +358,12 @@ class PymuDocDataset(Dataset):
         dir_name = os.path.dirname(file_path)
         if dir_name not in ('', '.', '..'):
             os.makedirs(dir_name, exist_ok=True)
-        self._raw_fitz.save(file_path)
+        if len(self._page_ids) == self._raw_fitz.page_count:
+            self._raw_fitz.save(file_path)
+        else:
+            with fitz.open() as dst:
+                dst.insert_pdf(self._raw_fitz, from_page=self._page_ids[0], to_page=self._page_ids[-1])
+                dst.save(file_path)
 
     def apply(self, proc: Callable, *args, **kwargs):
         """Apply callable method which.
@@ -217,24 +385,50 @@ class PymuDocDataset(Dataset):
         Returns:
             SupportedPdfParseMethod: _description_
         """
-        return classify(self._data_bits)
+        return classify(self.data_bits())
 
     def clone(self):
-        """clone this dataset
+        """clone this dataset, the clone owns a new pymudoc document, which
+        is parsed lazily, and maps the file again for file backed datasets,
+        so it stays usable after this dataset is closed.
         """
-        return PymuDocDataset(self._raw_data)
+        dataset = PymuDocDataset.__new__(PymuDocDataset)
+        raw_data = self._raw_data
+        if self._path is not None:
+            with open(self._path, 'rb') as f:
+                raw_data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        dataset._init(self._open_raw(), raw_data, self._path, None, self._image_cache.max_bytes)
+        if self._path is not None:
+            dataset._mapped = raw_data
+        dataset._lang = self._lang
+        dataset._page_ids = self._page_ids
+        dataset._data_bits = self._data_bits
+        dataset._data_md5 = self._data_md5
+        return dataset
+
+    def _is_full(self) -> bool:
+        return len(self._page_ids) == self._raw_fitz.page_count
+
+    def _open_raw(self) -> fitz.Document:
+        if self._path is not None:
+            return fitz.open(self._path, filetype='pdf')
+        return fitz.open('pdf', self._raw_data)
 
 
 class ImageDataset(Dataset):
-    def __init__(self, bits: bytes):
+    def __init__(self, bits: bytes, image_cache_bytes: int | None = None):
         """Initialize the dataset, which wraps the pymudoc documents.
 
         Args:
             bits (bytes): the bytes of the photo which will be converted to pdf first. then converted to pymudoc.
+            image_cache_bytes (int | None, optional): byte budget of the rendered page image cache, 0 disables it.
+                Defaults to None, which means use the env `MINERU_PAGE_IMAGE_CACHE_BYTES` or 512MB
         """
         pdf_bytes = fitz.open(stream=bits).convert_to_pdf()
         self._raw_fitz = fitz.open('pdf', pdf_bytes)
-        self._records = [Doc(v) for v in self._raw_fitz]
+        self._image_cache = PageImageCache(image_cache_bytes)
+        self._records = [Doc(v, self._image_cache) for v in self._raw_fitz]
+        self._page_infos = None
         self._raw_data = bits
         self._data_bits = pdf_bytes
 
@@ -269,6 +463,17 @@ class ImageDataset(Dataset):
         """
         return self._records[page_id]
 
+    def get_page_infos(self) -> list[PageInfo]:
+        """The geometry index of all pages, computed once from the page rect,
+        rotation and mediabox without rasterization.
+
+        Returns:
+            list[PageInfo]: the page info of each page
+        """
+        if self._page_infos is None:
+            self._page_infos = [record.get_page_info() for record in self._records]
+        return self._page_infos
+
     def dump_to_file(self, file_path: str):
         """Dump the file
 
@@ -303,16 +508,19 @@ class ImageDataset(Dataset):
     def clone(self):
         """clone this dataset
         """
-        return ImageDataset(self._raw_data)
+        return ImageDataset(self._raw_data, image_cache_bytes=self._image_cache.max_bytes)
 
 class Doc(PageableData):
     """Initialized with pymudoc object."""
 
-    def __init__(self, doc: fitz.Page):
+    def __init__(self, doc: fitz.Page, image_cache: PageImageCache | None = None):
         self._doc = doc
+        self._image_cache = image_cache
 
     def get_image(self):
-        """Return the image info.
+        """Return the image info. The rendered image is kept in the image cache
+        of the dataset, the caller should not modify the returned ndarray in
+        place.
 
         Returns:
             dict: {
@@ -321,7 +529,22 @@ class Doc(PageableData):
                 height: int
             }
         """
-        return fitz_doc_to_image(self._doc)
+        if self._image_cache is None:
+            return fitz_doc_to_image(self._doc)
+        img_dict = self._image_cache.get(self._doc.number)
+        if img_dict is None:
+            img_dict = fitz_doc_to_image(self._doc)
+            self._image_cache.put(self._doc.number, img_dict)
+        return img_dict
+
+    def get_image_size(self) -> tuple[int, int]:
+        """Get the size of the image which `get_image` returns, without
+        rasterizing the page.
+
+        Returns:
+            tuple[int, int]: (width, height)
+        """
+        return fitz_doc_to_image_size(self._doc)
 
     def get_doc(self) -> fitz.Page:
         """Get the pymudoc object.
@@ -339,7 +562,12 @@ class Doc(PageableData):
         """
         page_w = self._doc.rect.width
         page_h = self._doc.rect.height
-        return PageInfo(w=page_w, h=page_h)
+        return PageInfo(
+            w=page_w,
+            h=page_h,
+            rotation=self._doc.rotation,
+            mediabox=list(self._doc.mediabox),
+        )
 
     def __getattr__(self, name):
         if hasattr(self._doc, name):
@@ -356,6 +584,7 @@ class Doc(PageableData):
             width (float): the width of board
             overlay (bool): fill the color in foreground or background. True means fill in background.
         """
+        self._invalidate_image()
         self._doc.draw_rect(
             rect_coords,
             color=color,
@@ -374,4 +603,9 @@ class Doc(PageableData):
             fontsize (int): font size of the text
             color (list[float] | None):  three element tuple which describe the RGB of the board line, None will use the default font color!
         """
+        self._invalidate_image()
         self._doc.insert_text(coord, content, fontsize=fontsize, color=color)
+
+    def _invalidate_image(self):
+        if self._image_cache is not None:
+            self._image_cache.invalidate(self._doc.number)
@@ -0,0 +1,95 @@
+import os
+import threading
+from collections import OrderedDict
+
+from magic_pdf.config.constants import PAGE_IMAGE_CACHE_MAX_BYTES
+
+
+def get_page_image_cache_max_bytes() -> int:
+    """The default byte budget of the page image cache, can be overridden by
+    the env `MINERU_PAGE_IMAGE_CACHE_BYTES`."""
+    return int(os.getenv('MINERU_PAGE_IMAGE_CACHE_BYTES', PAGE_IMAGE_CACHE_MAX_BYTES))
+
+
+class PageImageCache:
+    def __init__(self, max_bytes: int | None = None):
+        """LRU cache of rendered page images, bounded by the total bytes of the
+        cached ndarrays.
+
+        Args:
+            max_bytes (int | None, optional): the byte budget of the cache, 0 disables the cache.
+                Defaults to None, which means use `get_page_image_cache_max_bytes()`
+        """
+        self._max_bytes = get_page_image_cache_max_bytes() if max_bytes is None else max_bytes
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @property
+    def nbytes(self) -> int:
+        """The bytes of all cached images."""
+        return self._nbytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def get(self, key) -> dict | None:
+        """Get the cached image dict and mark it as the most recently used.
+
+        Args:
+            key (Hashable): the cache key
+
+        Returns:
+            dict | None: {'img': numpy array, 'width': width, 'height': height }, None if not cached
+        """
+        with self._lock:
+            img_dict = self._entries.get(key)
+            if img_dict is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return img_dict
+
+    def put(self, key, img_dict: dict):
+        """Cache the image dict, evict the least recently used images until
+        the cache fits the byte budget. Images larger than the whole budget
+        are not cached.
+
+        Args:
+            key (Hashable): the cache key
+            img_dict (dict): {'img': numpy array, 'width': width, 'height': height }
+        """
+        nbytes = img_dict['img'].nbytes
+        if nbytes > self._max_bytes:
+            return
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = img_dict
+            self._nbytes += nbytes
+            while self._nbytes > self._max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def invalidate(self, key):
+        """Drop the cached image of key if any."""
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    def _pop(self, key):
+        img_dict = self._entries.pop(key, None)
+        if img_dict is not None:
+            self._nbytes -= img_dict['img'].nbytes
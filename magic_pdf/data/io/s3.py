@@ -1,5 +1,6 @@
 import boto3
 from botocore.config import Config
+from botocore.exceptions import ClientError
 
 from magic_pdf.data.io.base import IOReader, IOWriter
 
@@ -112,3 +113,20 @@ class S3Writer(IOWriter):
             data (bytes): the data want to write
         """
         self._s3_client.put_object(Bucket=self._bucket, Key=key, Body=data)
+
+    def exists(self, key: str) -> bool:
+        """Check whether the file exists.
+
+        Args:
+            key (str): the path of file
+
+        Returns:
+            bool: True if the file exists
+        """
+        try:
+            self._s3_client.head_object(Bucket=self._bucket, Key=key)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+        return True
@@ -0,0 +1,119 @@
+import fitz
+import numpy as np
+
+from magic_pdf.data.dataset import PageableData
+from magic_pdf.data.utils import _get_render_matrix, fitz_pixmap_to_ndarray
+
+
+class ImagePyramid:
+    def __init__(self, img: np.ndarray):
+        """Serve the inputs of every model stage from one rendered page image.
+
+        Args:
+            img (np.ndarray): the RGB page image
+        """
+        self._img = img
+        self.height, self.width = img.shape[:2]
+
+    def get_image(self) -> np.ndarray:
+        """The full resolution page image."""
+        return self._img
+
+    def get_level(self, max_side: int) -> tuple[np.ndarray, float]:
+        """The page image for a stage which resizes its input so that the
+        longest side is max_side.
+
+        Args:
+            max_side (int): the longest side the stage consumes
+
+        Returns:
+            tuple[np.ndarray, float]: the image and its scale relative to the full resolution image
+        """
+        return self._img, 1.0
+
+    def crop(self, bbox) -> np.ndarray:
+        """Crop the region of the full resolution image, the area out of the
+        image is filled with black like `PIL.Image.crop`.
+
+        Args:
+            bbox (list[int]): [x0, y0, x1, y1] in the full resolution image
+
+        Returns:
+            np.ndarray: the RGB crop of shape (y1 - y0, x1 - x0, 3)
+        """
+        x0, y0, x1, y1 = [int(v) for v in bbox]
+        crop = self._img[max(y0, 0): max(y1, 0), max(x0, 0): max(x1, 0)]
+        if crop.shape[:2] == (y1 - y0, x1 - x0):
+            return crop
+        padded = np.zeros((max(y1 - y0, 0), max(x1 - x0, 0), 3), dtype=np.uint8)
+        padded[max(-y0, 0): max(-y0, 0) + crop.shape[0], max(-x0, 0): max(-x0, 0) + crop.shape[1]] = crop
+        return padded
+
+
+class PagePyramid(ImagePyramid):
+    def __init__(self, page: PageableData):
+        """Render the page directly at the resolution each stage consumes,
+        the full resolution image is rendered only when `get_image` is called,
+        `crop` renders just the requested region.
+
+        Args:
+            page (PageableData): the page, its `get_image` defines the full resolution image
+        """
+        self._page = page
+        self._doc = page.get_doc()
+        self._matrix = _get_render_matrix(self._doc)
+        self._levels = {}
+        self.width, self.height = page.get_image_size()
+
+    def get_image(self) -> np.ndarray:
+        """The full resolution page image."""
+        return self._page.get_image()['img']
+
+    def get_level(self, max_side: int) -> tuple[np.ndarray, float]:
+        """Render the page so that the longest side is max_side, the page is
+        never rendered above the full resolution. The render is close to but
+        not the same as a resize of the full resolution image, so the boxes
+        detected on it can differ slightly from the ones detected without the
+        pyramid, see scripts/check_page_pyramid_parity.py.
+
+        Args:
+            max_side (int): the longest side the stage consumes
+
+        Returns:
+            tuple[np.ndarray, float]: the image and its scale relative to the full resolution image
+        """
+        if max_side >= max(self.width, self.height):
+            return self.get_image(), 1.0
+        if max_side not in self._levels:
+            scale = max_side / max(self.width, self.height)
+            pm = self._doc.get_pixmap(matrix=self._matrix * fitz.Matrix(scale, scale), alpha=False)
+            self._levels[max_side] = (fitz_pixmap_to_ndarray(pm), pm.width / self.width)
+        return self._levels[max_side]
+
+    def crop(self, bbox) -> np.ndarray:
+        """Render the region of the full resolution image, the area out of
+        the page is filled with black like `PIL.Image.crop`.
+
+        Args:
+            bbox (list[int]): [x0, y0, x1, y1] in the full resolution image
+
+        Returns:
+            np.ndarray: the RGB crop of shape (y1 - y0, x1 - x0, 3)
+        """
+        x0, y0, x1, y1 = [int(v) for v in bbox]
+        if self._doc.rotation != 0:
+            # the clip of the pixmap is in the unrotated page space, crop the full resolution image
+            return ImagePyramid(self.get_image()).crop(bbox)
+        cx0, cy0 = min(max(x0, 0), self.width), min(max(y0, 0), self.height)
+        cx1, cy1 = min(max(x1, cx0), self.width), min(max(y1, cy0), self.height)
+        if cx1 - cx0 <= 0 or cy1 - cy0 <= 0:
+            return np.zeros((max(y1 - y0, 0), max(x1 - x0, 0), 3), dtype=np.uint8)
+        zoom_x, zoom_y = self._matrix.a, self._matrix.d
+        clip = fitz.Rect(cx0 / zoom_x, cy0 / zoom_y, cx1 / zoom_x, cy1 / zoom_y)
+        pm = self._doc.get_pixmap(matrix=self._matrix, clip=clip, alpha=False)
+        crop = fitz_pixmap_to_ndarray(pm)[: cy1 - cy0, : cx1 - cx0]
+        if (cx0, cy0, cx1, cy1) == (x0, y0, x1, y1) and crop.shape[:2] == (y1 - y0, x1 - x0):
+            return crop
+        padded = np.zeros((max(y1 - y0, 0), max(x1 - x0, 0), 3), dtype=np.uint8)
+        padded[cy0 - y0: cy0 - y0 + crop.shape[0], cx0 - x0: cx0 - x0 + crop.shape[1]] = crop
+        return padded
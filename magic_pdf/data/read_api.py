@@ -57,21 +57,19 @@ def read_local_pdfs(path: str) -> list[PymuDocDataset]:
         path (str): pdf file path or directory that contains pdf files
 
     Returns:
-        list[PymuDocDataset]: each pdf file will converted to a PymuDocDataset
+        list[PymuDocDataset]: each pdf file will converted to a file backed PymuDocDataset, close them when they are
+            no longer used to unmap the files
     """
     if os.path.isdir(path):
-        reader = FileBasedDataReader()
         ret = []
         for root, _, files in os.walk(path):
             for file in files:
                 suffix = file.split('.')
                 if suffix[-1] == 'pdf':
-                    ret.append( PymuDocDataset(reader.read(os.path.join(root, file))))
+                    ret.append(PymuDocDataset.from_file(os.path.join(root, file)))
         return ret
     else:
-        reader = FileBasedDataReader()
-        bits = reader.read(path)
-        return [PymuDocDataset(bits)]
+        return [PymuDocDataset.from_file(path)]
 
 def read_local_office(path: str) -> list[PymuDocDataset]:
     """Read ms-office file (ppt, pptx, doc, docx) from path or directory.
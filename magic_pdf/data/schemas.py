@@ -13,7 +13,9 @@ class S3Config(BaseModel):
 
 
 class PageInfo(BaseModel):
-    """The width and height of page
+    """The geometry of page
     """
     w: float = Field(description='the width of page')
     h: float = Field(description='the height of page')
+    rotation: int = Field(description='the rotation of page, in degrees', default=0)
+    mediabox: list[float] | None = Field(description='the mediabox of page, [x0, y0, x1, y1]', default=None)
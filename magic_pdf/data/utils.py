@@ -1,4 +1,10 @@
 
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+
 import fitz
 import numpy as np
 from loguru import logger
@@ -6,6 +12,55 @@ from loguru import logger
 from magic_pdf.utils.annotations import ImportPIL
 
 
+def fitz_open_pdf(pdf_bytes: bytes | memoryview) -> fitz.Document:
+    """Open the pdf from bytes or a buffer view, such as the mapped file of
+    a file backed dataset. pymupdf only reads bytes, so buffer views are
+    copied.
+
+    Args:
+        pdf_bytes (bytes | memoryview): the bytes of the pdf
+
+    Returns:
+        fitz.Document: the pymudoc document
+    """
+    if not isinstance(pdf_bytes, (bytes, bytearray)):
+        pdf_bytes = bytes(pdf_bytes)
+    return fitz.open('pdf', pdf_bytes)
+
+
+def _get_render_matrix(doc, dpi=200) -> fitz.Matrix:
+    mat = fitz.Matrix(dpi / 72, dpi / 72)
+    rect = (doc.rect * mat).irect
+
+    # If the width or height exceeds 4500 after scaling, do not scale further.
+    if rect.width > 4500 or rect.height > 4500:
+        mat = fitz.Matrix(1, 1)
+    return mat
+
+
+def fitz_doc_to_image_size(doc, dpi=200) -> tuple[int, int]:
+    """Get the size of the image which `fitz_doc_to_image` renders, without
+    rasterizing the page.
+
+    Args:
+        doc (_type_): pymudoc page
+        dpi (int, optional): reset the dpi of dpi. Defaults to 200.
+
+    Returns:
+        tuple[int, int]: (width, height)
+    """
+    rect = (doc.rect * _get_render_matrix(doc, dpi)).irect
+    return rect.width, rect.height
+
+
+@ImportPIL
+def fitz_pixmap_to_ndarray(pm: fitz.Pixmap) -> np.ndarray:
+    """Convert the RGB pixmap without alpha to numpy array."""
+    from PIL import Image
+    img = Image.frombytes('RGB', (pm.width, pm.height), pm.samples)
+    return np.array(img)
+
+
 @ImportPIL
 def fitz_doc_to_image(doc, dpi=200) -> dict:
     """Convert fitz.Document to image, Then convert the image to numpy array.
@@ -17,26 +72,30 @@ def fitz_doc_to_image(doc, dpi=200) -> dict:
     Returns:
         dict:  {'img': numpy array, 'width': width, 'height': height }
     """
-    from PIL import Image
-    mat = fitz.Matrix(dpi / 72, dpi / 72)
-    pm = doc.get_pixmap(matrix=mat, alpha=False)
-
-    # If the width or height exceeds 4500 after scaling, do not scale further.
-    if pm.width > 4500 or pm.height > 4500:
-        pm = doc.get_pixmap(matrix=fitz.Matrix(1, 1), alpha=False)
-
-    img = Image.frombytes('RGB', (pm.width, pm.height), pm.samples)
-    img = np.array(img)
+    pm = doc.get_pixmap(matrix=_get_render_matrix(doc, dpi), alpha=False)
+    img = fitz_pixmap_to_ndarray(pm)
 
     img_dict = {'img': img, 'width': pm.width, 'height': pm.height}
 
     return img_dict
 
 @ImportPIL
-def load_images_from_pdf(pdf_bytes: bytes, dpi=200, start_page_id=0, end_page_id=None) -> list:
-    from PIL import Image
+def load_images_from_pdf(pdf_bytes: bytes, dpi=200, start_page_id=0, end_page_id=None, num_workers=0) -> list:
+    """Render the pages of pdf to images.
+
+    Args:
+        pdf_bytes (bytes): the bytes of the pdf
+        dpi (int, optional): the dpi of images. Defaults to 200.
+        start_page_id (int, optional): the first page to render. Defaults to 0.
+        end_page_id (int, optional): the last page to render. Defaults to None, which means the last page.
+        num_workers (int, optional): render the pages in a process pool of num_workers processes
+            when greater than 1. Defaults to 0.
+
+    Returns:
+        list: one image dict per page, the pages out of range get {'img': [], 'width': 0, 'height': 0}
+    """
     images = []
-    with fitz.open('pdf', pdf_bytes) as doc:
+    with fitz_open_pdf(pdf_bytes) as doc:
         pdf_page_num = doc.page_count
         end_page_id = (
             end_page_id
@@ -47,21 +106,102 @@ def load_images_from_pdf(pdf_bytes: bytes, dpi=200, start_page_id=0, end_page_id
             logger.warning('end_page_id is out of range, use images length')
             end_page_id = pdf_page_num - 1
 
+        rendered = {}
+        page_ids = list(range(start_page_id, end_page_id + 1))
+        if num_workers > 1 and len(page_ids) > 0:
+            for window in iter_images_from_pdf(
+                pdf_bytes, page_ids, dpi, window_size=len(page_ids), num_workers=num_workers
+            ):
+                rendered.update(zip(page_ids, window))
+
         for index in range(0, doc.page_count):
             if start_page_id <= index <= end_page_id:
-                page = doc[index]
-                mat = fitz.Matrix(dpi / 72, dpi / 72)
-                pm = page.get_pixmap(matrix=mat, alpha=False)
-
-                # If the width or height exceeds 4500 after scaling, do not scale further.
-                if pm.width > 4500 or pm.height > 4500:
-                    pm = page.get_pixmap(matrix=fitz.Matrix(1, 1), alpha=False)
-
-                img = Image.frombytes('RGB', (pm.width, pm.height), pm.samples)
-                img = np.array(img)
-                img_dict = {'img': img, 'width': pm.width, 'height': pm.height}
+                img_dict = rendered.pop(index, None) or fitz_doc_to_image(doc[index], dpi)
             else:
                 img_dict = {'img': [], 'width': 0, 'height': 0}
 
             images.append(img_dict)
     return images
+
+
+_worker_doc = None
+
+
+def _init_render_worker(pdf_bytes: bytes):
+    # fitz is not thread safe, every worker process holds its own document
+    global _worker_doc
+    _worker_doc = fitz.open('pdf', pdf_bytes)
+
+
+def _render_worker_page(page_id: int, dpi: int) -> dict:
+    return fitz_doc_to_image(_worker_doc[page_id], dpi)
+
+
+def iter_images_from_pdf(
+    pdf_bytes: bytes,
+    page_ids: list[int],
+    dpi=200,
+    window_size=64,
+    num_workers=None,
+    prefetch_windows=1,
+) -> Iterator[list[dict]]:
+    """Render the pages of pdf in a process pool, yield the images window by
+    window.
+
+    A producer thread keeps rendering the next windows while the caller
+    consumes the current one, at most `prefetch_windows` rendered windows are
+    waiting in the queue at any time. The worker processes are spawned, so the
+    caller script must be guarded by `if __name__ == '__main__':`.
+
+    Args:
+        pdf_bytes (bytes): the bytes of the pdf
+        page_ids (list[int]): the pages to render, in the yielded order
+        dpi (int, optional): the dpi of images. Defaults to 200.
+        window_size (int, optional): the number of pages per window. Defaults to 64.
+        num_workers (int, optional): the number of render processes. Defaults to None, which means os.cpu_count().
+        prefetch_windows (int, optional): the capacity of the queue between rendering and the caller. Defaults to 1.
+
+    Yields:
+        list[dict]: the image dicts of one window, {'img': numpy array, 'width': width, 'height': height }
+    """
+    if not isinstance(pdf_bytes, (bytes, bytearray)):
+        pdf_bytes = bytes(pdf_bytes)
+    windows = [page_ids[i: i + window_size] for i in range(0, len(page_ids), window_size)]
+    frames = queue.Queue(maxsize=prefetch_windows)
+    stopped = threading.Event()
+
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_render_worker,
+        initargs=(pdf_bytes,),
+    ) as pool:
+
+        def produce():
+            try:
+                for window in windows:
+                    if stopped.is_set():
+                        return
+                    frames.put(list(pool.map(_render_worker_page, window, [dpi] * len(window))))
+                frames.put(None)
+            except BaseException as e:  # noqa: B036
+                frames.put(e)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        try:
+            while True:
+                window_images = frames.get()
+                if window_images is None:
+                    break
+                if isinstance(window_images, BaseException):
+                    raise window_images
+                yield window_images
+        finally:
+            stopped.set()
+            # unblock the producer if the caller stops early
+            while producer.is_alive():
+                try:
+                    frames.get(timeout=0.1)
+                except queue.Empty:
+                    pass
@@ -0,0 +1,78 @@
+"""根据pdf文本层的字体、字符判断页面是否可能包含公式，没有公式的页面跳过公式检测和识别."""
+import re
+
+import fitz
+
+# 数学字体：TeX的CM/AMS/LM字体、STIX、XITS、Cambria Math等
+MATH_FONT_PATTERN = re.compile(
+    r'(^|\+)(CMMI|CMSY|CMEX|CMBSY|CMMIB|MSAM|MSBM|EUFM|EUEX|RSFS|LMMATH|STIX|XITS|ASANA|'
+    r'LATINMODERNMATH|CAMBRIAMATH|MATHJAX|TXSY|TXEX|PXSY|PXEX|MTMI|MTSY|MTEX|EUCLID|MATH)',
+    re.IGNORECASE,
+)
+# 数学字符所在的unicode区间
+MATH_CHAR_RANGES = (
+    (0x0391, 0x03C9),  # 希腊字母
+    (0x2032, 0x2037),  # 撇号
+    (0x2070, 0x209F),  # 上下标
+    (0x2100, 0x214F),  # 字母式符号
+    (0x2190, 0x21FF),  # 箭头
+    (0x2200, 0x22FF),  # 数学运算符
+    (0x2300, 0x23FF),  # 杂项技术符号，括号的组成部分
+    (0x27C0, 0x27EF),
+    (0x2980, 0x2AFF),  # 补充数学运算符
+    (0x1D400, 0x1D7FF),  # 数学字母数字符号
+)
+# 行内公式常见的ascii运算符
+MATH_OPERATORS = '=<>^'
+# 两个操作数之间的等号、不等号，如 E = mc2，单个即认为包含公式
+ASCII_RELATION_PATTERN = re.compile(r'[A-Za-z0-9)\]]\s?[=<>]\s?[A-Za-z0-9(\[]')
+
+# 文本字符少于该数量的页面无法判断，认为可能包含公式
+MIN_TEXT_CHARS = 50
+# 数学字符数达到该数量认为包含公式
+MIN_MATH_CHARS = 3
+# ascii运算符占文本字符的比例达到该值认为包含公式
+MIN_OPERATOR_DENSITY = 0.005
+
+
+def is_math_char(char: str) -> bool:
+    code = ord(char)
+    return any(start <= code <= end for start, end in MATH_CHAR_RANGES)
+
+
+def page_may_contain_math(page: fitz.Page) -> bool:
+    """Whether the page may contain formulas, judged from the text layer of
+    the pdf by the math fonts, the math codepoints, the ascii relations
+    between operands and the density of the ascii operators. A page with too
+    little text to judge, e.g. a scanned page, may contain formulas. Formulas
+    drawn as vector paths or embedded as images leave no sign in the text
+    layer and are missed on a page with enough other text.
+
+    Args:
+        page (fitz.Page): the page of the pdf
+
+    Returns:
+        bool: False only if the text layer shows no sign of math
+    """
+    text_chars = 0
+    math_chars = 0
+    operators = 0
+    for block in page.get_text('dict', flags=fitz.TEXT_PRESERVE_WHITESPACE | fitz.TEXT_MEDIABOX_CLIP)['blocks']:
+        for line in block.get('lines', []):
+            for span in line['spans']:
+                text = span['text']
+                if not text.strip():
+                    continue
+                if MATH_FONT_PATTERN.search(span['font']):
+                    return True
+                if ASCII_RELATION_PATTERN.search(text):
+                    return True
+                text_chars += len(text)
+                for char in text:
+                    if char in MATH_OPERATORS:
+                        operators += 1
+                    elif is_math_char(char):
+                        math_chars += 1
+    if text_chars < MIN_TEXT_CHARS:
+        return True
+    return math_chars >= MIN_MATH_CHARS or operators / text_chars >= MIN_OPERATOR_DENSITY
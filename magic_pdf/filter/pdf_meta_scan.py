@@ -6,6 +6,7 @@ import fitz
 from loguru import logger
 
 from magic_pdf.config.drop_reason import DropReason
+from magic_pdf.data.utils import fitz_open_pdf
 from magic_pdf.libs.commons import get_top_percent_list, mymax
 from magic_pdf.libs.language import detect_lang
 from magic_pdf.libs.pdf_check import detect_invalid_chars_by_pymupdf, detect_invalid_chars
@@ -333,7 +334,7 @@ def pdf_meta_scan(pdf_bytes: bytes):
     :param pdf_bytes: pdf文件的二进制数据
     几个维度来评价：是否加密，是否需要密码，纸张大小，总页数，是否文字可提取
     """
-    doc = fitz.open('pdf', pdf_bytes)
+    doc = fitz_open_pdf(pdf_bytes)
     is_needs_password = doc.needs_pass
     is_encrypted = doc.is_encrypted
     total_page = len(doc)
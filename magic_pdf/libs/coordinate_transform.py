@@ -1,7 +1,11 @@
-def get_scale_ratio(model_page_info, page):
-    pix = page.get_pixmap(dpi=72)
-    pymu_width = int(pix.w)
-    pymu_height = int(pix.h)
+import fitz
+
+
+def get_scale_ratio(model_page_info, page_info):
+    # the size of the page rendered at 72 dpi, computed from the page geometry without rasterization
+    page_rect = fitz.Rect(0, 0, page_info.w, page_info.h).irect
+    pymu_width = int(page_rect.width)
+    pymu_height = int(page_rect.height)
     width_from_json = model_page_info['page_info']['width']
     height_from_json = model_page_info['page_info']['height']
     horizontal_scale_ratio = width_from_json / pymu_width
@@ -3,6 +3,7 @@ from magic_pdf.config.constants import CROSS_PAGE
 from magic_pdf.config.ocr_content_type import (BlockType, CategoryId,
                                                ContentType)
 from magic_pdf.data.dataset import Dataset
+from magic_pdf.data.utils import fitz_open_pdf
 from magic_pdf.model.magic_model import MagicModel
 
 
@@ -171,7 +172,7 @@ def draw_layout_bbox(pdf_info, pdf_bytes, out_path, filename):
 
         layout_bbox_list.append(page_block_list)
 
-    pdf_docs = fitz.open('pdf', pdf_bytes)
+    pdf_docs = fitz_open_pdf(pdf_bytes)
 
     for i, page in enumerate(pdf_docs):
 
@@ -272,7 +273,7 @@ def draw_span_bbox(pdf_info, pdf_bytes, out_path, filename):
         interline_equation_list.append(page_interline_equation_list)
         image_list.append(page_image_list)
         table_list.append(page_table_list)
-    pdf_docs = fitz.open('pdf', pdf_bytes)
+    pdf_docs = fitz_open_pdf(pdf_bytes)
     for i, page in enumerate(pdf_docs):
         # 获取当前页面的数据
         draw_bbox_without_number(i, text_list, page, [255, 0, 0], False)
@@ -399,7 +400,7 @@ def draw_line_sort_bbox(pdf_info, pdf_bytes, out_path, filename):
                             page_line_list.append({'index': index, 'bbox': bbox})
         sorted_bboxes = sorted(page_line_list, key=lambda x: x['index'])
         layout_bbox_list.append(sorted_bbox['bbox'] for sorted_bbox in sorted_bboxes)
-    pdf_docs = fitz.open('pdf', pdf_bytes)
+    pdf_docs = fitz_open_pdf(pdf_bytes)
     for i, page in enumerate(pdf_docs):
         draw_bbox_with_number(i, layout_bbox_list, page, [255, 0, 0], False)
 
@@ -407,7 +408,7 @@ def draw_line_sort_bbox(pdf_info, pdf_bytes, out_path, filename):
 
 
 def draw_char_bbox(pdf_bytes, out_path, filename):
-    pdf_docs = fitz.open('pdf', pdf_bytes)
+    pdf_docs = fitz_open_pdf(pdf_bytes)
     for i, page in enumerate(pdf_docs):
         for block in page.get_text('rawdict', flags=fitz.TEXT_PRESERVE_LIGATURES | fitz.TEXT_PRESERVE_WHITESPACE | fitz.TEXT_MEDIABOX_CLIP)['blocks']:
             for line in block['lines']:
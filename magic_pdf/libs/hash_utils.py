@@ -1,9 +1,12 @@
 import hashlib
 
 
-def compute_md5(file_bytes):
+def compute_md5(file_bytes, chunk_size=1024 * 1024):
+    # 分块哈希，支持bytes和mmap的memoryview，避免一次性载入整个文件
     hasher = hashlib.md5()
-    hasher.update(file_bytes)
+    view = memoryview(file_bytes)
+    for offset in range(0, len(view), chunk_size):
+        hasher.update(view[offset: offset + chunk_size])
     return hasher.hexdigest().upper()
 
 
@@ -13,3 +16,11 @@ def compute_sha256(input_string):
     input_bytes = input_string.encode('utf-8')
     hasher.update(input_bytes)
     return hasher.hexdigest()
+
+
+def compute_ndarray_sha256(arr):
+    # 对像素内容哈希，形状不同但字节相同的数组得到不同的结果，arr需要是连续内存
+    hasher = hashlib.sha256()
+    hasher.update(f'{arr.dtype}{arr.shape}'.encode('utf-8'))
+    hasher.update(memoryview(arr).cast('B'))
+    return hasher.hexdigest()
@@ -5,6 +5,8 @@ import re
 from io import BytesIO
 from pdfminer.high_level import extract_text
 
+from magic_pdf.data.utils import fitz_open_pdf
+
 
 def calculate_sample_count(total_page: int):
     """
@@ -15,7 +17,7 @@ def calculate_sample_count(total_page: int):
 
 
 def extract_pages(src_pdf_bytes: bytes) -> fitz.Document:
-    pdf_docs = fitz.open("pdf", src_pdf_bytes)
+    pdf_docs = fitz_open_pdf(src_pdf_bytes)
     total_page = len(pdf_docs)
     if total_page == 0:
         # 如果PDF没有页面，直接返回空文档
@@ -1,58 +1,133 @@
-from io import BytesIO
+import weakref
+
 import cv2
 import fitz
 import numpy as np
 from PIL import Image
 from magic_pdf.data.data_reader_writer import DataWriter
-from magic_pdf.libs.commons import join_path
-from magic_pdf.libs.hash_utils import compute_sha256
+from magic_pdf.libs.hash_utils import compute_ndarray_sha256
 
 
-def cut_image(bbox: tuple, page_num: int, page: fitz.Page, return_path, imageWriter: DataWriter):
-    """从第page_num页的page中，根据bbox进行裁剪出一张jpg图片，返回图片路径 save_path：需要同时支持s3和本地,
-    图片存放在save_path下，文件名是:
-    {page_num}_{bbox[0]}_{bbox[1]}_{bbox[2]}_{bbox[3]}.jpg , bbox内数字取整。"""
-    # 拼接文件名
-    filename = f'{page_num}_{int(bbox[0])}_{int(bbox[1])}_{int(bbox[2])}_{int(bbox[3])}'
+def cut_images_to_ndarray(bboxes: list, page: fitz.Page, zoom: int = 3) -> list[np.ndarray]:
+    """Crop the regions of bboxes from the page at zoom, the area covering all
+    bboxes is rendered once and every crop is a view into it, which is equal to
+    rendering every bbox with `page.get_pixmap(clip=bbox)`.
+
+    Args:
+        bboxes (list): the [x0, y0, x1, y1] of every region in page coordinates
+        page (fitz.Page): the page to crop from
+        zoom (int, optional): the zoom of the crops. Defaults to 3.
+
+    Returns:
+        list[np.ndarray]: the RGB crop of every bbox
+    """
+    matrix = fitz.Matrix(zoom, zoom)
+    clips = [fitz.Rect(*bbox) & page.rect for bbox in bboxes]
+    union = fitz.Rect()
+    for clip in clips:
+        if not clip.is_empty:
+            union |= clip
+
+    crops = []
+    canvas, canvas_rect = None, None
+    for bbox, clip in zip(bboxes, clips):
+        if clip.is_empty:
+            # get_pixmap renders an empty pixmap for the regions out of the page
+            crops.append(np.zeros((0, 0, 3), dtype=np.uint8))
+            continue
+        if canvas is None:
+            pix = page.get_pixmap(clip=union, matrix=matrix)
+            canvas, canvas_rect = _pixmap_to_ndarray(pix), fitz.IRect(pix.irect)
+        irect = (clip * matrix).irect & canvas_rect
+        crops.append(canvas[
+            irect.y0 - canvas_rect.y0: irect.y1 - canvas_rect.y0,
+            irect.x0 - canvas_rect.x0: irect.x1 - canvas_rect.x0,
+        ])
+    return crops
 
-    # 老版本返回不带bucket的路径
-    img_path = join_path(return_path, filename) if return_path is not None else None
 
-    # 新版本生成平铺路径
-    img_hash256_path = f'{compute_sha256(img_path)}.jpg'
+def _pixmap_to_ndarray(pix: fitz.Pixmap) -> np.ndarray:
+    if pix.n != 3:
+        pix = fitz.Pixmap(fitz.csRGB, pix, 0)
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w, 3)
 
-    # 将坐标转换为fitz.Rect对象
-    rect = fitz.Rect(*bbox)
-    # 配置缩放倍数为3倍
-    zoom = fitz.Matrix(3, 3)
-    # 截取图片
-    pix = page.get_pixmap(clip=rect, matrix=zoom)
 
-    byte_data = pix.tobytes(output='jpeg', jpg_quality=95)
+def _ndarray_to_jpeg(img: np.ndarray) -> bytes:
+    pix = fitz.Pixmap(fitz.csRGB, img.shape[1], img.shape[0], img.tobytes(), 0)
+    return pix.tobytes(output='jpeg', jpg_quality=95)
 
-    imageWriter.write(img_hash256_path, byte_data)
 
+# 每个writer已写入的图片路径，同一writer内重复的图片不再检查是否存在
+_written_image_paths = weakref.WeakKeyDictionary()
+
+
+def write_image(img: np.ndarray, imageWriter: DataWriter) -> str:
+    """Write the image as a jpg named by the sha256 of its pixels. When the
+    same pixels were written to imageWriter before, or the file already exists
+    in it, the encoding and writing are skipped and the existing path is
+    returned.
+
+    Args:
+        img (np.ndarray): the RGB image
+        imageWriter (DataWriter): the writer of the jpg images
+
+    Returns:
+        str: the path of the jpg image
+    """
+    img = np.ascontiguousarray(img)
+    img_hash256_path = f'{compute_ndarray_sha256(img)}.jpg'
+    written_paths = _written_image_paths.setdefault(imageWriter, set())
+    if img_hash256_path in written_paths:
+        return img_hash256_path
+    if not imageWriter.exists(img_hash256_path):
+        imageWriter.write(img_hash256_path, _ndarray_to_jpeg(img))
+    written_paths.add(img_hash256_path)
     return img_hash256_path
 
 
+def cut_image(bbox: tuple, page_num: int, page: fitz.Page, return_path, imageWriter: DataWriter):
+    """从第page_num页的page中，根据bbox进行裁剪出一张jpg图片，返回图片路径 save_path：需要同时支持s3和本地,
+    文件名是图片像素内容的sha256，内容相同的图片只写入一次。page_num和return_path仅为兼容保留。"""
+    return cut_images([bbox], page, imageWriter)[0]
+
+
+def cut_images(bboxes: list, page: fitz.Page, imageWriter: DataWriter) -> list[str]:
+    """Crop every bbox of the page into a jpg image with one render of the
+    page, the images are written by `write_image`.
+
+    Args:
+        bboxes (list): the bbox of every image
+        page (fitz.Page): the page to crop from
+        imageWriter (DataWriter): the writer of the jpg images
+
+    Returns:
+        list[str]: the image path of every bbox
+    """
+    return [write_image(img, imageWriter) for img in cut_images_to_ndarray(bboxes, page)]
+
+
 def cut_image_to_pil_image(bbox: tuple, page: fitz.Page, mode="pillow"):
+    return cut_images_to_pil_image([bbox], page, mode=mode)[0]
+
+
+def cut_images_to_pil_image(bboxes: list, page: fitz.Page, mode="pillow") -> list:
+    """Crop every bbox of the page with one render of the page.
+
+    Args:
+        bboxes (list): the bbox of every crop
+        page (fitz.Page): the page to crop from
+        mode (str, optional): "pillow" returns PIL images, "cv2" returns BGR ndarrays. Defaults to "pillow".
 
-    # 将坐标转换为fitz.Rect对象
-    rect = fitz.Rect(*bbox)
-    # 配置缩放倍数为3倍
-    zoom = fitz.Matrix(3, 3)
-    # 截取图片
-    pix = page.get_pixmap(clip=rect, matrix=zoom)
-
-    # 将字节数据转换为文件对象
-    image_file = BytesIO(pix.tobytes(output='png'))
-    # 使用 Pillow 打开图像
-    pil_image = Image.open(image_file)
-    if mode == "cv2":
-        image_result = cv2.cvtColor(np.asarray(pil_image), cv2.COLOR_RGB2BGR)
-    elif mode == "pillow":
-        image_result = pil_image
-    else:
+    Returns:
+        list: the crop of every bbox
+    """
+    if mode not in ("cv2", "pillow"):
         raise ValueError(f"mode: {mode} is not supported.")
 
-    return image_result
\ No newline at end of file
+    image_results = []
+    for img in cut_images_to_ndarray(bboxes, page):
+        if mode == "cv2":
+            image_results.append(cv2.cvtColor(img, cv2.COLOR_RGB2BGR))
+        else:
+            image_results.append(Image.fromarray(img))
+    return image_results
@@ -1,3 +1,4 @@
+import queue
 import time
 
 import cv2
@@ -7,119 +8,309 @@ from loguru import logger
 from PIL import Image
 
 from magic_pdf.config.constants import MODEL_NAME
+from magic_pdf.data.pyramid import ImagePyramid
 # from magic_pdf.config.exceptions import CUDA_NOT_AVAILABLE
 # from magic_pdf.data.dataset import Dataset
 # from magic_pdf.libs.clean_memory import clean_memory
 # from magic_pdf.libs.config_reader import get_device
 # from magic_pdf.model.doc_analyze_by_custom_model import ModelSingleton
+from magic_pdf.model.batch_size_tuner import BatchSizeTuner
 from magic_pdf.model.pdf_extract_kit import CustomPEKModel
+from magic_pdf.model.stage_scheduler import PipelineStage, StagePipeline
+from magic_pdf.model.sub_modules.layout.doclayout_yolo.onnx_backend import \
+    LayoutBackend
+from magic_pdf.model.sub_modules.model_init import ocr_model_init
 from magic_pdf.model.sub_modules.model_utils import (
     clean_vram, crop_img, get_res_list_from_layout_res)
 from magic_pdf.model.sub_modules.ocr.paddleocr.ocr_utils import (
-    get_adjusted_mfdetrec_res, get_ocr_result_list)
+    get_adjusted_mfdetrec_res, get_ocr_result_list, get_text_layer_result_list)
+from magic_pdf.model.sub_modules.ocr.text_layer import get_region_text_lines
+from magic_pdf.model.sub_modules.table.table_utils import TableTimeBudget
 # from magic_pdf.operators.models import InferenceResult
 
 YOLO_LAYOUT_BASE_BATCH_SIZE = 1
 MFD_BASE_BATCH_SIZE = 1
 MFR_BASE_BATCH_SIZE = 16
+# text lines recognized per batch at least, the lines of all ocr regions of a chunk are recognized together
+OCR_REC_BATCH_SIZE = 64
+# tables recognized per batch by the models taking a list of images
+TABLE_BATCH_SIZE = 4
+# pages passed between the stages at once
+PIPELINE_CHUNK_SIZE = 8
+# chunks waiting for a stage at most
+PIPELINE_QUEUE_SIZE = 2
 
 
 class BatchAnalyze:
-    def __init__(self, model: CustomPEKModel, batch_ratio: int):
+    def __init__(
+        self,
+        model: CustomPEKModel,
+        batch_ratio: int,
+        chunk_size: int = PIPELINE_CHUNK_SIZE,
+        stage_workers: dict | None = None,
+        tuner: BatchSizeTuner | None = None,
+        table_time_budget: float | None = None,
+    ):
+        """Analyze pages with the models of CustomPEKModel in batches, the
+        stages layout -> mfd -> mfr -> ocr -> table run as a pipeline over
+        chunks of pages, so the detectors infer the next chunk while the ocr
+        and table stages work on the current one.
+
+        Args:
+            model (CustomPEKModel): the models
+            batch_ratio (int): the multiplier of the base batch size of mfr, used when tuner is None
+            chunk_size (int, optional): pages passed between the stages at once. Defaults to PIPELINE_CHUNK_SIZE.
+            stage_workers (dict | None, optional): stage name -> number of worker threads, the stages are
+                layout, mfd, mfr, ocr and table, every extra ocr worker gets its own ocr model.
+                Defaults to None, which means one worker per stage.
+            tuner (BatchSizeTuner | None, optional): tune the batch sizes of the layout, mfd and mfr models
+                on the first pages and back off on out of memory errors. Defaults to None, which means
+                use the base batch sizes.
+            table_time_budget (float | None, optional): the seconds the table recognition of one document may take,
+                including the ocr of the tables, the tables after the budget is used up are kept as images only,
+                0 means unlimited. Defaults to None, which means unlimited.
+        """
         self.model = model
         self.batch_ratio = batch_ratio
+        self.chunk_size = max(chunk_size, 1)
+        self.stage_workers = stage_workers or {}
+        self.last_report = {}
+        self.tuner = tuner
+        self.table_time_budget = table_time_budget or 0
+        self.batch_sizes = {
+            'layout': YOLO_LAYOUT_BASE_BATCH_SIZE,
+            'mfd': MFD_BASE_BATCH_SIZE,
+            'mfr': batch_ratio * MFR_BASE_BATCH_SIZE,
+        }
+        # the keys of the tuned batch sizes, the input size is part of the key
+        self._model_keys = {}
+        if self.model.layout_model_name == MODEL_NAME.DocLayout_YOLO:
+            self._model_keys['layout'] = f'{self.model.layout_model_name}@{self.model.layout_model.imgsz}'
+            if self.model.layout_model.backend != LayoutBackend.TORCH:
+                self._model_keys['layout'] += f'-{self.model.layout_model.backend}'
+        if self.model.apply_formula:
+            self._model_keys['mfd'] = f'{self.model.mfd_model_name}@{self.model.mfd_model.imgsz}'
+            self._model_keys['mfr'] = self.model.mfr_model_name
+            if getattr(self.model.mfr_model, 'cpu_int8', False):
+                self._model_keys['mfr'] += '-int8'
+        self._tuned = False
+        # the ocr models of the ocr workers, the predictors can not be shared between threads
+        self._ocr_models = queue.Queue()
+        self._ocr_models.put(self.model.ocr_model)
+
+    def new_table_budget(self) -> TableTimeBudget:
+        """A table time budget for one document, pass it to every call on the
+        pages of the document."""
+        return TableTimeBudget(self.table_time_budget)
+
+    def __call__(
+        self,
+        images: list,
+        table_budget: TableTimeBudget | None = None,
+        formula_flags: list[bool] | None = None,
+        text_lines: list[list | None] | None = None,
+    ) -> list:
+        """Analyze the page images.
+
+        Args:
+            images (list): the page images, each one is a numpy array or an ImagePyramid which
+                renders the page at the resolution each stage consumes
+            table_budget (TableTimeBudget | None, optional): the table time budget of the document the pages
+                belong to. Defaults to None, which means the pages are one document.
+            formula_flags (list[bool] | None, optional): whether each page may contain formulas, the formula
+                detection and recognition skip the pages flagged False. Defaults to None, which means all pages.
+            text_lines (list[list | None] | None, optional): the line boxes of the text layer of each page, see
+                `get_page_text_lines`, without ocr the text regions covered by the text layer take their spans
+                from these lines instead of the text detection. Defaults to None, which means detect all regions.
+
+        Returns:
+            list: the layout_dets of each page
+        """
+        if table_budget is None:
+            table_budget = self.new_table_budget()
+        skipped_tables = table_budget.skipped
+        images = [
+            image if isinstance(image, ImagePyramid) else ImagePyramid(image)
+            for image in images
+        ]
+        if self.tuner is not None and not self._tuned and images:
+            self._tune_batch_sizes(images[0])
+        if formula_flags is None:
+            formula_flags = [True] * len(images)
+        if text_lines is None:
+            text_lines = [None] * len(images)
+        chunks = [
+            {
+                'images': images[index: index + self.chunk_size],
+                'formula_flags': formula_flags[index: index + self.chunk_size],
+                'text_lines': text_lines[index: index + self.chunk_size],
+                'table_budget': table_budget,
+            }
+            for index in range(0, len(images), self.chunk_size)
+        ]
+
+        stages = [('layout', self._layout_stage)]
+        if self.model.apply_formula:
+            stages += [('mfd', self._mfd_stage), ('mfr', self._mfr_stage)]
+        stages.append(('ocr', self._ocr_stage))
+        if self.model.apply_table:
+            stages.append(('table', self._table_stage))
+
+        pipeline = StagePipeline([
+            PipelineStage(
+                name, fn, workers=self.stage_workers.get(name, 1), queue_size=PIPELINE_QUEUE_SIZE
+            )
+            for name, fn in stages
+        ])
+        chunks = pipeline.run(chunks)
+        pipeline.log_report()
+        self.last_report = pipeline.report()
+        if table_budget.skipped > skipped_tables:
+            logger.warning(
+                f'table recognition time budget {table_budget.seconds}s is used up,'
+                f' {table_budget.skipped - skipped_tables} tables are kept as images only'
+            )
+
+        # 清理显存
+        clean_vram(self.model.device, vram_threshold=8)
 
-    def __call__(self, images: list) -> list:
         images_layout_res = []
+        for chunk in chunks:
+            images_layout_res += chunk['layout_res']
+        return images_layout_res
+
+    def _tune_batch_sizes(self, image: ImagePyramid):
+        """Tune the batch sizes with the first page, the tuned sizes are
+        cached by the tuner so only the first run on a device pays for it."""
+        self._tuned = True
+        if self.model.layout_model_name == MODEL_NAME.DocLayout_YOLO:
+            self.batch_sizes['layout'] = self.tuner.tune(
+                self._model_keys['layout'],
+                lambda batch: self.model.layout_model.batch_predict(batch, len(batch)),
+                Image.fromarray(image.get_level(self.model.layout_model.imgsz)[0]),
+            )
+        if self.model.apply_formula:
+            self.batch_sizes['mfd'] = self.tuner.tune(
+                self._model_keys['mfd'],
+                lambda batch: self.model.mfd_model.batch_predict(batch, len(batch)),
+                image.get_level(self.model.mfd_model.imgsz)[0],
+            )
+            # a formula sized region of the page
+            x0, y0 = image.width // 4, image.height // 2
+            formula_image = Image.fromarray(
+                image.crop([x0, y0, x0 + max(image.width // 3, 1), y0 + max(image.height // 30, 1)])
+            )
+            self.batch_sizes['mfr'] = self.tuner.tune(
+                self._model_keys['mfr'],
+                # the calibration batches repeat the sample, they must not be deduplicated
+                lambda batch: self.model.mfr_model.recognize(batch, batch_size=len(batch), dedupe=False),
+                formula_image,
+            )
+        logger.info(f'batch sizes: {self.batch_sizes}')
+
+    def _run_batched(self, name: str, fn):
+        """Call fn with the batch size of the stage, halve the batch size on
+        out of memory errors when tuning is enabled."""
+        if self.tuner is None:
+            return fn(self.batch_sizes[name])
+        result = self.tuner.run_with_backoff(self._model_keys[name], fn, self.batch_sizes[name])
+        self.batch_sizes[name] = self.tuner.get(self._model_keys[name]) or self.batch_sizes[name]
+        return result
 
-        layout_start_time = time.time()
+    def _layout_stage(self, chunk: dict) -> dict:
+        images = chunk['images']
+        images_layout_res = []
         if self.model.layout_model_name == MODEL_NAME.LAYOUTLMv3:
             # layoutlmv3
             for image in images:
-                layout_res = self.model.layout_model(image, ignore_catids=[])
+                layout_res = self.model.layout_model(image.get_image(), ignore_catids=[])
                 images_layout_res.append(layout_res)
         elif self.model.layout_model_name == MODEL_NAME.DocLayout_YOLO:
             # doclayout_yolo
             layout_images = []
-            modified_images = []
-            for image_index, image in enumerate(images):
-                pil_img = Image.fromarray(image)
-                # width, height = pil_img.size
-                # if height > width:
-                #     input_res = {'poly': [0, 0, width, 0, width, height, 0, height]}
-                #     new_image, useful_list = crop_img(
-                #         input_res, pil_img, crop_paste_x=width // 2, crop_paste_y=0
-                #     )
-                #     layout_images.append(new_image)
-                #     modified_images.append([image_index, useful_list])
-                # else:
-                layout_images.append(pil_img)
+            layout_scales = []
+            for image in images:
+                layout_image, layout_scale = image.get_level(self.model.layout_model.imgsz)
+                layout_scales.append(layout_scale)
+                layout_images.append(Image.fromarray(layout_image))
 
-            images_layout_res += self.model.layout_model.batch_predict(
-                # layout_images, self.batch_ratio * YOLO_LAYOUT_BASE_BATCH_SIZE
-                layout_images, YOLO_LAYOUT_BASE_BATCH_SIZE
+            images_layout_res += self._run_batched(
+                'layout',
+                lambda batch_size: self.model.layout_model.batch_predict(
+                    layout_images, batch_size, scales=layout_scales
+                ),
             )
+        chunk['layout_res'] = images_layout_res
+        return chunk
 
-            for image_index, useful_list in modified_images:
-                for res in images_layout_res[image_index]:
-                    for i in range(len(res['poly'])):
-                        if i % 2 == 0:
-                            res['poly'][i] = (
-                                res['poly'][i] - useful_list[0] + useful_list[2]
-                            )
-                        else:
-                            res['poly'][i] = (
-                                res['poly'][i] - useful_list[1] + useful_list[3]
-                            )
-        logger.info(
-            f'layout time: {round(time.time() - layout_start_time, 2)}, image num: {len(images)}'
+    def _mfd_stage(self, chunk: dict) -> dict:
+        # 公式检测，跳过文本层判断为不含公式的页面
+        chunk['formula_images'] = [
+            image for image, formula_flag in zip(chunk['images'], chunk['formula_flags']) if formula_flag
+        ]
+        if not chunk['formula_images']:
+            chunk['mfd_res'] = []
+            return chunk
+        mfd_levels = [image.get_level(self.model.mfd_model.imgsz) for image in chunk['formula_images']]
+        chunk['mfd_res'] = self._run_batched(
+            'mfd',
+            lambda batch_size: self.model.mfd_model.batch_predict(
+                [mfd_image for mfd_image, _ in mfd_levels], batch_size,
+                scales=[mfd_scale for _, mfd_scale in mfd_levels],
+            ),
         )
+        return chunk
 
-        if self.model.apply_formula:
-            # 公式检测
-            mfd_start_time = time.time()
-            images_mfd_res = self.model.mfd_model.batch_predict(
-                # images, self.batch_ratio * MFD_BASE_BATCH_SIZE
-                images, MFD_BASE_BATCH_SIZE
-            )
-            logger.info(
-                f'mfd time: {round(time.time() - mfd_start_time, 2)}, image num: {len(images)}'
-            )
-
-            # 公式识别
-            mfr_start_time = time.time()
-            images_formula_list = self.model.mfr_model.batch_predict(
-                images_mfd_res,
-                images,
-                batch_size=self.batch_ratio * MFR_BASE_BATCH_SIZE,
-            )
-            mfr_count = 0
-            for image_index in range(len(images)):
-                images_layout_res[image_index] += images_formula_list[image_index]
-                mfr_count += len(images_formula_list[image_index])
-            logger.info(
-                f'mfr time: {round(time.time() - mfr_start_time, 2)}, image num: {mfr_count}'
-            )
+    def _mfr_stage(self, chunk: dict) -> dict:
+        # 公式识别
+        mfd_res = chunk.pop('mfd_res')
+        formula_images = chunk.pop('formula_images')
+        if not formula_images:
+            return chunk
+        images_formula_list = iter(self._run_batched(
+            'mfr',
+            lambda batch_size: self.model.mfr_model.batch_predict(
+                mfd_res, formula_images, batch_size=batch_size,
+            ),
+        ))
+        for layout_res, formula_flag in zip(chunk['layout_res'], chunk['formula_flags']):
+            if formula_flag:
+                layout_res += next(images_formula_list)
+        return chunk
 
-        # 清理显存
-        clean_vram(self.model.device, vram_threshold=8)
-
-        ocr_time = 0
-        ocr_count = 0
-        table_time = 0
-        table_count = 0
+    def _ocr_stage(self, chunk: dict) -> dict:
         # reference: magic_pdf/model/doc_analyze_by_custom_model.py:doc_analyze
-        for index in range(len(images)):
-            layout_res = images_layout_res[index]
-            pil_img = Image.fromarray(images[index])
+        ocr_model = self._acquire_ocr_model()
+        try:
+            return self._ocr_chunk(chunk, ocr_model)
+        finally:
+            self._ocr_models.put(ocr_model)
+
+    def _acquire_ocr_model(self):
+        try:
+            return self._ocr_models.get_nowait()
+        except queue.Empty:
+            # one more ocr worker than ocr models, the pool grows to the number of ocr workers
+            return ocr_model_init(show_log=False, det_db_box_thresh=0.3, lang=self.model.lang)
 
+    def _ocr_chunk(self, chunk: dict, ocr_model) -> dict:
+        chunk['table_inputs'] = []
+        ocr_inputs = []
+        for pil_img, layout_res, page_text_lines in zip(chunk['images'], chunk['layout_res'], chunk['text_lines']):
             ocr_res_list, table_res_list, single_page_mfdetrec_res = (
                 get_res_list_from_layout_res(layout_res)
             )
             # ocr识别
-            ocr_start = time.time()
             # Process each area that requires OCR processing
             for res in ocr_res_list:
+                if not self.model.apply_ocr and page_text_lines:
+                    # 文本层覆盖的区域直接用pdf的行框，不做文本检测
+                    region_lines = get_region_text_lines(
+                        [res['poly'][0], res['poly'][1], res['poly'][4], res['poly'][5]], page_text_lines
+                    )
+                    if region_lines:
+                        layout_res.extend(get_text_layer_result_list(region_lines, single_page_mfdetrec_res))
+                        continue
                 new_image, useful_list = crop_img(
                     res, pil_img, crop_paste_x=50, crop_paste_y=50
                 )
@@ -129,74 +320,88 @@ class BatchAnalyze:
 
                 # OCR recognition
                 new_image = cv2.cvtColor(np.asarray(new_image), cv2.COLOR_RGB2BGR)
+                ocr_inputs.append((layout_res, new_image, adjusted_mfdetrec_res, useful_list))
 
-                if self.model.apply_ocr:
-                    ocr_res = self.model.ocr_model.ocr(
-                        new_image, mfd_res=adjusted_mfdetrec_res
-                    )[0]
-                else:
-                    ocr_res = self.model.ocr_model.ocr(
-                        new_image, mfd_res=adjusted_mfdetrec_res, rec=False
-                    )[0]
-
-                # Integration results
-                if ocr_res:
-                    ocr_result_list = get_ocr_result_list(ocr_res, useful_list)
-                    layout_res.extend(ocr_result_list)
-            ocr_time += time.time() - ocr_start
-            ocr_count += len(ocr_res_list)
-
-            # 表格识别 table recognition
             if self.model.apply_table:
-                table_start = time.time()
                 for res in table_res_list:
-                    new_image, _ = crop_img(res, pil_img)
-                    single_table_start_time = time.time()
-                    html_code = None
-                    if self.model.table_model_name == MODEL_NAME.STRUCT_EQTABLE:
-                        with torch.no_grad():
-                            table_result = self.model.table_model.predict(
-                                new_image, 'html'
-                            )
-                            if len(table_result) > 0:
-                                html_code = table_result[0]
-                    elif self.model.table_model_name == MODEL_NAME.TABLE_MASTER:
-                        html_code = self.model.table_model.img2html(new_image)
-                    elif self.model.table_model_name == MODEL_NAME.RAPID_TABLE:
-                        html_code, table_cell_bboxes, logic_points, elapse = (
-                            self.model.table_model.predict(new_image)
-                        )
-                    run_time = time.time() - single_table_start_time
-                    if run_time > self.model.table_max_time:
-                        logger.warning(
-                            f'table recognition processing exceeds max time {self.model.table_max_time}s'
-                        )
-                    # 判断是否返回正常
-                    if html_code:
-                        expected_ending = html_code.strip().endswith(
-                            '</html>'
-                        ) or html_code.strip().endswith('</table>')
-                        if expected_ending:
-                            res['html'] = html_code
-                        else:
-                            logger.warning(
-                                'table recognition processing fails, not found expected HTML table end'
-                            )
-                    else:
-                        logger.warning(
-                            'table recognition processing fails, not get html return'
-                        )
-                table_time += time.time() - table_start
-                table_count += len(table_res_list)
+                    chunk['table_inputs'].append({'res': res, 'image': crop_img(res, pil_img)[0]})
 
         if self.model.apply_ocr:
-            logger.info(f'ocr time: {round(ocr_time, 2)}, image num: {ocr_count}')
+            # 先检测所有区域的文本行，再把整个chunk的文本行按宽度排序后批量识别
+            ocr_res_list = ocr_model.batch_ocr(
+                [new_image for _, new_image, _, _ in ocr_inputs],
+                mfd_res_list=[adjusted_mfdetrec_res for _, _, adjusted_mfdetrec_res, _ in ocr_inputs],
+                rec_batch_num=OCR_REC_BATCH_SIZE,
+            )
         else:
-            logger.info(f'det time: {round(ocr_time, 2)}, image num: {ocr_count}')
-        if self.model.apply_table:
-            logger.info(f'table time: {round(table_time, 2)}, image num: {table_count}')
+            ocr_res_list = [
+                ocr_model.ocr(new_image, mfd_res=adjusted_mfdetrec_res, rec=False)[0]
+                for _, new_image, adjusted_mfdetrec_res, _ in ocr_inputs
+            ]
 
-        return images_layout_res
+        # Integration results
+        for (layout_res, _, _, useful_list), ocr_res in zip(ocr_inputs, ocr_res_list):
+            if ocr_res:
+                ocr_result_list = get_ocr_result_list(ocr_res, useful_list)
+                layout_res.extend(ocr_result_list)
+        return chunk
+
+    def _table_stage(self, chunk: dict) -> dict:
+        # 表格识别 table recognition, the tables of all pages of the chunk are recognized together
+        table_inputs = chunk.pop('table_inputs')
+        table_budget = chunk.pop('table_budget')
+        if self.model.table_model_name == MODEL_NAME.STRUCT_EQTABLE:
+            batches = [
+                table_inputs[index: index + TABLE_BATCH_SIZE]
+                for index in range(0, len(table_inputs), TABLE_BATCH_SIZE)
+            ]
+        else:
+            batches = [[table_input] for table_input in table_inputs]
+
+        for batch in batches:
+            if table_budget.exhausted():
+                # degrade to image only output instead of stalling the worker
+                table_budget.skip(len(batch))
+                continue
+            batch_start_time = time.time()
+            if self.model.table_model_name == MODEL_NAME.STRUCT_EQTABLE:
+                with torch.no_grad():
+                    html_codes = self.model.table_model.predict(
+                        [table_input['image'] for table_input in batch], 'html'
+                    )
+            elif self.model.table_model_name == MODEL_NAME.TABLE_MASTER:
+                html_codes = [self.model.table_model.img2html(batch[0]['image'])]
+            elif self.model.table_model_name == MODEL_NAME.RAPID_TABLE:
+                # the ocr of the table by the RapidOCR of RapidTable is charged to the budget as well
+                html_code, table_cell_bboxes, logic_points, elapse = (
+                    self.model.table_model.predict(batch[0]['image'])
+                )
+                html_codes = [html_code]
+            else:
+                html_codes = [None] * len(batch)
+            run_time = time.time() - batch_start_time
+            table_budget.consume(run_time)
+            if run_time / len(batch) > self.model.table_max_time:
+                logger.warning(
+                    f'table recognition processing exceeds max time {self.model.table_max_time}s'
+                )
+            for table_input, html_code in zip(batch, html_codes):
+                # 判断是否返回正常
+                if html_code:
+                    expected_ending = html_code.strip().endswith(
+                        '</html>'
+                    ) or html_code.strip().endswith('</table>')
+                    if expected_ending:
+                        table_input['res']['html'] = html_code
+                    else:
+                        logger.warning(
+                            'table recognition processing fails, not found expected HTML table end'
+                        )
+                else:
+                    logger.warning(
+                        'table recognition processing fails, not get html return'
+                    )
+        return chunk
 
 
 # def doc_batch_analyze(
@@ -0,0 +1,197 @@
+import json
+import os
+import threading
+import time
+from typing import Callable
+
+from loguru import logger
+
+# 吞吐提升低于该比例时停止增大batch size
+MIN_THROUGHPUT_GAIN = 0.05
+
+
+def get_batch_size_cache_path() -> str:
+    """The file where the tuned batch sizes are kept, can be overridden by the
+    env `MINERU_BATCH_SIZE_CACHE`."""
+    return os.getenv(
+        'MINERU_BATCH_SIZE_CACHE',
+        os.path.join(os.path.expanduser('~'), '.cache', 'magic_pdf', 'batch_size.json'),
+    )
+
+
+def is_oom_error(e: Exception) -> bool:
+    """Whether the exception is an out of memory error of the device."""
+    return isinstance(e, MemoryError) or 'out of memory' in str(e).lower()
+
+
+def get_device_key(device) -> str:
+    """The key of the device in the cache, the tuned batch sizes are only
+    reused on the same kind of device."""
+    device = str(device)
+    if device.startswith('cuda'):
+        import torch
+        props = torch.cuda.get_device_properties(device)
+        return f'{device.split(":")[0]}-{props.name}-{round(props.total_memory / (1024 ** 3))}GB'
+    elif device.startswith('npu'):
+        import torch_npu
+        props = torch_npu.npu.get_device_properties(device)
+        return f'npu-{props.name}-{round(props.total_memory / (1024 ** 3))}GB'
+    elif device.startswith('cpu'):
+        import torch
+        # on cpu the best batch size depends on the threads the models can use
+        return f'cpu-{torch.get_num_threads()}threads'
+    return device
+
+
+class BatchSizeTuner:
+    def __init__(
+        self,
+        device_key: str,
+        cache_path: str | None = None,
+        max_batch_size: int = 64,
+        max_calibration_seconds: float = 30,
+        clean_memory_fn: Callable | None = None,
+    ):
+        """Find the batch size of every model by timing short calibration
+        runs with growing batch sizes, the batch size with the best throughput
+        is kept in the cache file per device and model.
+
+        Args:
+            device_key (str): the key of the device, see `get_device_key`
+            cache_path (str | None, optional): the cache file. Defaults to None, which means use `get_batch_size_cache_path()`
+            max_batch_size (int, optional): the largest batch size tried. Defaults to 64.
+            max_calibration_seconds (float, optional): stop growing the batch size once a calibration run
+                takes longer than this. Defaults to 30.
+            clean_memory_fn (Callable | None, optional): release the device memory after an out of memory error.
+                Defaults to None.
+        """
+        self.device_key = device_key
+        self.cache_path = get_batch_size_cache_path() if cache_path is None else cache_path
+        self.max_batch_size = max_batch_size
+        self.max_calibration_seconds = max_calibration_seconds
+        self._clean_memory_fn = clean_memory_fn
+        self._lock = threading.Lock()
+        self._batch_sizes = self._load().get(device_key, {})
+
+    def get(self, model_key: str) -> int | None:
+        """The tuned batch size of the model, None if not tuned."""
+        return self._batch_sizes.get(model_key)
+
+    def tune(self, model_key: str, run_fn: Callable, sample, max_batch_size: int | None = None) -> int:
+        """Tune the batch size of the model unless it is cached.
+
+        Args:
+            model_key (str): the key of the model in the cache
+            run_fn (Callable): run the model on a list of inputs as one batch
+            sample (Any): a representative input, the calibration batches repeat it
+            max_batch_size (int | None, optional): override the largest batch size tried. Defaults to None.
+
+        Returns:
+            int: the batch size
+        """
+        batch_size = self.get(model_key)
+        if batch_size is not None:
+            return batch_size
+
+        max_batch_size = self.max_batch_size if max_batch_size is None else max_batch_size
+        best_batch_size, best_throughput = 1, 0.0
+        batch_size = 1
+        while batch_size <= max_batch_size:
+            batch = [sample] * batch_size
+            try:
+                # the first run warms up the kernels of the batch shape
+                run_fn(batch)
+                start = time.time()
+                run_fn(batch)
+                elapsed = max(time.time() - start, 1e-6)
+            except Exception as e:  # noqa: BLE001
+                if not is_oom_error(e):
+                    raise
+                logger.warning(f'{model_key} out of memory at batch size {batch_size} while tuning')
+                self._clean_memory()
+                break
+            throughput = batch_size / elapsed
+            logger.info(f'{model_key} batch size {batch_size}: {round(throughput, 2)} items/second')
+            if throughput < best_throughput * (1 + MIN_THROUGHPUT_GAIN):
+                break
+            best_batch_size, best_throughput = batch_size, throughput
+            if elapsed > self.max_calibration_seconds:
+                break
+            batch_size *= 2
+
+        logger.info(f'{model_key} tuned batch size on {self.device_key}: {best_batch_size}')
+        self._set(model_key, best_batch_size)
+        return best_batch_size
+
+    def run_with_backoff(self, model_key: str, fn: Callable, batch_size: int):
+        """Call fn(batch_size), halve the batch size and retry on out of
+        memory errors, the reduced batch size is kept in the cache.
+
+        Args:
+            model_key (str): the key of the model in the cache
+            fn (Callable): run the model with the batch size
+            batch_size (int): the batch size of the first try
+
+        Returns:
+            Any: the result of fn
+        """
+        while True:
+            try:
+                return fn(batch_size)
+            except Exception as e:  # noqa: BLE001
+                if not is_oom_error(e) or batch_size <= 1:
+                    raise
+                self._clean_memory()
+                batch_size = max(batch_size // 2, 1)
+                logger.warning(f'{model_key} out of memory, back off to batch size {batch_size}')
+                self._set(model_key, batch_size)
+
+    def _clean_memory(self):
+        if self._clean_memory_fn is not None:
+            self._clean_memory_fn()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _set(self, model_key: str, batch_size: int):
+        with self._lock:
+            self._batch_sizes[model_key] = batch_size
+            # merge with the cache written by other processes
+            cache = self._load()
+            cache.setdefault(self.device_key, {}).update(self._batch_sizes)
+            try:
+                os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+                tmp_path = f'{self.cache_path}.{os.getpid()}.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(cache, f, indent=4)
+                os.replace(tmp_path, self.cache_path)
+            except OSError as e:
+                logger.warning(f'failed to save the batch sizes to {self.cache_path}: {e}')
+
+
+def get_batch_size_tuner(device, batch_ratio: int = 1) -> BatchSizeTuner | None:
+    """The tuner of the batch sizes on the device, None unless the tuning
+    is enabled by the env `MINERU_BATCH_SIZE_AUTOTUNE=true`. The first run on
+    a device then spends time calibrating and writes the batch sizes to
+    `get_batch_size_cache_path()`.
+
+    Args:
+        device (str): the device of the models
+        batch_ratio (int, optional): the memory scaled multiplier of the base batch sizes on a gpu, a gpu with
+            less memory tries smaller batch sizes, which keeps its calibration short. Defaults to 1.
+
+    Returns:
+        BatchSizeTuner | None: the tuner
+    """
+    if os.getenv('MINERU_BATCH_SIZE_AUTOTUNE', 'false').lower() not in ('1', 'true'):
+        return None
+    from magic_pdf.libs.clean_memory import clean_memory
+    # on cpu the throughput saturates with small batches, keep the calibration short
+    max_batch_size = 16 if str(device).startswith('cpu') else min(64, max(batch_ratio, 1) * 4)
+    return BatchSizeTuner(
+        get_device_key(device), max_batch_size=max_batch_size, clean_memory_fn=lambda: clean_memory(device)
+    )
@@ -0,0 +1,116 @@
+import json
+
+from loguru import logger
+
+from magic_pdf.data.data_reader_writer import DataReader, DataWriter
+from magic_pdf.data.dataset import Dataset
+from magic_pdf.libs.hash_utils import compute_sha256
+
+# completed pages persisted at once
+CHECKPOINT_INTERVAL = 16
+
+
+def get_checkpoint_key(dataset: Dataset, fingerprint: str, formula_flags: list, text_lines: list) -> str:
+    """The identity of the document and the models a checkpoint of
+    doc_analyze is made with, a checkpoint is resumed only with the same key.
+    The document is identified by `Dataset.data_md5`, which for a page range
+    view combines the md5 of the source pdf with the selected pages, so the
+    ranged runs of a document resume as well.
+
+    Args:
+        dataset (Dataset): the document
+        fingerprint (str): the fingerprint of the models, see `get_model_fingerprint`
+        formula_flags (list): the formula flag of every analyzed page
+        text_lines (list): the text layer lines of every analyzed page
+
+    Returns:
+        str: the key
+    """
+    return compute_sha256(json.dumps([dataset.data_md5(), fingerprint, formula_flags, text_lines]))
+
+
+class DocAnalyzeCheckpoint:
+    def __init__(self, writer: DataWriter, reader: DataReader, path: str, interval: int = CHECKPOINT_INTERVAL):
+        """Persist the model results of the completed pages of doc_analyze, so
+        a rerun of the same document with the same models resumes after the
+        last persisted page.
+
+        Every interval completed pages are written as a new segment file
+        `{path}/pages_{n}.json`, then the manifest `{path}/checkpoint.json`
+        listing the segments is rewritten, so a crash never leaves a
+        manifest pointing to a missing segment and the bytes written stay
+        linear in the number of pages.
+
+        Args:
+            writer (DataWriter): the writer of the checkpoint files
+            reader (DataReader): the reader of the same location as writer
+            path (str): the directory of the checkpoint files relative to writer and reader
+            interval (int, optional): the completed pages persisted at once. Defaults to CHECKPOINT_INTERVAL.
+        """
+        self.writer = writer
+        self.reader = reader
+        self.path = path
+        self.interval = max(interval, 1)
+        self._key = None
+        self._segments = []
+        self._pending = {}
+
+    @property
+    def manifest_path(self) -> str:
+        return f'{self.path}/checkpoint.json'
+
+    def load(self, key: str) -> dict:
+        """Load the completed pages of the checkpoint made with the same key,
+        a checkpoint of another key is discarded.
+
+        Args:
+            key (str): the identity of the document and the models, see `get_checkpoint_key`
+
+        Returns:
+            dict: page index -> layout_dets of the completed pages
+        """
+        self._key = key
+        self._segments = []
+        self._pending = {}
+        try:
+            manifest = json.loads(self.reader.read(self.manifest_path).decode('utf-8'))
+        except Exception:  # noqa: BLE001
+            # 没有checkpoint或者checkpoint不可读，从头开始
+            return {}
+        if manifest.get('key') != key:
+            logger.warning(f'checkpoint {self.manifest_path} is made with another document or models, start over')
+            return {}
+
+        completed = {}
+        for segment in manifest['segments']:
+            pages = json.loads(self.reader.read(f'{self.path}/{segment}').decode('utf-8'))
+            completed.update({int(index): layout_dets for index, layout_dets in pages.items()})
+        self._segments = list(manifest['segments'])
+        logger.info(f'resume from checkpoint {self.manifest_path}, {len(completed)} pages are completed')
+        return completed
+
+    def add(self, index: int, layout_dets: list):
+        """Add the model result of a completed page, the pending pages are
+        persisted every interval pages.
+
+        Args:
+            index (int): the index of the page in the dataset
+            layout_dets (list): the model result of the page
+        """
+        # serialized right away, the caller may modify layout_dets afterwards
+        self._pending[index] = json.dumps(layout_dets, ensure_ascii=False)
+        if len(self._pending) >= self.interval:
+            self.flush()
+
+    def flush(self):
+        """Persist the pending pages."""
+        if not self._pending:
+            return
+        segment = f'pages_{len(self._segments)}.json'
+        self.writer.write_string(
+            f'{self.path}/{segment}',
+            '{' + ','.join(f'"{index}":{layout_dets}' for index, layout_dets in self._pending.items()) + '}',
+        )
+        self._segments.append(segment)
+        self.writer.write_string(self.manifest_path, json.dumps({'key': self._key, 'segments': self._segments}))
+        self._pending = {}
@@ -1,5 +1,9 @@
+import copy
+import json
 import os
 import time
+from collections import Counter
+from typing import Iterator
 
 # 关闭paddle的信号处理
 import paddle
@@ -7,7 +11,7 @@ import torch
 from loguru import logger
 
 from magic_pdf.model.batch_analyze import BatchAnalyze
-from magic_pdf.model.sub_modules.model_utils import get_vram
+from magic_pdf.model.batch_size_tuner import get_batch_size_tuner
 
 paddle.disable_signal_handler()
 
@@ -22,16 +26,219 @@ except ImportError:
     pass
 
 import magic_pdf.model as model_config
+from magic_pdf.config.constants import DOC_ANALYZE_WINDOW_SIZE
 from magic_pdf.data.dataset import Dataset
+from magic_pdf.data.pyramid import PagePyramid
+from magic_pdf.data.utils import fitz_doc_to_image, iter_images_from_pdf
+from magic_pdf.filter.pdf_math_scan import page_may_contain_math
 from magic_pdf.libs.clean_memory import clean_memory
+from magic_pdf.libs.hash_utils import compute_sha256
+from magic_pdf.libs.version import __version__
 from magic_pdf.libs.config_reader import (get_device, get_formula_config,
                                           get_layout_config,
                                           get_local_models_dir,
                                           get_table_recog_config)
+from magic_pdf.model.checkpoint import (DocAnalyzeCheckpoint,
+                                         get_checkpoint_key)
 from magic_pdf.model.model_list import MODEL
+from magic_pdf.model.page_cache import (PageCache, compute_page_hash,
+                                        compute_page_key, get_page_cache,
+                                        get_page_cache_enable)
+from magic_pdf.model.page_shard import analyze_pages_sharded, get_page_kwargs
+from magic_pdf.model.sub_modules.model_utils import get_vram
+from magic_pdf.model.sub_modules.ocr.text_layer import get_page_text_lines
+from magic_pdf.model.sub_modules.table.table_utils import TableTimeBudget
 from magic_pdf.operators.models import InferenceResult
 
 
+def get_doc_analyze_window_size() -> int:
+    """The default number of pages rasterized and inferred at once in batch
+    mode, can be overridden by the env `MINERU_DOC_ANALYZE_WINDOW_SIZE`,
+    0 means all pages at once."""
+    return int(os.getenv('MINERU_DOC_ANALYZE_WINDOW_SIZE', DOC_ANALYZE_WINDOW_SIZE))
+
+
+def get_render_workers() -> int:
+    """The default number of processes rendering the pages in batch mode, can
+    be overridden by the env `MINERU_RENDER_WORKERS`, 0 means render in the
+    current process."""
+    return int(os.getenv('MINERU_RENDER_WORKERS', 0))
+
+
+def get_doc_analyze_processes() -> int:
+    """The default number of worker processes doc_analyze shards the pages
+    across on cpu, can be overridden by the env `MINERU_DOC_ANALYZE_PROCESSES`,
+    0 means analyze in the current process."""
+    return int(os.getenv('MINERU_DOC_ANALYZE_PROCESSES', 0))
+
+
+def get_page_pyramid() -> bool:
+    """Whether to render every page at the resolution each model stage
+    consumes in batch mode by default, can be overridden by the env
+    `MINERU_PAGE_PYRAMID`."""
+    return os.getenv('MINERU_PAGE_PYRAMID', 'false').lower() in ('1', 'true')
+
+
+def get_table_time_budget() -> float:
+    """The seconds the table recognition of one document may take in batch
+    mode, unlimited unless set by the env `MINERU_TABLE_TIME_BUDGET`, 0 means
+    unlimited."""
+    return float(os.getenv('MINERU_TABLE_TIME_BUDGET', 0))
+
+
+def get_formula_page_filter() -> bool:
+    """Whether to skip the formula detection and recognition on the pages
+    whose text layer shows no sign of math in txt mode, off by default since
+    formulas drawn as vector paths or images leave no sign in the text layer,
+    can be enabled by the env `MINERU_FORMULA_PAGE_FILTER=true`."""
+    return os.getenv('MINERU_FORMULA_PAGE_FILTER', 'false').lower() in ('1', 'true')
+
+
+def get_formula_flags(pages: list, ocr: bool, formula_enable=None, formula_page_filter=None) -> list[bool] | None:
+    """Whether each page may contain formulas, judged from the text layer by
+    `page_may_contain_math`, the number of skipped pages is logged.
+
+    Args:
+        pages (list): the pages of the datasets
+        ocr (bool): whether the text is recognized by ocr, the text layer is not trusted in ocr mode
+        formula_enable (bool, optional): override the formula switch in config. Defaults to None.
+        formula_page_filter (bool, optional): whether to filter the pages. Defaults to None,
+            which means use `get_formula_page_filter()`
+
+    Returns:
+        list[bool] | None: None if every page goes through the formula models
+    """
+    formula_page_filter = get_formula_page_filter() if formula_page_filter is None else formula_page_filter
+    formula_enable = get_formula_config().get('enable', True) if formula_enable is None else formula_enable
+    # the lite mode has no formula models
+    if ocr or not formula_page_filter or not formula_enable or model_config.__model_mode__ != 'full':
+        return None
+    formula_flags = [page_may_contain_math(page.get_doc()) for page in pages]
+    logger.info(
+        f'formula detection skipped on {formula_flags.count(False)} of {len(formula_flags)} pages'
+        f' without math in the text layer'
+    )
+    return formula_flags
+
+
+def get_text_layer_det() -> bool:
+    """Whether the text regions covered by the pdf text layer take their
+    lines from the text layer instead of the ocr text detection in txt mode by
+    default, can be set by the env `MINERU_TEXT_LAYER_DET`."""
+    return os.getenv('MINERU_TEXT_LAYER_DET', 'false').lower() in ('1', 'true')
+
+
+def get_text_lines(pages: list, ocr: bool, text_layer_det=None) -> list[list] | None:
+    """The line boxes of the text layer of each page on its page image, see
+    `get_page_text_lines`.
+
+    Args:
+        pages (list): the pages of the datasets
+        ocr (bool): whether the text is recognized by ocr, the text layer is not trusted in ocr mode
+        text_layer_det (bool, optional): whether to take the lines from the text layer. Defaults to None,
+            which means use `get_text_layer_det()`
+
+    Returns:
+        list[list] | None: None if the text of every page is detected by ocr
+    """
+    text_layer_det = get_text_layer_det() if text_layer_det is None else text_layer_det
+    if ocr or not text_layer_det or model_config.__model_mode__ != 'full':
+        return None
+    text_lines = []
+    for page in pages:
+        page_width, _ = page.get_image_size()
+        text_lines.append(get_page_text_lines(page.get_doc(), page_width / page.get_doc().rect.width))
+    logger.info(
+        f'text layer lines found on {sum(1 for page_lines in text_lines if page_lines)} of {len(text_lines)} pages,'
+        f' only their regions without text layer are detected by ocr'
+    )
+    return text_lines
+
+
+def get_model_fingerprint(ocr: bool, lang=None, layout_model=None, formula_enable=None, table_enable=None) -> str:
+    """The fingerprint of the models and the config the pages are analyzed
+    with, the page cache keeps the results of different fingerprints apart."""
+    layout_config = get_layout_config()
+    if layout_model is not None:
+        layout_config['model'] = layout_model
+    formula_config = get_formula_config()
+    if formula_enable is not None:
+        formula_config['enable'] = formula_enable
+    table_config = get_table_recog_config()
+    if table_enable is not None:
+        table_config['enable'] = table_enable
+    return compute_sha256(json.dumps({
+        'version': __version__,
+        'mode': model_config.__model_mode__,
+        'models_dir': get_local_models_dir(),
+        'ocr': ocr,
+        'lang': lang,
+        'layout': layout_config,
+        'formula': formula_config,
+        'table': table_config,
+    }, sort_keys=True, default=str))
+
+
+def lookup_page_cache(
+    page_cache: PageCache, pages: list, fingerprint: str, formula_flags: list, text_lines: list
+) -> tuple[list[str], dict, list[int]]:
+    """Look up the pages in the page cache, a page repeated in pages is
+    analyzed once.
+
+    Args:
+        page_cache (PageCache): the page cache
+        pages (list): the pages to analyze
+        fingerprint (str): see `get_model_fingerprint`
+        formula_flags (list): the formula flag of every page, part of the key
+        text_lines (list): the text layer lines of every page, part of the key
+
+    Returns:
+        tuple[list[str], dict, list[int]]: the key of every page, key -> cached layout_dets,
+            the positions in pages to analyze
+    """
+    # 同一文档的页面共用字体、图片的哈希
+    resource_hashes = {}
+    keys = [
+        compute_page_key(
+            compute_page_hash(page.get_doc(), resource_hashes=resource_hashes),
+            fingerprint,
+            [formula_flag, page_text_lines],
+        )
+        for page, formula_flag, page_text_lines in zip(pages, formula_flags, text_lines)
+    ]
+    cached = page_cache.get_many(keys)
+    seen = set(cached)
+    infer_positions = []
+    for position, key in enumerate(keys):
+        if key not in seen:
+            seen.add(key)
+            infer_positions.append(position)
+    logger.info(
+        f'page cache: {len(pages) - len(infer_positions)} of {len(pages)} pages are cached or repeated,'
+        f' {len(infer_positions)} pages to analyze'
+    )
+    return keys, cached, infer_positions
+
+
+def _iter_cached(
+    keys: list[str], cached: dict, analyze_result: Iterator[list], page_cache: PageCache, table_enable: bool
+) -> Iterator[list]:
+    # the results of the analyzed pages which are repeated later
+    repeated = {key for key, count in Counter(keys).items() if count > 1}
+    known = dict(cached)
+    for key in keys:
+        if key in known:
+            yield copy.deepcopy(known[key])
+            continue
+        result = next(analyze_result)
+        # the tables skipped by the time budget or failed are analyzed again next time
+        if not table_enable or all('html' in res for res in result if res.get('category_id') == 5):
+            page_cache.put(key, result)
+        if key in repeated:
+            known[key] = copy.deepcopy(result)
+        yield result
+
+
 def dict_compare(d1, d2):
     return d1.items() == d2.items()
 
@@ -146,6 +353,115 @@ def custom_model_init(
     return custom_model
 
 
+def get_cpu_batch_analyze() -> bool:
+    """Whether to analyze the pages by BatchAnalyze on cpu, off by default and
+    enabled by the env `MINERU_CPU_BATCH_ANALYZE=true`. The batch mode sets the
+    torch threads of the whole process, see `get_cpu_torch_threads`."""
+    return os.getenv('MINERU_CPU_BATCH_ANALYZE', 'false').lower() in ('1', 'true')
+
+
+def get_cpu_ocr_workers() -> int:
+    """The number of ocr workers of BatchAnalyze on cpu, every worker holds
+    its own ocr model, can be overridden by the env `MINERU_CPU_OCR_WORKERS`."""
+    return int(os.getenv('MINERU_CPU_OCR_WORKERS', max(1, min(4, (os.cpu_count() or 1) // 8))))
+
+
+def get_cpu_torch_threads() -> int:
+    """The intra-op threads of the torch models in the cpu batch mode, half of
+    the cores by default so the ocr and table stages running alongside the
+    detectors keep the other half, can be overridden by the env
+    `MINERU_CPU_TORCH_THREADS`."""
+    return int(os.getenv('MINERU_CPU_TORCH_THREADS', max(1, (os.cpu_count() or 1) // 2)))
+
+
+_cpu_torch_threads_set = False
+
+
+def set_cpu_torch_threads():
+    """Set the torch threads of the process for the cpu batch mode once, the
+    setting applies to the whole process, so a later change of the threads by
+    the host application is not overridden."""
+    global _cpu_torch_threads_set
+    if not _cpu_torch_threads_set:
+        torch.set_num_threads(get_cpu_torch_threads())
+        _cpu_torch_threads_set = True
+
+
+def get_gpu_batch_ratio(device) -> int:
+    """The multiplier of the base batch sizes on the gpu, scaled by its
+    memory in GB, which can be overridden by the env `VIRTUAL_VRAM_SIZE`.
+
+    Returns:
+        int: 0 if the gpu has less than 8GB, the batch mode is not used then
+    """
+    gpu_memory = int(os.getenv('VIRTUAL_VRAM_SIZE', round(get_vram(device) or 0)))
+    if gpu_memory < 8:
+        batch_ratio = 0
+    elif gpu_memory < 10:
+        batch_ratio = 2
+    elif gpu_memory <= 12:
+        batch_ratio = 4
+    elif gpu_memory <= 16:
+        batch_ratio = 8
+    elif gpu_memory <= 24:
+        batch_ratio = 16
+    else:
+        batch_ratio = 32
+    return batch_ratio
+
+
+def is_batch_analyze_supported(device) -> bool:
+    """Whether the pages can be analyzed by BatchAnalyze on the device, a
+    gpu needs at least 8GB of memory."""
+    if str(device).startswith('cpu'):
+        return get_cpu_batch_analyze()
+
+    npu_support = False
+    if str(device).startswith("npu"):
+        import torch_npu
+        if torch_npu.npu.is_available():
+            npu_support = True
+
+    if not (torch.cuda.is_available() and device != 'cpu' or npu_support):
+        return False
+    return get_gpu_batch_ratio(device) > 0
+
+
+def get_batch_model(custom_model, device) -> BatchAnalyze | None:
+    """The BatchAnalyze of custom_model, its batch sizes are scaled by the
+    gpu memory, or tuned on the device by the measured autotuner if
+    `MINERU_BATCH_SIZE_AUTOTUNE=true`. On cpu the batch
+    mode is used only if `get_cpu_batch_analyze()`, the torch threads of the
+    process are set to `get_cpu_torch_threads()` once and the ocr stage runs
+    `get_cpu_ocr_workers()` workers.
+
+    Args:
+        custom_model (CustomPEKModel): the models
+        device (str): the device of the models
+
+    Returns:
+        BatchAnalyze | None: None if the batch mode is not supported on the device
+    """
+    if not is_batch_analyze_supported(device):
+        return None
+    stage_workers = None
+    batch_ratio = 1
+    if str(device).startswith('cpu'):
+        set_cpu_torch_threads()
+        stage_workers = {'ocr': get_cpu_ocr_workers()}
+        logger.info(f'cpu batch analyze, torch threads: {torch.get_num_threads()}, ocr workers: {stage_workers["ocr"]}')
+    else:
+        batch_ratio = get_gpu_batch_ratio(device)
+        logger.info(f'gpu batch analyze, batch_ratio: {batch_ratio}')
+    return BatchAnalyze(
+        model=custom_model,
+        batch_ratio=batch_ratio,
+        stage_workers=stage_workers,
+        tuner=get_batch_size_tuner(device, batch_ratio),
+        table_time_budget=get_table_time_budget(),
+    )
+
+
 def doc_analyze(
     dataset: Dataset,
     ocr: bool = False,
@@ -156,101 +472,399 @@ def doc_analyze(
     layout_model=None,
     formula_enable=None,
     table_enable=None,
+    window_size=None,
+    render_workers=None,
+    page_pyramid=None,
+    num_processes=None,
+    formula_page_filter=None,
+    text_layer_det=None,
+    use_page_cache=None,
+    checkpoint: DocAnalyzeCheckpoint | None = None,
 ) -> InferenceResult:
-
+    """Run the models over the pages of dataset.
+
+    Args:
+        dataset (Dataset): the dataset to analyze
+        ocr (bool, optional): whether to recognize the text by ocr. Defaults to False.
+        show_log (bool, optional): whether to show the log of ocr model. Defaults to False.
+        start_page_id (int, optional): the first page to analyze. Defaults to 0.
+        end_page_id (int, optional): the last page to analyze. Defaults to None, which means the last page.
+        lang (str, optional): the language of ocr model. Defaults to None.
+        layout_model (str, optional): override the layout model in config. Defaults to None.
+        formula_enable (bool, optional): override the formula switch in config. Defaults to None.
+        table_enable (bool, optional): override the table switch in config. Defaults to None.
+        window_size (int, optional): pages rasterized, inferred and released at once in batch mode,
+            bounds the peak memory regardless of the page count, 0 means all pages at once.
+            Defaults to None, which means use `get_doc_analyze_window_size()`
+        render_workers (int, optional): render the pages in a process pool of render_workers processes in batch mode,
+            overlapping the rendering of the next window with the inference of the current one, 0 means render
+            in the current process. Defaults to None, which means use `get_render_workers()`
+        page_pyramid (bool, optional): render every page directly at the resolution each stage consumes in batch mode,
+            the layout and formula detection get downscaled renders and ocr, formula and table recognition render
+            only their regions, takes precedence over render_workers. Defaults to None, which means use `get_page_pyramid()`
+        num_processes (int, optional): shard the pages across num_processes worker processes, every worker holds its
+            own models and gets the page images through shared memory, meant for large cpu nodes where one process
+            is bound by the GIL, ignored on other devices, 0 means analyze in the current process. Defaults to None,
+            which means use `get_doc_analyze_processes()`
+        formula_page_filter (bool, optional): skip the formula detection and recognition on the pages whose text
+            layer shows no sign of math, ignored in ocr mode. Defaults to None, which means use
+            `get_formula_page_filter()`
+        text_layer_det (bool, optional): take the text lines of the regions covered by the pdf text layer from the
+            text layer instead of the ocr text detection, ignored in ocr mode. Defaults to None, which means use
+            `get_text_layer_det()`
+        use_page_cache (bool, optional): take the results of the pages analyzed before with the same models and
+            config from the page cache and cache the new ones. Defaults to None, which means use
+            `get_page_cache_enable()`, off unless `MINERU_PAGE_CACHE` is set
+        checkpoint (DocAnalyzeCheckpoint | None, optional): persist the results of the completed pages and resume
+            from the pages completed by an earlier run of the same document and models. Defaults to None.
+
+    Returns:
+        InferenceResult: the model result of every page, the pages out of range get empty layout_dets
+    """
     end_page_id = end_page_id if end_page_id else len(dataset) - 1
+    doc_analyze_start = time.time()
 
-    model_manager = ModelSingleton()
-    custom_model = model_manager.get_model(
-        ocr, show_log, lang, layout_model, formula_enable, table_enable
-    )
+    model_json = list(doc_analyze_iter(
+        dataset,
+        ocr=ocr,
+        show_log=show_log,
+        start_page_id=start_page_id,
+        end_page_id=end_page_id,
+        lang=lang,
+        layout_model=layout_model,
+        formula_enable=formula_enable,
+        table_enable=table_enable,
+        window_size=window_size,
+        render_workers=render_workers,
+        page_pyramid=page_pyramid,
+        num_processes=num_processes,
+        formula_page_filter=formula_page_filter,
+        text_layer_det=text_layer_det,
+        use_page_cache=use_page_cache,
+        checkpoint=checkpoint,
+    ))
 
-    batch_analyze = False
-    device = get_device()
+    gc_start = time.time()
+    clean_memory(get_device())
+    gc_time = round(time.time() - gc_start, 2)
+    logger.info(f'gc time: {gc_time}')
 
-    npu_support = False
-    if str(device).startswith("npu"):
-        import torch_npu
-        if torch_npu.npu.is_available():
-            npu_support = True
+    doc_analyze_time = round(time.time() - doc_analyze_start, 2)
+    doc_analyze_speed = round((end_page_id + 1 - start_page_id) / max(doc_analyze_time, 0.01), 2)
+    logger.info(
+        f'doc analyze time: {doc_analyze_time},'
+        f' speed: {doc_analyze_speed} pages/second'
+    )
 
-    if torch.cuda.is_available() and device != 'cpu' or npu_support:
-        gpu_memory = int(os.getenv("VIRTUAL_VRAM_SIZE", round(get_vram(device))))
-        if gpu_memory is not None and gpu_memory >= 8:
-
-            if 8 <= gpu_memory < 10:
-                batch_ratio = 2
-            elif 10 <= gpu_memory <= 12:
-                batch_ratio = 4
-            elif 12 < gpu_memory <= 16:
-                batch_ratio = 8
-            elif 16 < gpu_memory <= 24:
-                batch_ratio = 16
-            else:
-                batch_ratio = 32
-
-            if batch_ratio >= 1:
-                logger.info(f'gpu_memory: {gpu_memory} GB, batch_ratio: {batch_ratio}')
-                batch_model = BatchAnalyze(model=custom_model, batch_ratio=batch_ratio)
-                batch_analyze = True
-
-    model_json = []
-    doc_analyze_start = time.time()
+    return InferenceResult(model_json, dataset)
 
-    if batch_analyze:
-        # batch analyze
-        images = []
-        for index in range(len(dataset)):
-            if start_page_id <= index <= end_page_id:
-                page_data = dataset.get_page(index)
-                img_dict = page_data.get_image()
-                images.append(img_dict['img'])
-        analyze_result = batch_model(images)
 
-        for index in range(len(dataset)):
-            page_data = dataset.get_page(index)
-            img_dict = page_data.get_image()
-            page_width = img_dict['width']
-            page_height = img_dict['height']
-            if start_page_id <= index <= end_page_id:
-                result = analyze_result.pop(0)
-            else:
-                result = []
+def doc_analyze_iter(
+    dataset: Dataset,
+    ocr: bool = False,
+    show_log: bool = False,
+    start_page_id=0,
+    end_page_id=None,
+    lang=None,
+    layout_model=None,
+    formula_enable=None,
+    table_enable=None,
+    window_size=None,
+    render_workers=None,
+    page_pyramid=None,
+    num_processes=None,
+    formula_page_filter=None,
+    text_layer_det=None,
+    use_page_cache=None,
+    checkpoint: DocAnalyzeCheckpoint | None = None,
+) -> Iterator[dict]:
+    """Run the models over the pages of dataset and yield the model result of
+    every page as soon as its window is inferred, the arguments are the same
+    as `doc_analyze`. A smaller window_size yields the first pages sooner, in
+    sharded mode the pages are yielded after all shards are done.
+
+    Yields:
+        dict: {'layout_dets': [...], 'page_info': {'page_no', 'height', 'width'}} of every page in page order,
+            the pages out of range get empty layout_dets
+    """
+    end_page_id = end_page_id if end_page_id else len(dataset) - 1
+    window_size = get_doc_analyze_window_size() if window_size is None else window_size
+    render_workers = get_render_workers() if render_workers is None else render_workers
+    page_pyramid = get_page_pyramid() if page_pyramid is None else page_pyramid
+    num_processes = get_doc_analyze_processes() if num_processes is None else num_processes
+    if num_processes > 1 and not str(get_device()).startswith('cpu'):
+        # 每个进程都加载全部模型，多进程在显卡上会显存不足
+        logger.warning(
+            f'sharding the pages across processes is only supported on cpu, '
+            f'analyze in the current process on {get_device()}'
+        )
+        num_processes = 0
 
-            page_info = {'page_no': index, 'height': page_height, 'width': page_width}
-            page_dict = {'layout_dets': result, 'page_info': page_info}
-            model_json.append(page_dict)
+    use_page_cache = get_page_cache_enable() if use_page_cache is None else use_page_cache
 
+    model_kwargs = dict(
+        ocr=ocr,
+        show_log=show_log,
+        lang=lang,
+        layout_model=layout_model,
+        formula_enable=formula_enable,
+        table_enable=table_enable,
+    )
+
+    page_ids = [
+        index for index in range(len(dataset)) if start_page_id <= index <= end_page_id
+    ]
+    if window_size <= 0:
+        window_size = max(len(page_ids), 1)
+    pages = [dataset.get_page(index) for index in page_ids]
+    formula_flags = get_formula_flags(pages, ocr, formula_enable, formula_page_filter)
+    if formula_flags is None:
+        formula_flags = [True] * len(page_ids)
+    text_lines = get_text_lines(pages, ocr, text_layer_det)
+    if text_lines is None:
+        text_lines = [None] * len(page_ids)
+    fingerprint = get_model_fingerprint(ocr, lang, layout_model, formula_enable, table_enable)
+
+    completed = {}
+    if checkpoint is not None:
+        completed = checkpoint.load(get_checkpoint_key(dataset, fingerprint, formula_flags, text_lines))
+        # the pages completed by the earlier run are not analyzed again
+        remaining = [position for position, index in enumerate(page_ids) if index not in completed]
+        page_ids = [page_ids[position] for position in remaining]
+        pages = [pages[position] for position in remaining]
+        formula_flags = [formula_flags[position] for position in remaining]
+        text_lines = [text_lines[position] for position in remaining]
+
+    if use_page_cache:
+        page_cache = get_page_cache()
+        keys, cached, infer_positions = lookup_page_cache(page_cache, pages, fingerprint, formula_flags, text_lines)
+        # only the pages missing from the cache are analyzed
+        page_ids = [page_ids[position] for position in infer_positions]
+        formula_flags = [formula_flags[position] for position in infer_positions]
+        text_lines = [text_lines[position] for position in infer_positions]
+
+    if not page_ids or num_processes > 1:
+        # the models are loaded by the worker processes only, or not at all when every page is cached
+        custom_model, batch_model = None, None
+    else:
+        custom_model = ModelSingleton().get_model(**model_kwargs)
+        batch_model = get_batch_model(custom_model, get_device())
+
+    if not page_ids:
+        analyze_result = iter([])
+    elif num_processes > 1:
+        # every worker process analyzes shards of the pages with its own models
+        analyze_result = iter(analyze_pages_sharded(
+            dataset,
+            page_ids,
+            num_processes,
+            model_kwargs,
+            # at most two shards per worker are in flight, bound them by the window
+            shard_size=max(window_size // (num_processes * 2), 1),
+            formula_flags=formula_flags,
+            text_lines=text_lines,
+            table_time_budget=get_table_time_budget(),
+        ))
+    elif batch_model is not None:
+        # batch analyze, rasterize, infer and release the pages window by window
+        if page_pyramid:
+            windows = (
+                [PagePyramid(dataset.get_page(index)) for index in page_ids[window_start: window_start + window_size]]
+                for window_start in range(0, len(page_ids), window_size)
+            )
+        elif render_workers > 1:
+            windows = (
+                [img_dict['img'] for img_dict in window_images]
+                for window_images in iter_images_from_pdf(
+                    dataset.data_bits(), page_ids, window_size=window_size, num_workers=render_workers
+                )
+            )
+        else:
+            windows = (
+                [dataset.get_page(index).get_image()['img'] for index in page_ids[window_start: window_start + window_size]]
+                for window_start in range(0, len(page_ids), window_size)
+            )
+        # the table time budget is shared by all windows of the document
+        table_budget = batch_model.new_table_budget()
+        analyze_result = (
+            layout_dets
+            for window_index, window_images in enumerate(windows)
+            for layout_dets in batch_model(
+                window_images,
+                table_budget=table_budget,
+                formula_flags=formula_flags[window_index * window_size: (window_index + 1) * window_size],
+                text_lines=text_lines[window_index * window_size: (window_index + 1) * window_size],
+            )
+        )
     else:
         # single analyze
+        analyze_result = _iter_single_analyze(dataset, page_ids, custom_model, formula_flags, text_lines)
+
+    if use_page_cache:
+        table_enable = get_table_recog_config().get('enable', False) if table_enable is None else table_enable
+        analyze_result = _iter_cached(keys, cached, analyze_result, page_cache, table_enable)
+
+    for index in range(len(dataset)):
+        page_data = dataset.get_page(index)
+        page_width, page_height = page_data.get_image_size()
+        if index in completed:
+            result = completed[index]
+        elif start_page_id <= index <= end_page_id:
+            result = next(analyze_result)
+            if checkpoint is not None:
+                checkpoint.add(index, result)
+        else:
+            result = []
 
-        for index in range(len(dataset)):
-            page_data = dataset.get_page(index)
-            img_dict = page_data.get_image()
-            img = img_dict['img']
-            page_width = img_dict['width']
-            page_height = img_dict['height']
-            if start_page_id <= index <= end_page_id:
-                page_start = time.time()
-                result = custom_model(img)
-                logger.info(f'-----page_id : {index}, page total time: {round(time.time() - page_start, 2)}-----')
-            else:
-                result = []
+        page_info = {'page_no': index, 'height': page_height, 'width': page_width}
+        yield {'layout_dets': result, 'page_info': page_info}
+
+    if checkpoint is not None:
+        checkpoint.flush()
+    if use_page_cache:
+        logger.info(f'page cache stats: {page_cache.stats()}')
+
+
+def _iter_single_analyze(
+    dataset: Dataset, page_ids: list[int], custom_model, formula_flags: list[bool], text_lines: list
+) -> Iterator[list]:
+    for index, formula_flag, page_text_lines in zip(page_ids, formula_flags, text_lines):
+        page_start = time.time()
+        result = custom_model(
+            dataset.get_page(index).get_image()['img'], **get_page_kwargs(formula_flag, page_text_lines)
+        )
+        logger.info(f'-----page_id : {index}, page total time: {round(time.time() - page_start, 2)}-----')
+        yield result
+
+
+def doc_analyze_many(
+    datasets: list[Dataset],
+    ocr: bool = False,
+    show_log: bool = False,
+    lang=None,
+    layout_model=None,
+    formula_enable=None,
+    table_enable=None,
+    window_size=None,
+    page_pyramid=None,
+    formula_page_filter=None,
+    text_layer_det=None,
+    use_page_cache=None,
+) -> list[InferenceResult]:
+    """Run the models over all pages of many datasets, the pages of different
+    datasets are packed into the same layout, formula, ocr and table batches,
+    so many small documents are inferred as efficiently as one long document.
+
+    Args:
+        datasets (list[Dataset]): the datasets to analyze, they share the same ocr language
+        ocr (bool, optional): whether to recognize the text by ocr. Defaults to False.
+        show_log (bool, optional): whether to show the log of ocr model. Defaults to False.
+        lang (str, optional): the language of ocr model. Defaults to None.
+        layout_model (str, optional): override the layout model in config. Defaults to None.
+        formula_enable (bool, optional): override the formula switch in config. Defaults to None.
+        table_enable (bool, optional): override the table switch in config. Defaults to None.
+        window_size (int, optional): pages rasterized, inferred and released at once in batch mode, the window
+            spans the datasets, 0 means all pages at once. Defaults to None, which means use `get_doc_analyze_window_size()`
+        page_pyramid (bool, optional): render every page directly at the resolution each stage consumes in batch mode.
+            Defaults to None, which means use `get_page_pyramid()`
+        formula_page_filter (bool, optional): skip the formula detection and recognition on the pages whose text
+            layer shows no sign of math, ignored in ocr mode. Defaults to None, which means use
+            `get_formula_page_filter()`
+        text_layer_det (bool, optional): take the text lines of the regions covered by the pdf text layer from the
+            text layer instead of the ocr text detection, ignored in ocr mode. Defaults to None, which means use
+            `get_text_layer_det()`
+        use_page_cache (bool, optional): take the results of the pages analyzed before with the same models and
+            config from the page cache, which also dedupes the pages repeated across the datasets.
+            Defaults to None, which means use `get_page_cache_enable()`, off unless `MINERU_PAGE_CACHE` is set
+
+    Returns:
+        list[InferenceResult]: the model result of every dataset, in the order of datasets
+    """
+    window_size = get_doc_analyze_window_size() if window_size is None else window_size
+    page_pyramid = get_page_pyramid() if page_pyramid is None else page_pyramid
+    use_page_cache = get_page_cache_enable() if use_page_cache is None else use_page_cache
+
+    all_pages = [
+        dataset.get_page(index) for dataset in datasets for index in range(len(dataset))
+    ]
+    pages = all_pages
+    if window_size <= 0:
+        window_size = max(len(pages), 1)
+    formula_flags = get_formula_flags(pages, ocr, formula_enable, formula_page_filter)
+    if formula_flags is None:
+        formula_flags = [True] * len(pages)
+    text_lines = get_text_lines(pages, ocr, text_layer_det)
+    if text_lines is None:
+        text_lines = [None] * len(pages)
 
+    doc_analyze_start = time.time()
+    if use_page_cache:
+        page_cache = get_page_cache()
+        keys, cached, infer_positions = lookup_page_cache(
+            page_cache,
+            pages,
+            get_model_fingerprint(ocr, lang, layout_model, formula_enable, table_enable),
+            formula_flags,
+            text_lines,
+        )
+        # only the pages missing from the cache are analyzed
+        pages = [pages[position] for position in infer_positions]
+        formula_flags = [formula_flags[position] for position in infer_positions]
+        text_lines = [text_lines[position] for position in infer_positions]
+
+    analyze_result = []
+    if pages:
+        model_manager = ModelSingleton()
+        custom_model = model_manager.get_model(
+            ocr, show_log, lang, layout_model, formula_enable, table_enable
+        )
+        batch_model = get_batch_model(custom_model, get_device())
+        if batch_model is not None:
+            # the windows span the datasets, every dataset adds its budget to the shared table time budget
+            table_budget = TableTimeBudget(batch_model.table_time_budget * len(datasets))
+            for window_start in range(0, len(pages), window_size):
+                window_pages = pages[window_start: window_start + window_size]
+                if page_pyramid:
+                    window_images = [PagePyramid(page) for page in window_pages]
+                else:
+                    # the images are used only once, render them without filling the image cache of every dataset
+                    window_images = [fitz_doc_to_image(page.get_doc())['img'] for page in window_pages]
+                analyze_result += batch_model(
+                    window_images,
+                    table_budget=table_budget,
+                    formula_flags=formula_flags[window_start: window_start + window_size],
+                    text_lines=text_lines[window_start: window_start + window_size],
+                )
+                del window_images
+        else:
+            for page, formula_flag, page_text_lines in zip(pages, formula_flags, text_lines):
+                analyze_result.append(custom_model(
+                    fitz_doc_to_image(page.get_doc())['img'], **get_page_kwargs(formula_flag, page_text_lines)
+                ))
+
+    analyze_result = iter(analyze_result)
+    if use_page_cache:
+        table_enable = get_table_recog_config().get('enable', False) if table_enable is None else table_enable
+        analyze_result = _iter_cached(keys, cached, analyze_result, page_cache, table_enable)
+    infer_results = []
+    for dataset in datasets:
+        model_json = []
+        for index in range(len(dataset)):
+            page_width, page_height = dataset.get_page(index).get_image_size()
             page_info = {'page_no': index, 'height': page_height, 'width': page_width}
-            page_dict = {'layout_dets': result, 'page_info': page_info}
-            model_json.append(page_dict)
+            model_json.append({'layout_dets': next(analyze_result), 'page_info': page_info})
+        infer_results.append(InferenceResult(model_json, dataset))
+    if use_page_cache:
+        logger.info(f'page cache stats: {page_cache.stats()}')
 
     gc_start = time.time()
     clean_memory(get_device())
-    gc_time = round(time.time() - gc_start, 2)
-    logger.info(f'gc time: {gc_time}')
+    logger.info(f'gc time: {round(time.time() - gc_start, 2)}')
 
     doc_analyze_time = round(time.time() - doc_analyze_start, 2)
-    doc_analyze_speed = round((end_page_id + 1 - start_page_id) / doc_analyze_time, 2)
     logger.info(
-        f'doc analyze time: {round(time.time() - doc_analyze_start, 2)},'
-        f' speed: {doc_analyze_speed} pages/second'
+        f'doc analyze time: {doc_analyze_time}, documents: {len(datasets)},'
+        f' speed: {round(len(all_pages) / max(doc_analyze_time, 0.01), 2)} pages/second'
     )
 
-    return InferenceResult(model_json, dataset)
+    return infer_results
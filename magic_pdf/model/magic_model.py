@@ -23,12 +23,12 @@ class PosRelationEnum(enum.Enum):
 class MagicModel:
     """每个函数没有得到元素的时候返回空list."""
 
-    def __fix_axis(self):
-        for model_page_info in self.__model_list:
+    def __fix_axis(self, model_list):
+        for model_page_info in model_list:
             need_remove_list = []
             page_no = model_page_info['page_info']['page_no']
             horizontal_scale_ratio, vertical_scale_ratio = get_scale_ratio(
-                model_page_info, self.__docs.get_page(page_no)
+                model_page_info, self.__page_infos[page_no]
             )
             layout_dets = model_page_info['layout_dets']
             for layout_det in layout_dets:
@@ -53,8 +53,8 @@ class MagicModel:
             for need_remove in need_remove_list:
                 layout_dets.remove(need_remove)
 
-    def __fix_by_remove_low_confidence(self):
-        for model_page_info in self.__model_list:
+    def __fix_by_remove_low_confidence(self, model_list):
+        for model_page_info in model_list:
             need_remove_list = []
             layout_dets = model_page_info['layout_dets']
             for layout_det in layout_dets:
@@ -65,8 +65,8 @@ class MagicModel:
             for need_remove in need_remove_list:
                 layout_dets.remove(need_remove)
 
-    def __fix_by_remove_high_iou_and_low_confidence(self):
-        for model_page_info in self.__model_list:
+    def __fix_by_remove_high_iou_and_low_confidence(self, model_list):
+        for model_page_info in model_list:
             need_remove_list = []
             layout_dets = model_page_info['layout_dets']
             for layout_det1 in layout_dets:
@@ -106,13 +106,28 @@ class MagicModel:
     def __init__(self, model_list: list, docs: Dataset):
         self.__model_list = model_list
         self.__docs = docs
+        self.__page_infos = docs.get_page_infos()
+        self.__fix(self.__model_list)
+
+    def __fix(self, model_list: list):
         """为所有模型数据添加bbox信息(缩放，poly->bbox)"""
-        self.__fix_axis()
+        self.__fix_axis(model_list)
         """删除置信度特别低的模型数据(<0.05),提高质量"""
-        self.__fix_by_remove_low_confidence()
+        self.__fix_by_remove_low_confidence(model_list)
         """删除高iou(>0.9)数据中置信度较低的那个"""
-        self.__fix_by_remove_high_iou_and_low_confidence()
-        self.__fix_footnote()
+        self.__fix_by_remove_high_iou_and_low_confidence(model_list)
+        self.__fix_footnote(model_list)
+
+    def set_page(self, page_no: int, model_page_info: dict):
+        """Replace the model result of one page, e.g. when the pages are
+        parsed as soon as their inference finishes.
+
+        Args:
+            page_no (int): the page index
+            model_page_info (dict): the model result of the page, {'layout_dets': [...], 'page_info': {...}}
+        """
+        self.__fix([model_page_info])
+        self.__model_list[page_no] = model_page_info
 
     def _bbox_distance(self, bbox1, bbox2):
         left, right, bottom, top = bbox_relative_pos(bbox1, bbox2)
@@ -132,9 +147,9 @@ class MagicModel:
 
         return bbox_distance(bbox1, bbox2)
 
-    def __fix_footnote(self):
+    def __fix_footnote(self, model_list):
         # 3: figure, 5: table, 7: footnote
-        for model_page_info in self.__model_list:
+        for model_page_info in model_list:
             footnotes = []
             figures = []
             tables = []
@@ -580,8 +595,8 @@ class MagicModel:
         return remove_duplicate_spans(all_spans)
 
     def get_page_size(self, page_no: int):  # 获取页面宽高
-        # 获取当前页的page对象
-        page = self.__docs.get_page(page_no).get_page_info()
+        # 从页面几何索引获取当前页的信息
+        page = self.__page_infos[page_no]
         # 获取当前页的宽高
         page_w = page.w
         page_h = page.h
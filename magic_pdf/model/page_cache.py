@@ -0,0 +1,258 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import fitz
+from loguru import logger
+
+from magic_pdf.data.utils import fitz_doc_to_image_size
+from magic_pdf.libs.hash_utils import compute_sha256
+from magic_pdf.libs.json_compressor import JsonCompressor
+
+# 缓存超过上限后淘汰到上限的该比例，避免每次写入都触发淘汰
+EVICT_TARGET_RATIO = 0.9
+# 每写入该数量的页面重新统计一次缓存大小，同步其他进程的写入和淘汰
+SIZE_SYNC_INTERVAL = 256
+# 资源字典中的间接引用，不同文件的对象编号不同
+INDIRECT_REF_PATTERN = re.compile(rb'\d+ \d+ R')
+
+
+def get_page_cache_enable() -> bool:
+    """Whether doc_analyze looks up the model results of the pages in the page
+    cache, off by default since the cache writes up to
+    `get_page_cache_max_bytes()` to `get_page_cache_path()`, can be enabled by
+    the env `MINERU_PAGE_CACHE=true`."""
+    return os.getenv('MINERU_PAGE_CACHE', 'false').lower() in ('1', 'true')
+
+
+def get_page_cache_path() -> str:
+    """The sqlite file of the page cache, can be overridden by the env
+    `MINERU_PAGE_CACHE_PATH`."""
+    return os.getenv(
+        'MINERU_PAGE_CACHE_PATH',
+        os.path.join(os.path.expanduser('~'), '.cache', 'magic_pdf', 'page_cache.sqlite'),
+    )
+
+
+def get_page_cache_max_bytes() -> int:
+    """The size the page cache is evicted down to, can be overridden by the
+    env `MINERU_PAGE_CACHE_MAX_MB`."""
+    return int(float(os.getenv('MINERU_PAGE_CACHE_MAX_MB', 1024)) * 1024 * 1024)
+
+
+def _hash_resource(doc: fitz.Document, xref: int, kind: str, resource_hashes: dict) -> str:
+    key = (id(doc), xref, kind)
+    if key not in resource_hashes:
+        if kind == 'font':
+            data = doc.extract_font(xref)[3]
+        elif kind == 'annot':
+            ap_kind, ap_value = doc.xref_get_key(xref, 'AP/N')
+            data = doc.xref_stream(int(ap_value.split()[0])) if ap_kind == 'xref' else b''
+        else:
+            data = doc.xref_stream_raw(xref) if kind == 'image' else doc.xref_stream(xref)
+        resource_hashes[key] = hashlib.sha256(data or b'').hexdigest()
+    return resource_hashes[key]
+
+
+def compute_page_hash(page: fitz.Page, dpi: int = 200, resource_hashes: dict = None) -> str:
+    """The content hash of the page without rendering it, from the content
+    stream of the page, the fonts, images, forms and annotations it draws, its
+    geometry and the dpi it is rendered at for the models. The object numbers
+    of the file are left out, so identical pages of different pdfs get the
+    same hash.
+
+    Args:
+        page (fitz.Page): the page of the pdf
+        dpi (int, optional): the dpi the page is rendered at for the models. Defaults to 200.
+        resource_hashes (dict, optional): the hashes of the resources of the documents, shared by the pages of
+            a document so every font and image is hashed once. Defaults to None.
+
+    Returns:
+        str: the sha256 of the page
+    """
+    resource_hashes = {} if resource_hashes is None else resource_hashes
+    doc = page.parent
+    hasher = hashlib.sha256()
+    hasher.update(repr((dpi, fitz_doc_to_image_size(page, dpi), page.rotation, tuple(page.rect))).encode('utf-8'))
+    hasher.update(page.read_contents())
+    res_kind, res_value = doc.xref_get_key(page.xref, 'Resources')
+    if res_kind == 'xref':
+        res_value = doc.xref_object(int(res_value.split()[0]), compressed=True)
+    # ExtGState 等内联在资源字典中的设置
+    hasher.update(INDIRECT_REF_PATTERN.sub(b'R', res_value.encode('utf-8')))
+    for xref, _, font_type, basefont, name, encoding, _ in page.get_fonts(full=True):
+        hasher.update(f'font|{name}|{basefont}|{font_type}|{encoding}|'.encode('utf-8'))
+        hasher.update(_hash_resource(doc, xref, 'font', resource_hashes).encode('utf-8'))
+    for image in page.get_images(full=True):
+        xref, smask = image[0], image[1]
+        hasher.update(f'image|{image[2:9]}|'.encode('utf-8'))
+        hasher.update(_hash_resource(doc, xref, 'image', resource_hashes).encode('utf-8'))
+        if smask:
+            hasher.update(_hash_resource(doc, smask, 'image', resource_hashes).encode('utf-8'))
+    for xref, name, _, bbox in page.get_xobjects():
+        hasher.update(f'form|{name}|{tuple(bbox)}|'.encode('utf-8'))
+        hasher.update(_hash_resource(doc, xref, 'form', resource_hashes).encode('utf-8'))
+    for xref, annot_type, _ in page.annot_xrefs():
+        hasher.update(f'annot|{annot_type}|{tuple(doc.xref_get_key(xref, "Rect"))}|'.encode('utf-8'))
+        hasher.update(_hash_resource(doc, xref, 'annot', resource_hashes).encode('utf-8'))
+    return hasher.hexdigest()
+
+
+def compute_page_key(page_hash: str, fingerprint: str, hints=None) -> str:
+    """The key of the model result of a page in the cache.
+
+    Args:
+        page_hash (str): the content hash of the page, see `compute_page_hash`
+        fingerprint (str): the fingerprint of the models and their config
+        hints (Any, optional): the json serializable inputs of the models besides the page image,
+            e.g. the formula flag of the page. Defaults to None.
+
+    Returns:
+        str: the key
+    """
+    return compute_sha256(f'{page_hash}|{fingerprint}|{json.dumps(hints, sort_keys=True)}')
+
+
+class PageCache:
+    def __init__(self, path: str, max_bytes: int):
+        """The layout_dets of the analyzed pages kept in a sqlite file, keyed by
+        `compute_page_key`. The least recently used pages are evicted once the
+        cache grows over max_bytes. The size of the cache is kept as a running
+        total, counted again from the table every SIZE_SYNC_INTERVAL puts and
+        before evicting, since other processes write to the same file.
+
+        Args:
+            path (str): the sqlite file
+            max_bytes (int): the size of the cached results the cache is evicted down to
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # the cache is shared by the processes on the machine
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS pages ('
+            'key TEXT PRIMARY KEY, layout_dets TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS pages_last_access ON pages (last_access)')
+        self._conn.commit()
+        self._size = self._count_size()
+        self._puts = 0
+
+    def get_many(self, keys: list[str]) -> dict:
+        """The cached layout_dets of the keys, the misses are left out.
+
+        Args:
+            keys (list[str]): the keys of the pages
+
+        Returns:
+            dict: key -> layout_dets
+        """
+        keys = list(dict.fromkeys(keys))
+        results = {}
+        with self._lock:
+            for index in range(0, len(keys), 500):
+                batch = keys[index: index + 500]
+                rows = self._conn.execute(
+                    f'SELECT key, layout_dets FROM pages WHERE key IN ({",".join("?" * len(batch))})', batch
+                ).fetchall()
+                for key, layout_dets in rows:
+                    results[key] = JsonCompressor.decompress_json(layout_dets)
+            if results:
+                now = time.time()
+                self._conn.executemany('UPDATE pages SET last_access = ? WHERE key = ?', [(now, key) for key in results])
+                self._conn.commit()
+            self.hits += len(results)
+            self.misses += len(keys) - len(results)
+        return results
+
+    def put(self, key: str, layout_dets: list):
+        """Cache the layout_dets of a page, the cache is evicted when it grows
+        over max_bytes.
+
+        Args:
+            key (str): the key of the page
+            layout_dets (list): the model result of the page
+        """
+        try:
+            value = JsonCompressor.compress_json(layout_dets)
+        except (TypeError, ValueError) as e:
+            logger.warning(f'the model result is not cached: {e}')
+            return
+        with self._lock:
+            row = self._conn.execute('SELECT size FROM pages WHERE key = ?', (key,)).fetchone()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO pages (key, layout_dets, size, last_access) VALUES (?, ?, ?, ?)',
+                (key, value, len(value), time.time()),
+            )
+            self._conn.commit()
+            self._size += len(value) - (row[0] if row else 0)
+            self._puts += 1
+            if self._puts % SIZE_SYNC_INTERVAL == 0:
+                self._size = self._count_size()
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def size(self) -> int:
+        """The size of the cached results in bytes."""
+        with self._lock:
+            return self._count_size()
+
+    def stats(self) -> dict:
+        """The hits, misses and evictions of this cache object and the pages
+        and bytes in the cache."""
+        with self._lock:
+            pages, size = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages').fetchone()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'pages': pages,
+            'bytes': size,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _count_size(self) -> int:
+        return self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM pages').fetchone()[0]
+
+    def _evict(self):
+        size = self._size = self._count_size()
+        if size <= self.max_bytes:
+            return
+        target = self.max_bytes * EVICT_TARGET_RATIO
+        evict_keys = []
+        for key, page_size in self._conn.execute('SELECT key, size FROM pages ORDER BY last_access').fetchall():
+            if size <= target:
+                break
+            evict_keys.append((key,))
+            size -= page_size
+        self._conn.executemany('DELETE FROM pages WHERE key = ?', evict_keys)
+        self._conn.commit()
+        self.evictions += len(evict_keys)
+        self._size = size
+        logger.info(f'page cache evicted {len(evict_keys)} pages, {size} bytes left')
+
+
+_page_caches = {}
+_page_caches_lock = threading.Lock()
+
+
+def get_page_cache() -> PageCache:
+    """The page cache at `get_page_cache_path()`, shared in the process."""
+    path = get_page_cache_path()
+    with _page_caches_lock:
+        if path not in _page_caches:
+            _page_caches[path] = PageCache(path, get_page_cache_max_bytes())
+        return _page_caches[path]
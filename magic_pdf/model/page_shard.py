@@ -0,0 +1,203 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from loguru import logger
+
+import magic_pdf.model as model_config
+from magic_pdf.data.dataset import Dataset
+from magic_pdf.data.utils import fitz_doc_to_image
+
+_worker_model = None
+_worker_batch_model = None
+_worker_table_budget = None
+
+
+def _init_shard_worker(
+    model_kwargs: dict,
+    torch_threads: int,
+    model_mode: str = 'full',
+    use_inside_model: bool = True,
+    table_time_budget: float = 0,
+    table_budget_used=None,
+):
+    # the threads must be limited before torch and paddle are imported in the worker
+    os.environ['OMP_NUM_THREADS'] = str(torch_threads)
+    os.environ['MINERU_CPU_TORCH_THREADS'] = str(torch_threads)
+    os.environ['MINERU_CPU_OCR_WORKERS'] = '1'
+
+    # spawn出的进程重新导入magic_pdf.model，恢复调用方运行时设置的模型模式
+    model_config.__model_mode__ = model_mode
+    model_config.__use_inside_model__ = use_inside_model
+
+    from magic_pdf.libs.config_reader import get_device
+    from magic_pdf.model.doc_analyze_by_custom_model import (ModelSingleton,
+                                                             get_batch_model)
+
+    from magic_pdf.model.sub_modules.table.table_utils import SharedTableTimeBudget
+
+    global _worker_model, _worker_batch_model, _worker_table_budget
+    _worker_model = ModelSingleton().get_model(**model_kwargs)
+    _worker_batch_model = get_batch_model(_worker_model, get_device())
+    if table_budget_used is not None:
+        _worker_table_budget = SharedTableTimeBudget(table_time_budget, table_budget_used)
+
+
+def get_page_kwargs(formula_flag: bool, text_lines: list | None) -> dict:
+    """The keyword arguments of the single page model call, empty for a page
+    without hints so the models not taking them are called the same way."""
+    page_kwargs = {}
+    if not formula_flag:
+        page_kwargs['formula'] = False
+    if text_lines:
+        page_kwargs['text_lines'] = text_lines
+    return page_kwargs
+
+
+def _analyze_shard(
+    shm_name: str, shapes: list, formula_flags: list[bool] | None = None, text_lines: list | None = None
+) -> list:
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        offsets = np.cumsum([0] + [int(np.prod(shape)) for shape in shapes])
+        images = [
+            np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=int(offset))
+            for shape, offset in zip(shapes, offsets)
+        ]
+        if formula_flags is None:
+            formula_flags = [True] * len(images)
+        if text_lines is None:
+            text_lines = [None] * len(images)
+        if _worker_batch_model is not None:
+            result = _worker_batch_model(
+                images, table_budget=_worker_table_budget, formula_flags=formula_flags, text_lines=text_lines
+            )
+        else:
+            result = [
+                _worker_model(img, **get_page_kwargs(formula_flag, page_text_lines))
+                for img, formula_flag, page_text_lines in zip(images, formula_flags, text_lines)
+            ]
+        # the views into the shared memory must be released before closing it
+        del images
+        return result
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            # a view is still referenced by an exception traceback, the caller unlinks the memory anyway
+            pass
+
+
+def _put_shard(dataset: Dataset, page_ids: list[int]) -> tuple[shared_memory.SharedMemory, list]:
+    # the images are used only once, render them without filling the image cache of the dataset
+    images = [fitz_doc_to_image(dataset.get_page(index).get_doc())['img'] for index in page_ids]
+    shm = shared_memory.SharedMemory(create=True, size=max(sum(img.nbytes for img in images), 1))
+    offset = 0
+    for img in images:
+        np.ndarray(img.shape, dtype=np.uint8, buffer=shm.buf, offset=offset)[:] = img
+        offset += img.nbytes
+    return shm, [img.shape for img in images]
+
+
+def analyze_pages_sharded(
+    dataset: Dataset,
+    page_ids: list[int],
+    num_processes: int,
+    model_kwargs: dict,
+    shard_size: int = 16,
+    formula_flags: list[bool] | None = None,
+    text_lines: list | None = None,
+    table_time_budget: float = 0,
+) -> list:
+    """Analyze the pages in num_processes worker processes, every worker
+    holds its own models and analyzes shards of consecutive pages, so the
+    models are meant to run on cpu, on a gpu every worker would hold a copy of
+    all models in its memory. The page
+    images are rendered by the caller and passed to the workers through shared
+    memory, at most two shards per worker are rendered ahead.
+
+    The worker processes are spawned, so the caller script must be guarded by
+    `if __name__ == '__main__':`. The workers take the `__model_mode__` and
+    `__use_inside_model__` of `magic_pdf.model` from the caller.
+
+    Args:
+        dataset (Dataset): the dataset to analyze
+        page_ids (list[int]): the pages to analyze
+        num_processes (int): the number of worker processes
+        model_kwargs (dict): the arguments of `ModelSingleton.get_model`
+        shard_size (int, optional): the number of pages per shard. Defaults to 16.
+        formula_flags (list[bool] | None, optional): whether each page may contain formulas, in the order of
+            page_ids. Defaults to None, which means all pages.
+        text_lines (list | None, optional): the line boxes of the text layer of each page, in the order of
+            page_ids. Defaults to None, which means detect the text of all pages.
+        table_time_budget (float, optional): the seconds the table recognition of the pages may take, shared by
+            all workers. Defaults to 0, which means unlimited.
+
+    Returns:
+        list: the layout_dets of every page, in the order of page_ids
+    """
+    shard_size = max(min(shard_size, -(-len(page_ids) // num_processes)), 1)
+    shards = [page_ids[i: i + shard_size] for i in range(0, len(page_ids), shard_size)]
+    if formula_flags is None:
+        formula_flags = [True] * len(page_ids)
+    if text_lines is None:
+        text_lines = [None] * len(page_ids)
+    torch_threads = max(1, (os.cpu_count() or 1) // num_processes)
+    logger.info(
+        f'analyze {len(page_ids)} pages in {num_processes} processes,'
+        f' shards: {len(shards)}, threads per process: {torch_threads}'
+    )
+
+    results = [None] * len(shards)
+    mp_context = multiprocessing.get_context('spawn')
+    # one table time budget for the document, every worker charges the same counter
+    table_budget_used = mp_context.Value('d', 0.0)
+    with ProcessPoolExecutor(
+        max_workers=num_processes,
+        mp_context=mp_context,
+        initializer=_init_shard_worker,
+        initargs=(
+            model_kwargs,
+            torch_threads,
+            model_config.__model_mode__,
+            model_config.__use_inside_model__,
+            table_time_budget,
+            table_budget_used,
+        ),
+    ) as pool:
+        pending = {}
+        next_shard = 0
+        try:
+            while next_shard < len(shards) or pending:
+                while next_shard < len(shards) and len(pending) < num_processes * 2:
+                    shm, shapes = _put_shard(dataset, shards[next_shard])
+                    shard_slice = slice(next_shard * shard_size, (next_shard + 1) * shard_size)
+                    pending[next_shard] = (
+                        pool.submit(
+                            _analyze_shard, shm.name, shapes, formula_flags[shard_slice], text_lines[shard_slice]
+                        ),
+                        shm,
+                    )
+                    next_shard += 1
+                # the shards finish roughly in order, wait for the oldest one
+                shard_index = min(pending)
+                future, shm = pending.pop(shard_index)
+                try:
+                    results[shard_index] = future.result()
+                finally:
+                    shm.close()
+                    shm.unlink()
+        finally:
+            for future, shm in pending.values():
+                future.cancel()
+            for future, shm in pending.values():
+                try:
+                    future.exception()
+                except BaseException:  # noqa: B036
+                    pass
+                shm.close()
+                shm.unlink()
+
+    return [layout_dets for shard_result in results for layout_dets in shard_result]
@@ -25,7 +25,8 @@ from magic_pdf.model.sub_modules.model_init import AtomModelSingleton
 from magic_pdf.model.sub_modules.model_utils import (
     clean_vram, crop_img, get_res_list_from_layout_res)
 from magic_pdf.model.sub_modules.ocr.paddleocr.ocr_utils import (
-    get_adjusted_mfdetrec_res, get_ocr_result_list)
+    get_adjusted_mfdetrec_res, get_ocr_result_list, get_text_layer_result_list)
+from magic_pdf.model.sub_modules.ocr.text_layer import get_region_text_lines
 
 
 class CustomPEKModel:
@@ -128,6 +129,7 @@ class CustomPEKModel:
                 mfr_weight_dir=mfr_weight_dir,
                 mfr_cfg_path=mfr_cfg_path,
                 device='cpu' if str(self.device).startswith("mps") else self.device,
+                mfr_cpu_int8=self.formula_config.get('mfr_cpu_int8', False),
             )
 
         # 初始化layout模型
@@ -157,6 +159,9 @@ class CustomPEKModel:
                     )
                 ),
                 device=self.device,
+                layout_backend=self.layout_config.get('backend'),
+                layout_quantize=self.layout_config.get('quantize'),
+                layout_calibration_dir=self.layout_config.get('calibration_dir'),
             )
         # 初始化ocr
         self.ocr_model = atom_model_manager.get_atom_model(
@@ -180,7 +185,7 @@ class CustomPEKModel:
 
         logger.info('DocAnalysis init done!')
 
-    def __call__(self, image):
+    def __call__(self, image, formula: bool = True, text_lines: list | None = None):
 
         pil_img = Image.fromarray(image)
         width, height = pil_img.size
@@ -216,7 +221,7 @@ class CustomPEKModel:
         layout_cost = round(time.time() - layout_start, 2)
         logger.info(f'layout detection time: {layout_cost}')
 
-        if self.apply_formula:
+        if self.apply_formula and formula:
             # 公式检测
             mfd_start = time.time()
             mfd_res = self.mfd_model.predict(image)
@@ -240,19 +245,37 @@ class CustomPEKModel:
         # ocr识别
         ocr_start = time.time()
         # Process each area that requires OCR processing
+        ocr_inputs = []
         for res in ocr_res_list:
+            if not self.apply_ocr and text_lines:
+                # 文本层覆盖的区域直接用pdf的行框，不做文本检测
+                region_lines = get_region_text_lines(
+                    [res['poly'][0], res['poly'][1], res['poly'][4], res['poly'][5]], text_lines
+                )
+                if region_lines:
+                    layout_res.extend(get_text_layer_result_list(region_lines, single_page_mfdetrec_res))
+                    continue
             new_image, useful_list = crop_img(res, pil_img, crop_paste_x=50, crop_paste_y=50)
             adjusted_mfdetrec_res = get_adjusted_mfdetrec_res(single_page_mfdetrec_res, useful_list)
 
             # OCR recognition
             new_image = cv2.cvtColor(np.asarray(new_image), cv2.COLOR_RGB2BGR)
+            ocr_inputs.append((new_image, adjusted_mfdetrec_res, useful_list))
 
-            if self.apply_ocr:
-                ocr_res = self.ocr_model.ocr(new_image, mfd_res=adjusted_mfdetrec_res)[0]
-            else:
-                ocr_res = self.ocr_model.ocr(new_image, mfd_res=adjusted_mfdetrec_res, rec=False)[0]
+        if self.apply_ocr:
+            # 先检测所有区域的文本行，再把整页的文本行批量识别
+            ocr_res_list = self.ocr_model.batch_ocr(
+                [new_image for new_image, _, _ in ocr_inputs],
+                mfd_res_list=[adjusted_mfdetrec_res for _, adjusted_mfdetrec_res, _ in ocr_inputs],
+            )
+        else:
+            ocr_res_list = [
+                self.ocr_model.ocr(new_image, mfd_res=adjusted_mfdetrec_res, rec=False)[0]
+                for new_image, adjusted_mfdetrec_res, _ in ocr_inputs
+            ]
 
-            # Integration results
+        # Integration results
+        for (_, _, useful_list), ocr_res in zip(ocr_inputs, ocr_res_list):
             if ocr_res:
                 ocr_result_list = get_ocr_result_list(ocr_res, useful_list)
                 layout_res.extend(ocr_result_list)
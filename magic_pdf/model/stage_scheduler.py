@@ -0,0 +1,174 @@
+import queue
+import threading
+import time
+from typing import Callable
+
+from loguru import logger
+
+_STOP = object()
+_POLL_INTERVAL = 0.1
+
+
+class PipelineStage:
+    def __init__(self, name: str, fn: Callable, workers: int = 1, queue_size: int = 2):
+        """A stage of StagePipeline.
+
+        Args:
+            name (str): the name of the stage, used in the utilization report
+            fn (Callable): process one item and return the item passed to the next stage
+            workers (int, optional): the number of threads running fn concurrently. Defaults to 1.
+            queue_size (int, optional): the number of items waiting for the stage at most,
+                the previous stage blocks when the queue is full. Defaults to 2.
+        """
+        self.name = name
+        self.fn = fn
+        self.workers = max(workers, 1)
+        self.queue_size = max(queue_size, 1)
+
+
+class StagePipeline:
+    def __init__(self, stages: list[PipelineStage]):
+        """Run items through a chain of stages, every stage has its own
+        threads and a bounded input queue, so different items can be in
+        different stages at once.
+
+        Args:
+            stages (list[PipelineStage]): the stages in the order items pass through
+        """
+        self._stages = stages
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._error = None
+
+    def run(self, items: list) -> list:
+        """Pass every item through all stages.
+
+        Args:
+            items (list): the inputs of the first stage
+
+        Raises:
+            Exception: the first exception raised by a stage, the pipeline is stopped
+
+        Returns:
+            list: the outputs of the last stage, in the order of items
+        """
+        self._stats = {
+            stage.name: {'items': 0, 'busy': 0.0, 'workers': stage.workers} for stage in self._stages
+        }
+        self._stop_event.clear()
+        self._error = None
+        if not self._stages:
+            return list(items)
+
+        queues = [queue.Queue(maxsize=stage.queue_size) for stage in self._stages]
+        outputs = queue.Queue()
+        threads = []
+        start = time.time()
+        for stage_index, stage in enumerate(self._stages):
+            out_queue = queues[stage_index + 1] if stage_index + 1 < len(self._stages) else outputs
+            next_workers = (
+                self._stages[stage_index + 1].workers if stage_index + 1 < len(self._stages) else 1
+            )
+            remaining = [stage.workers]
+            remaining_lock = threading.Lock()
+            for _ in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._work,
+                    args=(stage, queues[stage_index], out_queue, next_workers, remaining, remaining_lock),
+                    daemon=True,
+                )
+                thread.start()
+                threads.append(thread)
+
+        for index, item in enumerate(items):
+            if not self._put(queues[0], (index, item)):
+                break
+        for _ in range(self._stages[0].workers):
+            self._put(queues[0], _STOP)
+
+        results = {}
+        while True:
+            entry = self._get(outputs)
+            if entry is _STOP or entry is None:
+                break
+            index, item = entry
+            results[index] = item
+        self._stop_event.set()
+        for thread in threads:
+            thread.join()
+        self._wall_time = time.time() - start
+
+        if self._error is not None:
+            raise self._error
+        return [results[index] for index in sorted(results)]
+
+    def report(self) -> dict:
+        """The utilization of every stage in the last run.
+
+        Returns:
+            dict: stage name -> {'items': processed items, 'busy': seconds spent in fn,
+                'workers': threads, 'utilization': busy / (wall time * workers)}
+        """
+        wall_time = max(getattr(self, '_wall_time', 0.0), 1e-6)
+        report = {}
+        for name, stat in self._stats.items():
+            report[name] = dict(stat, utilization=round(stat['busy'] / (wall_time * stat['workers']), 3))
+        return report
+
+    def log_report(self):
+        """Log the utilization of every stage in the last run."""
+        wall_time = round(getattr(self, '_wall_time', 0.0), 2)
+        for name, stat in self.report().items():
+            logger.info(
+                f"{name} stage: items: {stat['items']}, busy: {round(stat['busy'], 2)}s,"
+                f" workers: {stat['workers']}, utilization: {stat['utilization']:.0%} of {wall_time}s"
+            )
+
+    def _work(self, stage, in_queue, out_queue, next_workers, remaining, remaining_lock):
+        while True:
+            entry = self._get(in_queue)
+            if entry is _STOP or entry is None:
+                break
+            index, item = entry
+            try:
+                fn_start = time.time()
+                item = stage.fn(item)
+                busy = time.time() - fn_start
+            except Exception as e:  # noqa: BLE001
+                self._fail(e)
+                break
+            with self._stats_lock:
+                self._stats[stage.name]['items'] += 1
+                self._stats[stage.name]['busy'] += busy
+            if not self._put(out_queue, (index, item)):
+                break
+
+        with remaining_lock:
+            remaining[0] -= 1
+            last_worker = remaining[0] == 0
+        if last_worker:
+            for _ in range(next_workers):
+                self._put(out_queue, _STOP)
+
+    def _fail(self, e: Exception):
+        if self._error is None:
+            self._error = e
+        self._stop_event.set()
+
+    def _put(self, q: queue.Queue, entry) -> bool:
+        while not self._stop_event.is_set():
+            try:
+                q.put(entry, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue):
+        while not self._stop_event.is_set():
+            try:
+                return q.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return None
@@ -1,16 +1,39 @@
 from doclayout_yolo import YOLOv10
 
+from magic_pdf.model.sub_modules.layout.doclayout_yolo.onnx_backend import (
+    LayoutBackend, export_onnx)
+
 
 class DocLayoutYOLOModel(object):
-    def __init__(self, weight, device):
-        self.model = YOLOv10(weight)
+    imgsz = 1280
+
+    def __init__(self, weight, device, backend=LayoutBackend.TORCH, quantize=None, calibration_dir=None):
+        """DocLayout-YOLO layout detection.
+
+        Args:
+            weight (str): the path of the pytorch weights
+            device (str): the device of the model
+            backend (str, optional): LayoutBackend.TORCH, or LayoutBackend.ONNX to run the exported model with
+                onnxruntime on cpu, the pre and post processing stay the same. Defaults to LayoutBackend.TORCH.
+            quantize (str, optional): int8 quantization of the onnx model, 'dynamic' or 'static'. Defaults to None.
+            calibration_dir (str, optional): the page images static quantization is calibrated with. Defaults to None.
+        """
+        if backend == LayoutBackend.ONNX:
+            weight = export_onnx(weight, self.imgsz, quantize=quantize, calibration_dir=calibration_dir)
+            self.model = YOLOv10(weight, task='detect')
+            self.backend = backend if quantize is None else f'{backend}-int8-{quantize}'
+        elif backend == LayoutBackend.TORCH:
+            self.model = YOLOv10(weight)
+            self.backend = backend
+        else:
+            raise ValueError(f'Invalid layout backend: {backend}. It must be one of {LayoutBackend.TORCH}, {LayoutBackend.ONNX}')
         self.device = device
 
     def predict(self, image):
         layout_res = []
         doclayout_yolo_res = self.model.predict(
             image,
-            imgsz=1280,
+            imgsz=self.imgsz,
             conf=0.10,
             iou=0.45,
             verbose=False, device=self.device
@@ -29,28 +52,40 @@ class DocLayoutYOLOModel(object):
             layout_res.append(new_item)
         return layout_res
 
-    def batch_predict(self, images: list, batch_size: int) -> list:
+    def batch_predict(self, images: list, batch_size: int, scales: list = None) -> list:
+        """Detect the layout in batches.
+
+        Args:
+            images (list): the page images
+            batch_size (int): the number of images per batch
+            scales (list, optional): the scale of each image relative to the full resolution page image,
+                the polys are mapped back to the full resolution page. Defaults to None.
+
+        Returns:
+            list: the layout result of each image
+        """
         images_layout_res = []
         for index in range(0, len(images), batch_size):
             doclayout_yolo_res = [
                 image_res.cpu()
                 for image_res in self.model.predict(
                     images[index : index + batch_size],
-                    imgsz=1280,
+                    imgsz=self.imgsz,
                     conf=0.10,
                     iou=0.45,
                     verbose=False,
                     device=self.device,
                 )
             ]
-            for image_res in doclayout_yolo_res:
+            for offset, image_res in enumerate(doclayout_yolo_res):
+                scale = 1 if scales is None else scales[index + offset]
                 layout_res = []
                 for xyxy, conf, cla in zip(
                     image_res.boxes.xyxy,
                     image_res.boxes.conf,
                     image_res.boxes.cls,
                 ):
-                    xmin, ymin, xmax, ymax = [int(p.item()) for p in xyxy]
+                    xmin, ymin, xmax, ymax = [int(p.item() / scale) for p in xyxy]
                     new_item = {
                         "category_id": int(cla.item()),
                         "poly": [xmin, ymin, xmax, ymin, xmax, ymax, xmin, ymax],
@@ -0,0 +1,163 @@
+import glob
+import hashlib
+import os
+import shutil
+
+import cv2
+import numpy as np
+from loguru import logger
+
+from magic_pdf.libs.hash_utils import compute_md5
+
+
+class LayoutBackend:
+    TORCH = 'torch'
+    ONNX = 'onnx'
+
+
+class LayoutQuantize:
+    DYNAMIC = 'dynamic'
+    STATIC = 'static'
+
+
+def get_onnx_cache_dir() -> str:
+    """The directory where the exported onnx models are kept, can be
+    overridden by the env `MINERU_ONNX_CACHE_DIR`."""
+    return os.getenv(
+        'MINERU_ONNX_CACHE_DIR',
+        os.path.join(os.path.expanduser('~'), '.cache', 'magic_pdf', 'onnx'),
+    )
+
+
+def get_calibration_inputs(onnx_path: str, images: list, imgsz: int) -> list:
+    """The inputs the YOLOv10 predictor builds from the page images at
+    inference, so the int8 ranges are calibrated on what the model sees.
+
+    Args:
+        onnx_path (str): the fp32 onnx model
+        images (list): the RGB page images, passed to the predictor like the pages at inference
+        imgsz (int): the input size the model predicts with
+
+    Returns:
+        list: the float32 NCHW input of every image
+    """
+    from doclayout_yolo import YOLOv10
+
+    model = YOLOv10(onnx_path, task='detect')
+    # the first predict sets the predictor up with the letterbox of the model
+    model.predict(images[0], imgsz=imgsz, verbose=False, device='cpu')
+    return [model.predictor.preprocess([image]).cpu().numpy().astype(np.float32) for image in images]
+
+
+class _CalibrationReader:
+    def __init__(self, input_name: str, inputs: list):
+        self._inputs = iter([{input_name: model_input} for model_input in inputs])
+
+    def get_next(self):
+        return next(self._inputs, None)
+
+
+def _load_calibration_images(calibration_dir: str) -> list:
+    images = []
+    for path in sorted(glob.glob(os.path.join(calibration_dir, '*'))):
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is not None:
+            images.append(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    return images
+
+
+def _hash_calibration_dir(calibration_dir: str) -> str:
+    # 校准图片变化后重新量化
+    hasher = hashlib.md5()
+    for path in sorted(glob.glob(os.path.join(calibration_dir, '*'))):
+        hasher.update(os.path.basename(path).encode('utf-8'))
+        with open(path, 'rb') as f:
+            hasher.update(hashlib.md5(f.read()).digest())
+    return hasher.hexdigest()[:16]
+
+
+def _quantize(onnx_path: str, output_path: str, quantize: str, imgsz: int, calibration_dir: str | None):
+    from onnxruntime.quantization import (QuantType, quantize_dynamic,
+                                          quantize_static)
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    # the cache dir is shared by the processes on the machine, every process writes its own files
+    preprocessed_path = f'{output_path}.{os.getpid()}.pre.onnx'
+    quantized_path = f'{output_path}.{os.getpid()}.tmp.onnx'
+    quant_pre_process(onnx_path, preprocessed_path)
+    try:
+        if quantize == LayoutQuantize.DYNAMIC:
+            quantize_dynamic(preprocessed_path, quantized_path, weight_type=QuantType.QInt8)
+        elif quantize == LayoutQuantize.STATIC:
+            if calibration_dir is None:
+                raise ValueError('static quantization needs the calibration_dir of page images in layout-config')
+            images = _load_calibration_images(calibration_dir)
+            if not images:
+                raise ValueError(f'no calibration image found in {calibration_dir}')
+            import onnx
+            input_name = onnx.load(preprocessed_path, load_external_data=False).graph.input[0].name
+            quantize_static(
+                preprocessed_path,
+                quantized_path,
+                _CalibrationReader(input_name, get_calibration_inputs(onnx_path, images, imgsz)),
+                activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8,
+            )
+        else:
+            raise ValueError(f'Invalid quantize: {quantize}. It must be one of {LayoutQuantize.DYNAMIC}, {LayoutQuantize.STATIC}')
+        os.replace(quantized_path, output_path)
+    finally:
+        for path in (preprocessed_path, quantized_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def export_onnx(weight: str, imgsz: int, quantize: str | None = None, calibration_dir: str | None = None) -> str:
+    """Export the DocLayout-YOLO weights to onnx once, the exported and
+    quantized models are cached by the content of the weights, and the
+    static int8 models also by the content of the calibration images.
+
+    Args:
+        weight (str): the path of the pytorch weights
+        imgsz (int): the input size the model is exported with
+        quantize (str | None, optional): LayoutQuantize.DYNAMIC or LayoutQuantize.STATIC int8 quantization.
+            Defaults to None, which means fp32.
+        calibration_dir (str | None, optional): the page images static quantization is calibrated with.
+            Defaults to None.
+
+    Returns:
+        str: the path of the onnx model
+    """
+    with open(weight, 'rb') as f:
+        weight_hash = compute_md5(f.read())[:16].lower()
+    name = os.path.splitext(os.path.basename(weight))[0]
+    cache_dir = os.path.join(get_onnx_cache_dir(), f'{name}-{weight_hash}')
+    onnx_path = os.path.join(cache_dir, f'{name}-{imgsz}.onnx')
+    if quantize is None:
+        output_path = onnx_path
+    elif quantize == LayoutQuantize.STATIC and calibration_dir is not None:
+        calibration_hash = _hash_calibration_dir(calibration_dir)
+        output_path = os.path.join(cache_dir, f'{name}-{imgsz}-int8-{quantize}-{calibration_hash}.onnx')
+    else:
+        output_path = os.path.join(cache_dir, f'{name}-{imgsz}-int8-{quantize}.onnx')
+    if os.path.exists(output_path):
+        return output_path
+
+    os.makedirs(cache_dir, exist_ok=True)
+    if not os.path.exists(onnx_path):
+        from doclayout_yolo import YOLOv10
+
+        logger.info(f'export {weight} to {onnx_path}, this only happens once')
+        # the exporter writes next to the weights, which may be read only, the weights are copied under a
+        # name of this process, so the processes exporting at the same time do not overwrite each other
+        local_weight = os.path.join(cache_dir, f'{name}-{imgsz}.{os.getpid()}.pt')
+        shutil.copyfile(weight, local_weight)
+        try:
+            exported_path = YOLOv10(local_weight).export(format='onnx', imgsz=imgsz, dynamic=True, simplify=True)
+            os.replace(exported_path, onnx_path)
+        finally:
+            os.remove(local_weight)
+    if quantize is not None:
+        logger.info(f'quantize {onnx_path} to int8 ({quantize}), this only happens once')
+        _quantize(onnx_path, output_path, quantize, imgsz, calibration_dir)
+    return output_path
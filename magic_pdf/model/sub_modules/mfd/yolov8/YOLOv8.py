@@ -2,24 +2,37 @@ from ultralytics import YOLO
 
 
 class YOLOv8MFDModel(object):
+    imgsz = 1888
+
     def __init__(self, weight, device="cpu"):
         self.mfd_model = YOLO(weight)
         self.device = device
 
     def predict(self, image):
         mfd_res = self.mfd_model.predict(
-            image, imgsz=1888, conf=0.25, iou=0.45, verbose=False, device=self.device
+            image, imgsz=self.imgsz, conf=0.25, iou=0.45, verbose=False, device=self.device
         )[0]
         return mfd_res
 
-    def batch_predict(self, images: list, batch_size: int) -> list:
+    def batch_predict(self, images: list, batch_size: int, scales: list = None) -> list:
+        """Detect formulas in batches.
+
+        Args:
+            images (list): the page images
+            batch_size (int): the number of images per batch
+            scales (list, optional): the scale of each image relative to the full resolution page image,
+                the boxes are mapped back to the full resolution page. Defaults to None.
+
+        Returns:
+            list: the detection result of each image
+        """
         images_mfd_res = []
         for index in range(0, len(images), batch_size):
             mfd_res = [
                 image_res.cpu()
                 for image_res in self.mfd_model.predict(
                     images[index : index + batch_size],
-                    imgsz=1888,
+                    imgsz=self.imgsz,
                     conf=0.25,
                     iou=0.45,
                     verbose=False,
@@ -28,4 +41,10 @@ class YOLOv8MFDModel(object):
             ]
             for image_res in mfd_res:
                 images_mfd_res.append(image_res)
+        if scales is not None:
+            for image_res, scale in zip(images_mfd_res, scales):
+                if scale != 1:
+                    boxes_data = image_res.boxes.data.clone()
+                    boxes_data[:, :4] /= scale
+                    image_res.boxes.data = boxes_data
         return images_mfd_res
@@ -1,7 +1,9 @@
 import argparse
+import math
 import os
 import re
 
+import numpy as np
 import torch
 import unimernet.tasks as tasks
 from PIL import Image
@@ -10,6 +12,9 @@ from torchvision import transforms
 from unimernet.common.config import Config
 from unimernet.processors import load_processor
 
+from magic_pdf.data.pyramid import ImagePyramid
+from magic_pdf.libs.hash_utils import compute_ndarray_sha256
+
 
 class MathDataset(Dataset):
     def __init__(self, image_paths, transform=None):
@@ -48,8 +53,37 @@ def latex_rm_whitespace(s: str):
     return s
 
 
+def get_size_order(mf_image_list: list) -> list[int]:
+    """The order in which the formula images are batched, the images are
+    bucketed by aspect ratio and sorted by area within a bucket, so tiny inline
+    symbols and large display equations do not share a batch and the decode
+    length of a batch is not set by its largest formula.
+
+    Args:
+        mf_image_list (list): the PIL images of the formulas
+
+    Returns:
+        list[int]: the indexes of mf_image_list in batching order
+    """
+    def size_key(index):
+        width, height = mf_image_list[index].size
+        # one bucket per doubling of the aspect ratio
+        aspect_bucket = round(math.log2(max(width, 1) / max(height, 1)))
+        return aspect_bucket, width * height
+
+    return sorted(range(len(mf_image_list)), key=size_key)
+
+
 class UnimernetModel(object):
-    def __init__(self, weight_dir, cfg_path, _device_="cpu"):
+    def __init__(self, weight_dir, cfg_path, _device_="cpu", cpu_int8=False):
+        """UniMERNet formula recognition.
+
+        Args:
+            weight_dir (str): the directory of the weights and the tokenizer
+            cfg_path (str): the config file
+            _device_ (str, optional): the device of the model. Defaults to "cpu".
+            cpu_int8 (bool, optional): on cpu, quantize the linear layers to int8 dynamically. Defaults to False.
+        """
         args = argparse.Namespace(cfg_path=cfg_path, options=None)
         cfg = Config(args)
         cfg.config.model.pretrained = os.path.join(weight_dir, "pytorch_model.pth")
@@ -60,6 +94,11 @@ class UnimernetModel(object):
         self.device = _device_
         self.model.to(_device_)
         self.model.eval()
+        self.cpu_int8 = cpu_int8 and str(_device_).startswith("cpu")
+        if self.cpu_int8:
+            self.model = torch.ao.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
         vis_processor = load_processor(
             "formula_image_eval",
             cfg.config.datasets.formula_rec_eval.vis_processor.eval,
@@ -73,6 +112,7 @@ class UnimernetModel(object):
     def predict(self, mfd_res, image):
         formula_list = []
         mf_image_list = []
+        pil_img = Image.fromarray(image)
         for xyxy, conf, cla in zip(
             mfd_res.boxes.xyxy.cpu(), mfd_res.boxes.conf.cpu(), mfd_res.boxes.cls.cpu()
         ):
@@ -84,18 +124,10 @@ class UnimernetModel(object):
                 "latex": "",
             }
             formula_list.append(new_item)
-            pil_img = Image.fromarray(image)
             bbox_img = pil_img.crop((xmin, ymin, xmax, ymax))
             mf_image_list.append(bbox_img)
 
-        dataset = MathDataset(mf_image_list, transform=self.mfr_transform)
-        dataloader = DataLoader(dataset, batch_size=32, num_workers=0)
-        mfr_res = []
-        for mf_img in dataloader:
-            mf_img = mf_img.to(self.device)
-            with torch.no_grad():
-                output = self.model.generate({"image": mf_img})
-            mfr_res.extend(output["pred_str"])
+        mfr_res = self.recognize(mf_image_list, batch_size=32)
         for res, latex in zip(formula_list, mfr_res):
             res["latex"] = latex_rm_whitespace(latex)
         return formula_list
@@ -108,7 +140,8 @@ class UnimernetModel(object):
         backfill_list = []
         for image_index in range(len(images_mfd_res)):
             mfd_res = images_mfd_res[image_index]
-            pil_img = Image.fromarray(images[image_index])
+            image = images[image_index]
+            pil_img = None if isinstance(image, ImagePyramid) else Image.fromarray(image)
             formula_list = []
 
             for xyxy, conf, cla in zip(
@@ -122,20 +155,57 @@ class UnimernetModel(object):
                     "latex": "",
                 }
                 formula_list.append(new_item)
-                bbox_img = pil_img.crop((xmin, ymin, xmax, ymax))
+                if pil_img is None:
+                    bbox_img = Image.fromarray(image.crop([xmin, ymin, xmax, ymax]))
+                else:
+                    bbox_img = pil_img.crop((xmin, ymin, xmax, ymax))
                 mf_image_list.append(bbox_img)
 
             images_formula_list.append(formula_list)
             backfill_list += formula_list
 
-        dataset = MathDataset(mf_image_list, transform=self.mfr_transform)
+        mfr_res = self.recognize(mf_image_list, batch_size=batch_size)
+        for res, latex in zip(backfill_list, mfr_res):
+            res["latex"] = latex_rm_whitespace(latex)
+        return images_formula_list
+
+    def recognize(self, mf_image_list: list, batch_size: int = 64, dedupe: bool = True) -> list:
+        """Recognize the formula images in batches, identical images are
+        recognized once and the images are batched in the order of
+        `get_size_order`.
+
+        Args:
+            mf_image_list (list): the PIL images of the formulas
+            batch_size (int, optional): the number of formulas per batch. Defaults to 64.
+            dedupe (bool, optional): recognize identical images once. Defaults to True.
+
+        Returns:
+            list: the raw latex of every formula, in the order of mf_image_list
+        """
+        # 按像素内容去重，同一文档中重复出现的公式只识别一次
+        unique_images = []
+        unique_indexes = []
+        hash_to_unique = {}
+        for index, mf_image in enumerate(mf_image_list):
+            pixel_hash = compute_ndarray_sha256(np.asarray(mf_image)) if dedupe else index
+            if pixel_hash not in hash_to_unique:
+                hash_to_unique[pixel_hash] = len(unique_images)
+                unique_images.append(mf_image)
+            unique_indexes.append(hash_to_unique[pixel_hash])
+
+        order = get_size_order(unique_images)
+        sorted_images = [unique_images[index] for index in order]
+        dataset = MathDataset(sorted_images, transform=self.mfr_transform)
         dataloader = DataLoader(dataset, batch_size=batch_size, num_workers=0)
-        mfr_res = []
+        sorted_res = []
         for mf_img in dataloader:
             mf_img = mf_img.to(self.device)
+            # a batch stops decoding once all its formulas reach eos, at max_seq_len steps at most
             with torch.no_grad():
                 output = self.model.generate({"image": mf_img})
-            mfr_res.extend(output["pred_str"])
-        for res, latex in zip(backfill_list, mfr_res):
-            res["latex"] = latex_rm_whitespace(latex)
-        return images_formula_list
+            sorted_res.extend(output["pred_str"])
+
+        unique_res = [None] * len(unique_images)
+        for index, latex in zip(order, sorted_res):
+            unique_res[index] = latex
+        return [unique_res[index] for index in unique_indexes]
@@ -6,8 +6,8 @@ from magic_pdf.model.model_list import AtomicModel
 from magic_pdf.model.sub_modules.language_detection.yolov11.YOLOv11 import YOLOv11LangDetModel
 from magic_pdf.model.sub_modules.layout.doclayout_yolo.DocLayoutYOLO import \
     DocLayoutYOLOModel
-from magic_pdf.model.sub_modules.layout.layoutlmv3.model_init import \
-    Layoutlmv3_Predictor
+from magic_pdf.model.sub_modules.layout.doclayout_yolo.onnx_backend import \
+    LayoutBackend
 from magic_pdf.model.sub_modules.mfd.yolov8.YOLOv8 import YOLOv8MFDModel
 from magic_pdf.model.sub_modules.mfr.unimernet.Unimernet import UnimernetModel
 from magic_pdf.model.sub_modules.ocr.paddleocr.ppocr_273_mod import \
@@ -46,20 +46,27 @@ def mfd_model_init(weight, device='cpu'):
     return mfd_model
 
 
-def mfr_model_init(weight_dir, cfg_path, device='cpu'):
-    mfr_model = UnimernetModel(weight_dir, cfg_path, device)
+def mfr_model_init(weight_dir, cfg_path, device='cpu', cpu_int8=False):
+    mfr_model = UnimernetModel(weight_dir, cfg_path, device, cpu_int8=cpu_int8)
     return mfr_model
 
 
 def layout_model_init(weight, config_file, device):
+    # layoutlmv3依赖detectron2，只在使用时导入
+    from magic_pdf.model.sub_modules.layout.layoutlmv3.model_init import \
+        Layoutlmv3_Predictor
+
     model = Layoutlmv3_Predictor(weight, config_file, device)
     return model
 
 
-def doclayout_yolo_model_init(weight, device='cpu'):
-    if str(device).startswith("npu"):
+def doclayout_yolo_model_init(weight, device='cpu', backend=LayoutBackend.TORCH, quantize=None, calibration_dir=None):
+    if backend == LayoutBackend.ONNX:
+        # the onnx model runs on cpu by onnxruntime
+        device = 'cpu'
+    elif str(device).startswith("npu"):
         device = torch.device(device)
-    model = DocLayoutYOLOModel(weight, device)
+    model = DocLayoutYOLOModel(weight, device, backend=backend, quantize=quantize, calibration_dir=calibration_dir)
     return model
 
 
@@ -135,7 +142,10 @@ def atom_model_init(model_name: str, **kwargs):
         elif kwargs.get('layout_model_name') == MODEL_NAME.DocLayout_YOLO:
             atom_model = doclayout_yolo_model_init(
                 kwargs.get('doclayout_yolo_weights'),
-                kwargs.get('device')
+                kwargs.get('device'),
+                backend=kwargs.get('layout_backend') or LayoutBackend.TORCH,
+                quantize=kwargs.get('layout_quantize'),
+                calibration_dir=kwargs.get('layout_calibration_dir'),
             )
         else:
             logger.error('layout model name not allow')
@@ -149,7 +159,8 @@ def atom_model_init(model_name: str, **kwargs):
         atom_model = mfr_model_init(
             kwargs.get('mfr_weight_dir'),
             kwargs.get('mfr_cfg_path'),
-            kwargs.get('device')
+            kwargs.get('device'),
+            cpu_int8=kwargs.get('mfr_cpu_int8', False),
         )
     elif model_name == AtomicModel.OCR:
         atom_model = ocr_model_init(
@@ -4,6 +4,7 @@ import torch
 from PIL import Image
 from loguru import logger
 
+from magic_pdf.data.pyramid import ImagePyramid
 from magic_pdf.libs.clean_memory import clean_memory
 
 
@@ -17,7 +18,11 @@ def crop_img(input_res, input_pil_img, crop_paste_x=0, crop_paste_y=0):
 
     # Crop image
     crop_box = (crop_xmin, crop_ymin, crop_xmax, crop_ymax)
-    cropped_img = input_pil_img.crop(crop_box)
+    if isinstance(input_pil_img, ImagePyramid):
+        # render or slice only the cropped region of the page
+        cropped_img = Image.fromarray(input_pil_img.crop(crop_box))
+    else:
+        cropped_img = input_pil_img.crop(crop_box)
     return_image.paste(cropped_img, (crop_paste_x, crop_paste_y))
     return_list = [crop_paste_x, crop_paste_y, crop_xmin, crop_ymin, crop_xmax, crop_ymax, crop_new_width, crop_new_height]
     return return_image, return_list
@@ -298,6 +298,24 @@ def get_ocr_result_list(ocr_res, useful_list):
     return ocr_result_list
 
 
+def get_text_layer_result_list(text_lines, mfd_res):
+    """The text spans of a layout region taken from the line boxes of the pdf
+    text layer instead of the text detection, split around the formula boxes
+    the same way as the detected boxes in `update_det_boxes`."""
+    dt_boxes = [bbox_to_points(line_bbox) for line_bbox in text_lines]
+    if mfd_res:
+        dt_boxes = update_det_boxes(dt_boxes, mfd_res)
+    return [
+        {
+            'category_id': 15,
+            'poly': np.asarray(dt_box).reshape(-1).tolist(),
+            'score': 1.0,
+            'text': '',
+        }
+        for dt_box in dt_boxes
+    ]
+
+
 def calculate_is_angle(poly):
     p1, p2, p3, p4 = poly
     height = ((p4[1] - p1[1]) + (p3[1] - p2[1])) / 2
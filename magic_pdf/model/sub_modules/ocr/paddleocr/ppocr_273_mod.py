@@ -133,26 +133,58 @@ class ModifiedPaddleOCR(PaddleOCR):
                 return cls_res
             return ocr_res
 
-    def __call__(self, img, cls=True, mfd_res=None):
-        time_dict = {'det': 0, 'rec': 0, 'cls': 0, 'all': 0}
+    def batch_ocr(self, imgs: list, mfd_res_list: list | None = None, cls=True, rec_batch_num=64):
+        """Two phase OCR of many images, the text lines of all images are
+        detected first, then all line crops are recognized together, so the
+        recognition batches are not limited by the lines of one image.
 
-        if img is None:
-            logger.debug("no valid image provided")
-            return None, None, time_dict
+        Args:
+            imgs (list): the BGR images
+            mfd_res_list (list | None, optional): the formula boxes of every image, the text lines are split around
+                them. Defaults to None.
+            cls (bool, optional): use angle classifier or not. Defaults to True.
+            rec_batch_num (int, optional): the lines recognized per batch at least. Defaults to 64.
 
-        start = time.time()
+        Returns:
+            list: the result of every image like `ocr(img)[0]`, [[box, (text, score)], ...] or None
+        """
+        images_dt_boxes = []
+        img_crop_list = []
+        for index, img in enumerate(imgs):
+            img = alpha_to_color(img, (255, 255, 255))
+            mfd_res = mfd_res_list[index] if mfd_res_list else None
+            dt_boxes, crops = self._det_and_crop(img, mfd_res)
+            images_dt_boxes.append(dt_boxes)
+            img_crop_list += crops
+
+        rec_res = self._rec_crops(img_crop_list, cls, rec_batch_num)
+
+        ocr_res = []
+        offset = 0
+        for dt_boxes in images_dt_boxes:
+            if dt_boxes is None:
+                ocr_res.append(None)
+                continue
+            image_rec_res = rec_res[offset: offset + len(dt_boxes)]
+            offset += len(dt_boxes)
+            tmp_res = [
+                [box.tolist(), rec_result]
+                for box, rec_result in zip(dt_boxes, image_rec_res)
+                if rec_result[1] >= self.drop_score
+            ]
+            ocr_res.append(tmp_res if tmp_res else None)
+        return ocr_res
+
+    def _det_and_crop(self, img, mfd_res=None):
         ori_im = img.copy()
         if self.lang in ['ch'] and self.use_onnx:
             dt_boxes, elapse = self.additional_ocr.text_detector(img)
         else:
             dt_boxes, elapse = self.text_detector(img)
-        time_dict['det'] = elapse
 
         if dt_boxes is None:
             logger.debug("no dt_boxes found, elapsed : {}".format(elapse))
-            end = time.time()
-            time_dict['all'] = end - start
-            return None, None, time_dict
+            return None, []
         else:
             logger.debug("dt_boxes num : {}, elapsed : {}".format(
                 len(dt_boxes), elapse))
@@ -177,19 +209,46 @@ class ModifiedPaddleOCR(PaddleOCR):
             else:
                 img_crop = get_minarea_rect_crop(ori_im, tmp_box)
             img_crop_list.append(img_crop)
+        return dt_boxes, img_crop_list
+
+    def _rec_crops(self, img_crop_list, cls=True, rec_batch_num=None):
+        if not img_crop_list:
+            return []
         if self.use_angle_cls and cls:
             img_crop_list, angle_list, elapse = self.text_classifier(
                 img_crop_list)
-            time_dict['cls'] = elapse
             logger.debug("cls num  : {}, elapsed : {}".format(
                 len(img_crop_list), elapse))
         if self.lang in ['ch'] and self.use_onnx:
             rec_res, elapse = self.additional_ocr.text_recognizer(img_crop_list)
         else:
-            rec_res, elapse = self.text_recognizer(img_crop_list)
-        time_dict['rec'] = elapse
+            # the recognizer sorts the crops by width before batching, larger batches pad little
+            origin_rec_batch_num = self.text_recognizer.rec_batch_num
+            if rec_batch_num is not None:
+                self.text_recognizer.rec_batch_num = max(origin_rec_batch_num, rec_batch_num)
+            try:
+                rec_res, elapse = self.text_recognizer(img_crop_list)
+            finally:
+                self.text_recognizer.rec_batch_num = origin_rec_batch_num
         logger.debug("rec_res num  : {}, elapsed : {}".format(
             len(rec_res), elapse))
+        return rec_res
+
+    def __call__(self, img, cls=True, mfd_res=None):
+        time_dict = {'det': 0, 'rec': 0, 'cls': 0, 'all': 0}
+
+        if img is None:
+            logger.debug("no valid image provided")
+            return None, None, time_dict
+
+        start = time.time()
+        dt_boxes, img_crop_list = self._det_and_crop(img, mfd_res)
+        if dt_boxes is None:
+            end = time.time()
+            time_dict['all'] = end - start
+            return None, None, time_dict
+
+        rec_res = self._rec_crops(img_crop_list, cls)
         if self.args.save_crop_res:
             self.draw_crop_rec_res(self.args.crop_res_save_dir, img_crop_list,
                                    rec_res)
@@ -201,4 +260,4 @@ class ModifiedPaddleOCR(PaddleOCR):
                 filter_rec_res.append(rec_result)
         end = time.time()
         time_dict['all'] = end - start
-        return filter_boxes, filter_rec_res, time_dict
\ No newline at end of file
+        return filter_boxes, filter_rec_res, time_dict
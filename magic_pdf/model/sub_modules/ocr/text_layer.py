@@ -0,0 +1,55 @@
+import fitz
+
+from magic_pdf.libs.boxbase import calculate_overlap_area_in_bbox1_area_ratio
+
+
+def get_page_text_lines(page: fitz.Page, scale: float) -> list[list[float]]:
+    """The boxes of the text lines in the text layer of the page, the lines
+    tilted away from the axes are left out like in `txt_spans_extract_v2`.
+
+    Args:
+        page (fitz.Page): the page of the pdf
+        scale (float): the page image pixels per pdf point
+
+    Returns:
+        list[list[float]]: the [x0, y0, x1, y1] of every line on the page image, fitted to its visible chars
+    """
+    text_lines = []
+    for block in page.get_text('rawdict', flags=fitz.TEXTFLAGS_TEXT)['blocks']:
+        for line in block.get('lines', []):
+            cosine, sine = line['dir']
+            if min(abs(cosine), abs(sine)) > 0.1:
+                continue
+            char_bboxes = [
+                char['bbox'] for span in line['spans'] for char in span['chars'] if not char['c'].isspace()
+            ]
+            if not char_bboxes:
+                continue
+            text_lines.append([
+                min(bbox[0] for bbox in char_bboxes) * scale,
+                min(bbox[1] for bbox in char_bboxes) * scale,
+                max(bbox[2] for bbox in char_bboxes) * scale,
+                max(bbox[3] for bbox in char_bboxes) * scale,
+            ])
+    return text_lines
+
+
+def get_region_text_lines(region_bbox: list, text_lines: list) -> list[list[float]]:
+    """The text lines lying mostly inside the layout region, clipped to it.
+
+    Args:
+        region_bbox (list): the [x0, y0, x1, y1] of the region on the page image
+        text_lines (list): the line boxes of the page, see `get_page_text_lines`
+
+    Returns:
+        list[list[float]]: the line boxes of the region, empty if the region has no text layer
+    """
+    x0, y0, x1, y1 = region_bbox
+    region_lines = []
+    for line_bbox in text_lines:
+        if calculate_overlap_area_in_bbox1_area_ratio(line_bbox, region_bbox) <= 0.5:
+            continue
+        region_lines.append([
+            max(line_bbox[0], x0), max(line_bbox[1], y0), min(line_bbox[2], x1), min(line_bbox[3], y1)
+        ])
+    return region_lines
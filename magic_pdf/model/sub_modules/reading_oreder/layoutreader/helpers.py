@@ -74,6 +74,29 @@ def boxes2inputs(boxes: List[List[int]]) -> Dict[str, torch.Tensor]:
     }
 
 
+def batch_boxes2inputs(boxes_list: List[List[List[int]]]) -> Dict[str, torch.Tensor]:
+    """
+    pad the boxes of several pages into one batch, the padding is masked out like in DataCollator
+
+    :param boxes_list: the boxes of every page
+    :return: the batched inputs
+    """
+    max_len = max(len(boxes) for boxes in boxes_list)
+    bbox = []
+    input_ids = []
+    attention_mask = []
+    for boxes in boxes_list:
+        pad_len = max_len - len(boxes)
+        bbox.append([[0, 0, 0, 0]] + boxes + [[0, 0, 0, 0]] * (pad_len + 1))
+        input_ids.append([CLS_TOKEN_ID] + [UNK_TOKEN_ID] * len(boxes) + [EOS_TOKEN_ID] * (pad_len + 1))
+        attention_mask.append([1] + [1] * len(boxes) + [1] + [0] * pad_len)
+    return {
+        "bbox": torch.tensor(bbox),
+        "attention_mask": torch.tensor(attention_mask),
+        "input_ids": torch.tensor(input_ids),
+    }
+
+
 def prepare_inputs(
     inputs: Dict[str, torch.Tensor], model: LayoutLMv3ForTokenClassification
 ) -> Dict[str, torch.Tensor]:
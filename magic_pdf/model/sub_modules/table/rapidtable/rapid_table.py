@@ -6,6 +6,7 @@ from rapid_table import RapidTable, RapidTableInput
 from rapid_table.main import ModelType
 
 from magic_pdf.libs.config_reader import get_device
+from magic_pdf.model.sub_modules.table.table_utils import paddle_to_rapid_ocr_result
 
 
 class RapidTableModel(object):
@@ -44,20 +45,16 @@ class RapidTableModel(object):
             self.ocr_engine = RapidOCR()
 
     def predict(self, image):
+        """Recognize the table structure of the image, the text of the table
+        is recognized by the ocr engine of the model.
 
-        if self.ocr_model_name == "RapidOCR":
-            ocr_result, _ = self.ocr_engine(np.asarray(image))
-        elif self.ocr_model_name == "PaddleOCR":
-            bgr_image = cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2BGR)
-            ocr_result = self.ocr_engine.ocr(bgr_image)[0]
-            if ocr_result:
-                ocr_result = [[item[0], item[1][0], item[1][1]] for item in ocr_result if
-                          len(item) == 2 and isinstance(item[1], tuple)]
-            else:
-                ocr_result = None
-        else:
-            logger.error("OCR model not supported")
-            ocr_result = None
+        Args:
+            image (PIL.Image or np.ndarray): the RGB table image
+
+        Returns:
+            tuple: html_code, table_cell_bboxes, logic_points, elapse, all None if no text is found
+        """
+        ocr_result = self.ocr(image)
 
         if ocr_result:
             table_results = self.table_model(np.asarray(image), ocr_result)
@@ -68,3 +65,14 @@ class RapidTableModel(object):
             return html_code, table_cell_bboxes, logic_points, elapse
         else:
             return None, None, None, None
+
+    def ocr(self, image):
+        if self.ocr_model_name == "RapidOCR":
+            ocr_result, _ = self.ocr_engine(np.asarray(image))
+        elif self.ocr_model_name == "PaddleOCR":
+            bgr_image = cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2BGR)
+            ocr_result = paddle_to_rapid_ocr_result(self.ocr_engine.ocr(bgr_image)[0])
+        else:
+            logger.error("OCR model not supported")
+            ocr_result = None
+        return ocr_result
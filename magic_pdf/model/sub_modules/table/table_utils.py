@@ -8,4 +8,63 @@ def minify_html(html):
     html = re.sub(r'\s*>\s*', '>', html)
     # 移除标签前的空白字符
     html = re.sub(r'\s*<\s*', '<', html)
-    return html.strip()
\ No newline at end of file
+    return html.strip()
+
+
+def paddle_to_rapid_ocr_result(ocr_res):
+    """Convert the result of `ModifiedPaddleOCR.ocr(img)[0]` to the ocr result
+    RapidTable consumes, [[box, text, score], ...] or None."""
+    if not ocr_res:
+        return None
+    ocr_result = [[item[0], item[1][0], item[1][1]] for item in ocr_res if
+                  len(item) == 2 and isinstance(item[1], tuple)]
+    return ocr_result or None
+
+
+class TableTimeBudget:
+    def __init__(self, seconds: float):
+        """The time the table recognition of one document may take, once it
+        is used up the remaining tables are kept as images only.
+
+        Args:
+            seconds (float): the budget in seconds, 0 or less means unlimited
+        """
+        self.seconds = seconds
+        self.used = 0.0
+        self.skipped = 0
+
+    def exhausted(self) -> bool:
+        """Whether the budget is used up."""
+        return 0 < self.seconds <= self.used
+
+    def consume(self, seconds: float):
+        """Charge the time spent on table recognition."""
+        self.used += seconds
+
+    def skip(self, count: int = 1):
+        """Count the tables left unrecognized because the budget is used up."""
+        self.skipped += count
+
+
+class SharedTableTimeBudget(TableTimeBudget):
+    def __init__(self, seconds: float, shared_used):
+        """A table time budget shared by the worker processes analyzing the
+        pages of one document, the time every process spends is charged to the
+        same counter.
+
+        Args:
+            seconds (float): the budget in seconds, 0 or less means unlimited
+            shared_used (multiprocessing.Value): the double counter of the used seconds, shared by the processes
+        """
+        self.seconds = seconds
+        self.skipped = 0
+        self._shared_used = shared_used
+
+    @property
+    def used(self) -> float:
+        return self._shared_used.value
+
+    def consume(self, seconds: float):
+        """Charge the time spent on table recognition."""
+        with self._shared_used.get_lock():
+            self._shared_used.value += seconds
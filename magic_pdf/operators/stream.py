@@ -0,0 +1,117 @@
+from typing import Any, Iterator
+
+from magic_pdf.config.constants import PARA_SPLIT_LOOKAHEAD
+from magic_pdf.config.enums import SupportedPdfParseMethod
+from magic_pdf.config.make_content_config import DropMode, MakeMode
+from magic_pdf.data.data_reader_writer import DataWriter
+from magic_pdf.data.dataset import Dataset
+from magic_pdf.dict2md.ocr_mkcontent import union_make
+from magic_pdf.model.doc_analyze_by_custom_model import doc_analyze_iter
+from magic_pdf.pdf_parse_union_core_v2 import pdf_parse_union_iter
+
+# pages inferred at once when streaming, smaller than the default window so the first pages come out early
+STREAM_WINDOW_SIZE = 8
+
+
+class StreamEvent:
+    MODEL = 'model'
+    PAGE_INFO = 'page_info'
+    MARKDOWN = 'markdown'
+    CONTENT_LIST = 'content_list'
+
+
+def stream_parse(
+    dataset: Dataset,
+    imageWriter: DataWriter,
+    img_dir_or_bucket_prefix: str,
+    parse_method: SupportedPdfParseMethod | None = None,
+    lang=None,
+    layout_model=None,
+    formula_enable=None,
+    table_enable=None,
+    start_page_id=0,
+    end_page_id=None,
+    make_mode=MakeMode.MM_MD,
+    drop_mode=DropMode.NONE,
+    window_size=STREAM_WINDOW_SIZE,
+    lookahead=PARA_SPLIT_LOOKAHEAD,
+    debug_mode=False,
+) -> Iterator[tuple[str, int, Any]]:
+    """Infer, parse and render the document page by page, so the first pages
+    can be read while the rest of the document is still processed.
+
+    For every page the events come in the order model -> page_info ->
+    markdown (or content_list), the model event of a page arrives as soon as
+    its window is inferred, the later events wait for the paragraphs of the
+    next lookahead pages. The markdown of the document is the non empty
+    markdown fragments joined by '\\n\\n', the llm aided steps are not applied.
+
+    Args:
+        dataset (Dataset): the dataset to parse
+        imageWriter (DataWriter): the writer of the cut images
+        img_dir_or_bucket_prefix (str): the image path prefix in the markdown or content list
+        parse_method (SupportedPdfParseMethod | None, optional): txt or ocr. Defaults to None,
+            which means use `dataset.classify()`
+        lang (str, optional): the language of ocr model. Defaults to None, which means use the language of the
+            dataset, e.g. detected by `lang='auto'`.
+        layout_model (str, optional): override the layout model in config. Defaults to None.
+        formula_enable (bool, optional): override the formula switch in config. Defaults to None.
+        table_enable (bool, optional): override the table switch in config. Defaults to None.
+        start_page_id (int, optional): the first page to parse. Defaults to 0.
+        end_page_id (int, optional): the last page to parse. Defaults to None, which means the last page.
+        make_mode (str, optional): MakeMode.MM_MD, MakeMode.NLP_MD or MakeMode.STANDARD_FORMAT for content lists.
+            Defaults to MakeMode.MM_MD.
+        drop_mode (str, optional): Drop strategy when some page which is corrupted or inappropriate.
+            Defaults to DropMode.NONE.
+        window_size (int, optional): pages inferred at once. Defaults to STREAM_WINDOW_SIZE.
+        lookahead (int, optional): the pages following a page when its paragraphs are split.
+            Defaults to PARA_SPLIT_LOOKAHEAD.
+        debug_mode (bool, optional): log the time of every page. Defaults to False.
+
+    Yields:
+        tuple[str, int, Any]: (StreamEvent, page index, data), the data is the model result of the page,
+            the page info, the markdown fragment or the content list of the page
+    """
+    if parse_method is None:
+        parse_method = dataset.classify()
+    # 和do_parse一样使用数据集检测到的语言
+    if lang is None:
+        lang = getattr(dataset, '_lang', None)
+
+    model_iter = doc_analyze_iter(
+        dataset,
+        ocr=parse_method == SupportedPdfParseMethod.OCR,
+        start_page_id=start_page_id,
+        end_page_id=end_page_id,
+        lang=lang,
+        layout_model=layout_model,
+        formula_enable=formula_enable,
+        table_enable=table_enable,
+        window_size=window_size,
+    )
+    # the model results pulled by the parser ahead of the page it yields
+    model_events = []
+
+    def iter_models():
+        for page_model in model_iter:
+            model_events.append((StreamEvent.MODEL, page_model['page_info']['page_no'], page_model))
+            yield page_model
+
+    page_infos = pdf_parse_union_iter(
+        iter_models(),
+        dataset,
+        imageWriter,
+        parse_method,
+        start_page_id=start_page_id,
+        end_page_id=end_page_id,
+        debug_mode=debug_mode,
+        lang=lang,
+        lookahead=lookahead,
+    )
+    content_event = StreamEvent.CONTENT_LIST if make_mode == MakeMode.STANDARD_FORMAT else StreamEvent.MARKDOWN
+    for page_info in page_infos:
+        yield from model_events
+        model_events.clear()
+        page_idx = page_info['page_idx']
+        yield StreamEvent.PAGE_INFO, page_idx, page_info
+        yield content_event, page_idx, union_make([page_info], make_mode, drop_mode, img_dir_or_bucket_prefix)
@@ -4,12 +4,13 @@ import os
 import re
 import statistics
 import time
-from typing import List
+from typing import Iterable, Iterator, List
 
 import fitz
 import torch
 from loguru import logger
 
+from magic_pdf.config.constants import PARA_SPLIT_LOOKAHEAD
 from magic_pdf.config.enums import SupportedPdfParseMethod
 from magic_pdf.config.ocr_content_type import BlockType, ContentType
 from magic_pdf.data.dataset import Dataset, PageableData
@@ -17,8 +18,7 @@ from magic_pdf.libs.boxbase import calculate_overlap_area_in_bbox1_area_ratio, _
 from magic_pdf.libs.clean_memory import clean_memory
 from magic_pdf.libs.config_reader import get_local_layoutreader_model_dir, get_llm_aided_config, get_device
 from magic_pdf.libs.convert_utils import dict_to_list
-from magic_pdf.libs.hash_utils import compute_md5
-from magic_pdf.libs.pdf_image_tools import cut_image_to_pil_image
+from magic_pdf.libs.pdf_image_tools import cut_images_to_pil_image
 from magic_pdf.model.magic_model import MagicModel
 from magic_pdf.post_proc.llm_aided import llm_aided_formula, llm_aided_text, llm_aided_title
 
@@ -30,8 +30,7 @@ try:
 except ImportError:
     pass
 
-from magic_pdf.model.sub_modules.model_init import AtomModelSingleton
-from magic_pdf.post_proc.para_split_v3 import para_split
+from magic_pdf.post_proc.para_split_v3 import para_split, para_split_stream
 from magic_pdf.pre_proc.construct_page_dict import ocr_construct_page_component_v2
 from magic_pdf.pre_proc.cut_image import ocr_cut_image_and_table
 from magic_pdf.pre_proc.ocr_detect_all_bboxes import ocr_prepare_bboxes_for_layout_split_v2
@@ -41,6 +40,9 @@ from magic_pdf.pre_proc.ocr_span_list_modify import get_qa_need_list_v2, remove_
 
 os.environ['NO_ALBUMENTATIONS_UPDATE'] = '1'  # 禁止albumentations检查更新
 
+# layoutreader最高支持512line，行数更多的页面使用xycut排序
+LAYOUTREADER_MAX_LINES = 200
+
 
 def __replace_STX_ETX(text_str: str):
     """Replace \u0002 and \u0003, as these characters become garbled when extracted using pymupdf. In fact, they were originally quotation marks.
@@ -278,7 +280,9 @@ def txt_spans_extract_v2(pdf_page, spans, all_bboxes, all_discarded_blocks, lang
 
     if len(empty_spans) > 0:
 
-        # 初始化ocr模型
+        # 初始化ocr模型，只在需要ocr时加载模型依赖
+        from magic_pdf.model.sub_modules.model_init import AtomModelSingleton
+
         atom_model_manager = AtomModelSingleton()
         ocr_model = atom_model_manager.get_atom_model(
             atom_model_name='ocr',
@@ -287,9 +291,9 @@ def txt_spans_extract_v2(pdf_page, spans, all_bboxes, all_discarded_blocks, lang
             lang=lang
         )
 
-        for span in empty_spans:
-            # 对span的bbox截图再ocr
-            span_img = cut_image_to_pil_image(span['bbox'], pdf_page, mode='cv2')
+        # 对span的bbox截图再ocr，所有span的截图只渲染一次页面
+        span_imgs = cut_images_to_pil_image([span['bbox'] for span in empty_spans], pdf_page, mode='cv2')
+        for span, span_img in zip(empty_spans, span_imgs):
             ocr_res = ocr_model.ocr(span_img, det=False)
             if ocr_res and len(ocr_res) > 0:
                 if len(ocr_res[0]) > 0:
@@ -365,13 +369,67 @@ class ModelSingleton:
 
 
 def do_predict(boxes: List[List[int]], model) -> List[int]:
+    return do_predict_batch([boxes], model)[0]
+
+
+def do_predict_batch(boxes_list: List[List[List[int]]], model) -> List[List[int]]:
     from magic_pdf.model.sub_modules.reading_oreder.layoutreader.helpers import (
-        boxes2inputs, parse_logits, prepare_inputs)
+        batch_boxes2inputs, parse_logits, prepare_inputs)
 
-    inputs = boxes2inputs(boxes)
+    inputs = batch_boxes2inputs(boxes_list)
     inputs = prepare_inputs(inputs, model)
-    logits = model(**inputs).logits.cpu().squeeze(0)
-    return parse_logits(logits, len(boxes))
+    logits = model(**inputs).logits.cpu()
+    return [parse_logits(logits[i], len(boxes)) for i, boxes in enumerate(boxes_list)]
+
+
+def get_layoutreader_batch_size() -> int:
+    """The pages layoutreader sorts in one forward pass, can be overridden by
+    the env `MINERU_LAYOUTREADER_BATCH_SIZE`."""
+    return max(int(os.getenv('MINERU_LAYOUTREADER_BATCH_SIZE', 16)), 1)
+
+
+def predict_reading_orders(boxes_list: list, memo: dict | None = None, batch_size: int | None = None) -> list:
+    """Sort the lines of several pages with layoutreader in padded batches,
+    pages with the same line boxes, e.g. the pages of a repeated template,
+    are sorted once.
+
+    Args:
+        boxes_list (list): the normalized line boxes of every page, None for the pages sorted by xycut
+        memo (dict | None, optional): the orders of the line boxes sorted before, shared by the calls on
+            the pages of the same document. Defaults to None.
+        batch_size (int | None, optional): the pages sorted in one forward pass. Defaults to None, which
+            means use `get_layoutreader_batch_size()`
+
+    Returns:
+        list: the line orders of every page, None for the pages sorted by xycut
+    """
+    if memo is None:
+        memo = {}
+    if batch_size is None:
+        batch_size = get_layoutreader_batch_size()
+    keys = [tuple(map(tuple, boxes)) if boxes is not None else None for boxes in boxes_list]
+    pending = []
+    for key in dict.fromkeys(keys):
+        if key is None or key in memo:
+            continue
+        if len(key) == 0:
+            memo[key] = []
+        else:
+            pending.append(key)
+
+    if pending:
+        # 行数相近的页面放在同一批，减少padding
+        pending.sort(key=len, reverse=True)
+        model_manager = ModelSingleton()
+        model = model_manager.get_model('layoutreader')
+        with torch.no_grad():
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start: start + batch_size]
+                orders_list = do_predict_batch([[list(box) for box in key] for key in batch], model)
+                for key, orders in zip(batch, orders_list):
+                    memo[key] = orders
+
+    return [memo[key] if key is not None else None for key in keys]
 
 
 def cal_block_index(fix_blocks, sorted_bboxes):
@@ -477,7 +535,14 @@ def insert_lines_into_block(block_bbox, line_height, page_w, page_h):
         return [[x0, y0, x1, y1]]
 
 
-def sort_lines_by_model(fix_blocks, page_w, page_h, line_height):
+def prepare_lines_for_model(fix_blocks, page_w, page_h, line_height):
+    """Collect the lines layoutreader sorts on the page, the blocks without
+    lines are split into virtual lines.
+
+    Returns:
+        tuple: the line bboxes of the page and their boxes normalized to 1000x1000 for layoutreader,
+            the boxes are None if the page has too many lines and is sorted by xycut
+    """
     page_line_list = []
 
     def add_lines_to_block(b):
@@ -506,8 +571,9 @@ def sort_lines_by_model(fix_blocks, page_w, page_h, line_height):
             block['real_lines'] = copy.deepcopy(block['lines'])
             add_lines_to_block(block)
 
-    if len(page_line_list) > 200:  # layoutreader最高支持512line
-        return None
+    if len(page_line_list) > LAYOUTREADER_MAX_LINES:
+        logger.info(f'{len(page_line_list)} lines on the page are more than layoutreader sorts, use xycut')
+        return page_line_list, None
 
     # 使用layoutreader排序
     x_scale = 1000.0 / page_w
@@ -544,13 +610,8 @@ def sort_lines_by_model(fix_blocks, page_w, page_h, line_height):
             1000 >= right >= left >= 0 and 1000 >= bottom >= top >= 0
         ), f'Invalid box. right: {right}, left: {left}, bottom: {bottom}, top: {top}'  # noqa: E126, E121
         boxes.append([left, top, right, bottom])
-    model_manager = ModelSingleton()
-    model = model_manager.get_model('layoutreader')
-    with torch.no_grad():
-        orders = do_predict(boxes, model)
-    sorted_bboxes = [page_line_list[i] for i in orders]
 
-    return sorted_bboxes
+    return page_line_list, boxes
 
 
 def get_line_height(blocks):
@@ -669,9 +730,16 @@ def remove_outside_spans(spans, all_bboxes, all_discarded_blocks):
     return new_spans
 
 
-def parse_page_core(
+def prepare_page_core(
     page_doc: PageableData, magic_model, page_id, pdf_bytes_md5, imageWriter, parse_mode, lang
-):
+) -> dict:
+    """Parse the page up to the line sorting, so the lines of many pages can
+    be sorted by layoutreader together, see `finish_page_core`.
+
+    Returns:
+        dict: the parse state of the page, with the page info under `page_info` if the page is done already
+            and the normalized line boxes for layoutreader under `boxes` otherwise
+    """
     need_drop = False
     drop_reason = []
 
@@ -820,7 +888,7 @@ def parse_page_core(
     """如果当前页面没有有效的bbox则跳过"""
     if len(all_bboxes) == 0:
         logger.warning(f'skip this page, not found useful bbox, page_id: {page_id}')
-        return ocr_construct_page_component_v2(
+        return {'page_info': ocr_construct_page_component_v2(
             [],
             [],
             page_id,
@@ -833,7 +901,7 @@ def parse_page_core(
             fix_discarded_blocks,
             need_drop,
             drop_reason,
-        )
+        )}
 
     """对image和table截图"""
     spans = ocr_cut_image_and_table(
@@ -852,8 +920,40 @@ def parse_page_core(
     """获取所有line并计算正文line的高度"""
     line_height = get_line_height(fix_blocks)
 
-    """获取所有line并对line排序"""
-    sorted_bboxes = sort_lines_by_model(fix_blocks, page_w, page_h, line_height)
+    """获取所有line，由layoutreader统一排序"""
+    page_line_list, boxes = prepare_lines_for_model(fix_blocks, page_w, page_h, line_height)
+
+    return {
+        'page_id': page_id,
+        'page_w': page_w,
+        'page_h': page_h,
+        'fix_blocks': fix_blocks,
+        'fix_discarded_blocks': fix_discarded_blocks,
+        'page_line_list': page_line_list,
+        'boxes': boxes,
+        'need_drop': need_drop,
+        'drop_reason': drop_reason,
+    }
+
+
+def finish_page_core(page_state: dict, orders) -> dict:
+    """Finish parsing the page prepared by `prepare_page_core` with the line
+    orders layoutreader predicts.
+
+    Args:
+        page_state (dict): the parse state of the page
+        orders (list | None): the order of every line in `page_line_list`, None for xycut
+
+    Returns:
+        dict: the page info
+    """
+    if 'page_info' in page_state:
+        return page_state['page_info']
+    fix_blocks = page_state['fix_blocks']
+    if orders is not None:
+        sorted_bboxes = [page_state['page_line_list'][i] for i in orders]
+    else:
+        sorted_bboxes = None
 
     """根据line的中位数算block的序列关系"""
     fix_blocks = cal_block_index(fix_blocks, sorted_bboxes)
@@ -876,20 +976,30 @@ def parse_page_core(
     page_info = ocr_construct_page_component_v2(
         sorted_blocks,
         [],
-        page_id,
-        page_w,
-        page_h,
+        page_state['page_id'],
+        page_state['page_w'],
+        page_state['page_h'],
         [],
         images,
         tables,
         interline_equations,
-        fix_discarded_blocks,
-        need_drop,
-        drop_reason,
+        page_state['fix_discarded_blocks'],
+        page_state['need_drop'],
+        page_state['drop_reason'],
     )
     return page_info
 
 
+def parse_page_core(
+    page_doc: PageableData, magic_model, page_id, pdf_bytes_md5, imageWriter, parse_mode, lang, memo=None
+):
+    page_state = prepare_page_core(page_doc, magic_model, page_id, pdf_bytes_md5, imageWriter, parse_mode, lang)
+    orders = None
+    if 'page_info' not in page_state:
+        orders = predict_reading_orders([page_state['boxes']], memo=memo)[0]
+    return finish_page_core(page_state, orders)
+
+
 def pdf_parse_union(
     model_list,
     dataset: Dataset,
@@ -901,7 +1011,7 @@ def pdf_parse_union(
     lang=None,
 ):
 
-    pdf_bytes_md5 = compute_md5(dataset.data_bits())
+    pdf_bytes_md5 = dataset.data_md5()
 
     """初始化空的pdf_info_dict"""
     pdf_info_dict = {}
@@ -924,6 +1034,7 @@ def pdf_parse_union(
     """初始化启动时间"""
     start_time = time.time()
 
+    page_states = {}
     for page_id, page in enumerate(dataset):
         """debug时输出每页解析的耗时."""
         if debug_mode:
@@ -933,19 +1044,27 @@ def pdf_parse_union(
             )
             start_time = time_now
 
-        """解析pdf中的每一页"""
+        """解析pdf中的每一页，line排序之前的部分"""
         if start_page_id <= page_id <= end_page_id:
-            page_info = parse_page_core(
+            page_states[page_id] = prepare_page_core(
                 page, magic_model, page_id, pdf_bytes_md5, imageWriter, parse_mode, lang
             )
         else:
-            page_info = page.get_page_info()
-            page_w = page_info.w
-            page_h = page_info.h
-            page_info = ocr_construct_page_component_v2(
+            page_w, page_h = magic_model.get_page_size(page_id)
+            page_states[page_id] = {'page_info': ocr_construct_page_component_v2(
                 [], [], page_id, page_w, page_h, [], [], [], [], [], True, 'skip page'
-            )
-        pdf_info_dict[f'page_{page_id}'] = page_info
+            )}
+
+    """所有页面的line一起用layoutreader排序"""
+    sort_start_time = time.time()
+    sort_page_ids = [page_id for page_id, page_state in page_states.items() if 'page_info' not in page_state]
+    orders_list = predict_reading_orders([page_states[page_id]['boxes'] for page_id in sort_page_ids])
+    page_orders = dict(zip(sort_page_ids, orders_list))
+    if debug_mode:
+        logger.info(f'sort the lines of {len(sort_page_ids)} pages cost: {round(time.time() - sort_start_time, 2)}')
+
+    for page_id, page_state in page_states.items():
+        pdf_info_dict[f'page_{page_id}'] = finish_page_core(page_state, page_orders.get(page_id))
 
     """分段"""
     para_split(pdf_info_dict)
@@ -986,5 +1105,92 @@ def pdf_parse_union(
     return new_pdf_info_dict
 
 
+def pdf_parse_union_iter(
+    model_iter: Iterable[dict],
+    dataset: Dataset,
+    imageWriter,
+    parse_mode,
+    start_page_id=0,
+    end_page_id=None,
+    debug_mode=False,
+    lang=None,
+    lookahead=PARA_SPLIT_LOOKAHEAD,
+) -> Iterator[dict]:
+    """Parse the pages as their model results arrive, e.g. from
+    `doc_analyze_iter`, and yield the page info of every page once the
+    paragraphs continuing on the next lookahead pages are merged into it. The
+    llm aided steps need the whole document and are not applied.
+
+    Args:
+        model_iter (Iterable[dict]): the model result of every page of dataset in page order
+        dataset (Dataset): the dataset
+        imageWriter (DataWriter): the writer of the cut images
+        parse_mode (SupportedPdfParseMethod): txt or ocr
+        start_page_id (int, optional): the first page to parse. Defaults to 0.
+        end_page_id (int, optional): the last page to parse. Defaults to None, which means the last page.
+        debug_mode (bool, optional): log the time of every page. Defaults to False.
+        lang (str, optional): the language of the document. Defaults to None.
+        lookahead (int, optional): the pages following a page when its paragraphs are split.
+            Defaults to PARA_SPLIT_LOOKAHEAD.
+
+    Yields:
+        dict: the page info of every page in page order, the items of `pdf_info` in the result of `pdf_parse_union`
+    """
+    pdf_bytes_md5 = dataset.data_md5()
+
+    end_page_id = (
+        end_page_id
+        if end_page_id is not None and end_page_id >= 0
+        else len(dataset) - 1
+    )
+    if end_page_id > len(dataset) - 1:
+        logger.warning('end_page_id is out of range, use pdf_docs length')
+        end_page_id = len(dataset) - 1
+
+    llm_aided_config = get_llm_aided_config()
+    if llm_aided_config is not None:
+        logger.warning('llm aided steps are not applied when the pages are parsed as a stream')
+
+    # the model results of the pages are filled in as they arrive
+    model_list = []
+    for page_id in range(len(dataset)):
+        page_width, page_height = dataset.get_page(page_id).get_image_size()
+        model_list.append({
+            'layout_dets': [],
+            'page_info': {'page_no': page_id, 'height': page_height, 'width': page_width},
+        })
+    magic_model = MagicModel(model_list, dataset)
+
+    def iter_page_infos():
+        # 流式解析逐页排序，重复的页面模板只排序一次
+        memo = {}
+        start_time = time.time()
+        for page_id, model_page_info in enumerate(model_iter):
+            if debug_mode:
+                time_now = time.time()
+                logger.info(
+                    f'page_id: {page_id}, last_page_cost_time: {round(time.time() - start_time, 2)}'
+                )
+                start_time = time_now
+
+            if start_page_id <= page_id <= end_page_id:
+                magic_model.set_page(page_id, copy.deepcopy(model_page_info))
+                page_info = parse_page_core(
+                    dataset.get_page(page_id), magic_model, page_id, pdf_bytes_md5, imageWriter, parse_mode, lang,
+                    memo=memo,
+                )
+            else:
+                page_w, page_h = magic_model.get_page_size(page_id)
+                page_info = ocr_construct_page_component_v2(
+                    [], [], page_id, page_w, page_h, [], [], [], [], [], True, 'skip page'
+                )
+            yield f'page_{page_id}', page_info
+
+    for _, page_info in para_split_stream(iter_page_infos(), lookahead=lookahead):
+        yield page_info
+
+    clean_memory(get_device())
+
+
 if __name__ == '__main__':
     pass
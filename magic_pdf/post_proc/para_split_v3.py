@@ -1,4 +1,5 @@
 import copy
+from typing import Iterable, Iterator
 
 from loguru import logger
 
@@ -383,6 +384,69 @@ def para_split(pdf_info_dict):
                 page['para_blocks'].append(block)
 
 
+def para_split_stream(pages: Iterable[tuple[str, dict]], lookahead: int = 2) -> Iterator[tuple[str, dict]]:
+    """Split the paragraphs of pages arriving one by one, a page is released
+    once the next lookahead pages have arrived, so the paragraphs continuing
+    on the following pages are merged into it like `para_split` does. With a
+    lookahead covering all pages the result equals `para_split`.
+
+    Args:
+        pages (Iterable[tuple[str, dict]]): (page key, page info) in page order, like the items of the pdf_info_dict
+            of `para_split`
+        lookahead (int, optional): the pages following a page when its paragraphs are split. Defaults to 2.
+
+    Yields:
+        tuple[str, dict]: (page key, page info) in page order, the page info gets its para_blocks
+    """
+    window = []
+    # page key -> {block index: block}, the blocks whose lines are merged into a released page
+    consumed = {}
+    for page_num, page in pages:
+        window.append((page_num, page))
+        if len(window) > lookahead:
+            __para_split_window(window, consumed)
+            yield window.pop(0)
+    if window:
+        __para_split_window(window, consumed)
+        yield from window
+
+
+def __para_split_window(window, consumed):
+    # 被合并进已输出页面的block不再参与分段，其余block每次都从preproc_blocks重新分段
+    window_dict = {}
+    for page_num, page in window:
+        page_consumed = consumed.get(page_num, {})
+        window_dict[page_num] = {
+            'preproc_blocks': [
+                block for index, block in enumerate(page['preproc_blocks']) if index not in page_consumed
+            ],
+            'page_size': page['page_size'],
+        }
+    para_split(window_dict)
+
+    release_page_num = window[0][0]
+    # the page of the block the lines of a deleted block are merged into
+    owner_page_num = None
+    for page_num, page in window:
+        page_consumed = consumed.get(page_num, {})
+        split_blocks = iter(window_dict[page_num]['para_blocks'])
+        para_blocks = []
+        for index in range(len(page['preproc_blocks'])):
+            if index in page_consumed:
+                para_blocks.append(page_consumed[index])
+                continue
+            block = next(split_blocks)
+            if block['type'] in [BlockType.Title, BlockType.InterlineEquation]:
+                owner_page_num = None
+            elif block['type'] in [BlockType.Text, BlockType.List, BlockType.Index]:
+                if not block.get(LINES_DELETED, False):
+                    owner_page_num = page_num
+                elif owner_page_num == release_page_num and page_num != release_page_num:
+                    consumed.setdefault(page_num, {})[index] = block
+            para_blocks.append(block)
+        page['para_blocks'] = para_blocks
+    consumed.pop(release_page_num, None)
+
 if __name__ == '__main__':
     input_blocks = []
     # 调用函数
@@ -1,26 +1,23 @@
 from loguru import logger
 
 from magic_pdf.config.ocr_content_type import ContentType
-from magic_pdf.libs.commons import join_path
-from magic_pdf.libs.pdf_image_tools import cut_image
+from magic_pdf.libs.pdf_image_tools import cut_images
 
 
 def ocr_cut_image_and_table(spans, page, page_id, pdf_bytes_md5, imageWriter):
-    def return_path(type):
-        return join_path(pdf_bytes_md5, type)
-
+    cut_spans = []
     for span in spans:
         span_type = span['type']
-        if span_type == ContentType.Image:
-            if not check_img_bbox(span['bbox']) or not imageWriter:
-                continue
-            span['image_path'] = cut_image(span['bbox'], page_id, page, return_path=return_path('images'),
-                                           imageWriter=imageWriter)
-        elif span_type == ContentType.Table:
+        if span_type in [ContentType.Image, ContentType.Table]:
             if not check_img_bbox(span['bbox']) or not imageWriter:
                 continue
-            span['image_path'] = cut_image(span['bbox'], page_id, page, return_path=return_path('tables'),
-                                           imageWriter=imageWriter)
+            cut_spans.append(span)
+
+    if cut_spans:
+        # 整页只渲染一次，所有图片从同一张渲染结果中裁剪，内容相同的图片只写入一次
+        image_paths = cut_images([span['bbox'] for span in cut_spans], page, imageWriter)
+        for span, image_path in zip(cut_spans, image_paths):
+            span['image_path'] = image_path
 
     return spans
 
@@ -70,6 +70,14 @@ without method specified, auto will be used by default.""",
     help='Enables detailed debugging information during the execution of the CLI commands.',
     default=False,
 )
+@click.option(
+    '-c',
+    '--checkpoint',
+    'checkpoint',
+    type=bool,
+    help='Persists the model results periodically, so a rerun of an interrupted document resumes from the last persisted page.',
+    default=False,
+)
 @click.option(
     '-s',
     '--start',
@@ -86,7 +94,7 @@ without method specified, auto will be used by default.""",
     help='The ending page for PDF parsing, beginning from 0.',
     default=None,
 )
-def cli(path, output_dir, method, lang, debug_able, start_page_id, end_page_id):
+def cli(path, output_dir, method, lang, debug_able, checkpoint, start_page_id, end_page_id):
     model_config.__use_inside_model__ = True
     model_config.__model_mode__ = 'full'
     os.makedirs(output_dir, exist_ok=True)
@@ -123,7 +131,8 @@ def cli(path, output_dir, method, lang, debug_able, start_page_id, end_page_id):
                 debug_able,
                 start_page_id=start_page_id,
                 end_page_id=end_page_id,
-                lang=lang
+                lang=lang,
+                f_checkpoint=checkpoint,
             )
 
         except Exception as e:
@@ -1,15 +1,15 @@
 import os
 
 import click
-import fitz
 from loguru import logger
 
 import magic_pdf.model as model_config
 from magic_pdf.config.enums import SupportedPdfParseMethod
 from magic_pdf.config.make_content_config import DropMode, MakeMode
-from magic_pdf.data.data_reader_writer import FileBasedDataWriter
+from magic_pdf.data.data_reader_writer import FileBasedDataReader, FileBasedDataWriter
 from magic_pdf.data.dataset import PymuDocDataset
 from magic_pdf.libs.draw_bbox import draw_char_bbox
+from magic_pdf.model.checkpoint import DocAnalyzeCheckpoint
 from magic_pdf.model.doc_analyze_by_custom_model import doc_analyze
 from magic_pdf.operators.models import InferenceResult
 
@@ -51,22 +51,6 @@ def prepare_env(output_dir, pdf_file_name, method):
 #     return converted_pdf_bytes
 
 
-def convert_pdf_bytes_to_bytes_by_pymupdf(pdf_bytes, start_page_id=0, end_page_id=None):
-    document = fitz.open('pdf', pdf_bytes)
-    output_document = fitz.open()
-    end_page_id = (
-        end_page_id
-        if end_page_id is not None and end_page_id >= 0
-        else len(document) - 1
-    )
-    if end_page_id > len(document) - 1:
-        logger.warning('end_page_id is out of range, use pdf_docs length')
-        end_page_id = len(document) - 1
-    output_document.insert_pdf(document, from_page=start_page_id, to_page=end_page_id)
-    output_bytes = output_document.tobytes()
-    return output_bytes
-
-
 def do_parse(
     output_dir,
     pdf_file_name,
@@ -91,6 +75,7 @@ def do_parse(
     layout_model=None,
     formula_enable=None,
     table_enable=None,
+    f_checkpoint=False,
 ):
     if debug_able:
         logger.warning('debug mode is on')
@@ -98,10 +83,6 @@ def do_parse(
         f_draw_line_sort_bbox = True
         # f_draw_char_bbox = True
 
-    pdf_bytes = convert_pdf_bytes_to_bytes_by_pymupdf(
-        pdf_bytes, start_page_id, end_page_id
-    )
-
     local_image_dir, local_md_dir = prepare_env(output_dir, pdf_file_name, parse_method)
 
     image_writer, md_writer = FileBasedDataWriter(local_image_dir), FileBasedDataWriter(
@@ -109,7 +90,14 @@ def do_parse(
     )
     image_dir = str(os.path.basename(local_image_dir))
 
-    ds = PymuDocDataset(pdf_bytes, lang=lang)
+    ds = PymuDocDataset(pdf_bytes, lang=lang).select_pages(start_page_id, end_page_id)
+
+    checkpoint = None
+    if f_checkpoint:
+        # 模型结果定期写入输出目录，中断后重新运行从最后写入的页继续
+        checkpoint = DocAnalyzeCheckpoint(
+            md_writer, FileBasedDataReader(local_md_dir), f'{pdf_file_name}_checkpoint'
+        )
 
     if len(model_list) == 0:
         if model_config.__use_inside_model__:
@@ -122,6 +110,7 @@ def do_parse(
                         layout_model=layout_model,
                         formula_enable=formula_enable,
                         table_enable=table_enable,
+                        checkpoint=checkpoint,
                     )
                     pipe_result = infer_result.pipe_txt_mode(
                         image_writer, debug_mode=True, lang=ds._lang
@@ -134,6 +123,7 @@ def do_parse(
                         layout_model=layout_model,
                         formula_enable=formula_enable,
                         table_enable=table_enable,
+                        checkpoint=checkpoint,
                     )
                     pipe_result = infer_result.pipe_ocr_mode(
                         image_writer, debug_mode=True, lang=ds._lang
@@ -147,6 +137,7 @@ def do_parse(
                     layout_model=layout_model,
                     formula_enable=formula_enable,
                     table_enable=table_enable,
+                    checkpoint=checkpoint,
                 )
                 pipe_result = infer_result.pipe_txt_mode(
                     image_writer, debug_mode=True, lang=ds._lang
@@ -159,6 +150,7 @@ def do_parse(
                     layout_model=layout_model,
                     formula_enable=formula_enable,
                     table_enable=table_enable,
+                    checkpoint=checkpoint,
                 )
                 pipe_result = infer_result.pipe_ocr_mode(
                     image_writer, debug_mode=True, lang=ds._lang
@@ -209,7 +201,7 @@ def do_parse(
         )
 
     if f_draw_char_bbox:
-        draw_char_bbox(pdf_bytes, local_md_dir, f'{pdf_file_name}_char_bbox.pdf')
+        draw_char_bbox(ds.data_bits(), local_md_dir, f'{pdf_file_name}_char_bbox.pdf')
 
     if f_dump_md:
         pipe_result.dump_md(
@@ -229,7 +221,7 @@ def do_parse(
     if f_dump_orig_pdf:
         md_writer.write(
             f'{pdf_file_name}_origin.pdf',
-            pdf_bytes,
+            ds.data_bits(),
         )
 
     if f_dump_content_list:
@@ -0,0 +1,71 @@
+# Copyright (c) Opendatalab. All rights reserved.
+"""Measure the peak RSS of doc_analyze as the page count grows.
+
+Every run builds a pdf of the requested page count by repeating the pages of
+the input pdf, then analyzes it in a fresh process so the peak RSS of one run
+does not leak into the next. With a fixed window size the peak RSS should stay
+flat as the page count grows. The page cache is disabled, the repeated pages
+would be cache hits and skip the inference being measured.
+
+    python scripts/benchmark_doc_analyze_memory.py demo/demo1.pdf --pages 16 64 256 --window-size 16
+"""
+import argparse
+import multiprocessing
+import resource
+import sys
+import time
+
+import fitz
+
+
+def build_pdf_bytes(pdf_bytes: bytes, page_count: int) -> bytes:
+    src = fitz.open('pdf', pdf_bytes)
+    dst = fitz.open()
+    while len(dst) < page_count:
+        dst.insert_pdf(src, to_page=min(len(src), page_count - len(dst)) - 1)
+    return dst.tobytes()
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on linux
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def run_once(pdf_bytes: bytes, ocr: bool, window_size: int, queue):
+    from magic_pdf.data.dataset import PymuDocDataset
+    from magic_pdf.model.doc_analyze_by_custom_model import doc_analyze
+
+    ds = PymuDocDataset(pdf_bytes)
+    start = time.time()
+    infer_result = ds.apply(doc_analyze, ocr=ocr, window_size=window_size, use_page_cache=False)
+    queue.put({
+        'pages': len(infer_result.get_infer_res()),
+        'seconds': round(time.time() - start, 2),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    })
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('pdf', help='the pdf whose pages are repeated to build the inputs')
+    parser.add_argument('--pages', type=int, nargs='+', default=[16, 64, 256])
+    parser.add_argument('--window-size', type=int, default=16, help='0 means all pages at once')
+    parser.add_argument('--ocr', action='store_true')
+    args = parser.parse_args()
+
+    with open(args.pdf, 'rb') as f:
+        origin_pdf_bytes = f.read()
+
+    ctx = multiprocessing.get_context('spawn')
+    print('pages\tseconds\tpeak_rss_mb')
+    for page_count in args.pages:
+        queue = ctx.Queue()
+        proc = ctx.Process(
+            target=run_once,
+            args=(build_pdf_bytes(origin_pdf_bytes, page_count), args.ocr, args.window_size, queue),
+        )
+        proc.start()
+        res = queue.get()
+        proc.join()
+        print(f"{res['pages']}\t{res['seconds']}\t{res['peak_rss_mb']}")
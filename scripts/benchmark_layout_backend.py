@@ -0,0 +1,94 @@
+# Copyright (c) Opendatalab. All rights reserved.
+"""Compare the latency and the detections of the DocLayout-YOLO backends.
+
+The pages of the input pdf are detected by the pytorch model first, then by
+every requested onnx variant. The detections of a variant are matched to the
+pytorch detections of the same category by IoU, exact means the same category
+and the same poly.
+
+    python scripts/benchmark_layout_backend.py demo/demo1.pdf --weight /tmp/models/Layout/YOLO/doclayout_yolo_ft.pt \
+        --variants fp32 dynamic --batch-size 1
+"""
+import argparse
+import time
+
+from PIL import Image
+
+from magic_pdf.data.dataset import PymuDocDataset
+from magic_pdf.libs.boxbase import calculate_iou
+from magic_pdf.model.sub_modules.layout.doclayout_yolo.DocLayoutYOLO import \
+    DocLayoutYOLOModel
+from magic_pdf.model.sub_modules.layout.doclayout_yolo.onnx_backend import (
+    LayoutBackend, LayoutQuantize)
+
+
+def poly_to_bbox(poly):
+    return [poly[0], poly[1], poly[4], poly[5]]
+
+
+def compare(baseline: list, candidate: list, iou_threshold: float) -> dict:
+    stats = {'baseline': 0, 'candidate': 0, 'matched': 0, 'exact': 0, 'max_score_diff': 0.0}
+    for base_res, cand_res in zip(baseline, candidate):
+        stats['baseline'] += len(base_res)
+        stats['candidate'] += len(cand_res)
+        unmatched = list(cand_res)
+        for base_det in base_res:
+            best, best_iou = None, iou_threshold
+            for cand_det in unmatched:
+                if cand_det['category_id'] != base_det['category_id']:
+                    continue
+                iou = calculate_iou(poly_to_bbox(base_det['poly']), poly_to_bbox(cand_det['poly']))
+                if iou >= best_iou:
+                    best, best_iou = cand_det, iou
+            if best is None:
+                continue
+            unmatched.remove(best)
+            stats['matched'] += 1
+            stats['exact'] += int(best['poly'] == base_det['poly'])
+            stats['max_score_diff'] = max(stats['max_score_diff'], abs(best['score'] - base_det['score']))
+    return stats
+
+
+def run(model: DocLayoutYOLOModel, images: list, batch_size: int) -> tuple[list, float]:
+    # the first batch warms up the session
+    model.batch_predict(images[:batch_size], batch_size)
+    start = time.time()
+    layout_res = model.batch_predict(images, batch_size)
+    return layout_res, (time.time() - start) / max(len(images), 1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('pdf')
+    parser.add_argument('--weight', required=True, help='the pytorch weights of DocLayout-YOLO')
+    parser.add_argument('--variants', nargs='+', default=['fp32', LayoutQuantize.DYNAMIC],
+                        choices=['fp32', LayoutQuantize.DYNAMIC, LayoutQuantize.STATIC])
+    parser.add_argument('--calibration-dir', default=None, help='the page images static quantization is calibrated with')
+    parser.add_argument('--pages', type=int, default=16, help='the number of pages to detect')
+    parser.add_argument('--batch-size', type=int, default=1)
+    parser.add_argument('--iou', type=float, default=0.5, help='the IoU a detection is matched at')
+    args = parser.parse_args()
+
+    with open(args.pdf, 'rb') as f:
+        ds = PymuDocDataset(f.read())
+    images = [Image.fromarray(ds.get_page(index).get_image()['img']) for index in range(min(len(ds), args.pages))]
+
+    baseline, baseline_latency = run(DocLayoutYOLOModel(args.weight, 'cpu'), images, args.batch_size)
+    print('backend\tms/page\tspeedup\tbaseline\tcandidate\trecall\texact\tmax_score_diff')
+    print(f'torch\t{round(baseline_latency * 1000, 1)}\t1.0\t-\t-\t-\t-\t-')
+    for variant in args.variants:
+        model = DocLayoutYOLOModel(
+            args.weight,
+            'cpu',
+            backend=LayoutBackend.ONNX,
+            quantize=None if variant == 'fp32' else variant,
+            calibration_dir=args.calibration_dir,
+        )
+        layout_res, latency = run(model, images, args.batch_size)
+        stats = compare(baseline, layout_res, args.iou)
+        recall = stats['matched'] / max(stats['baseline'], 1)
+        exact = stats['exact'] / max(stats['baseline'], 1)
+        print(
+            f"onnx-{variant}\t{round(latency * 1000, 1)}\t{round(baseline_latency / max(latency, 1e-9), 2)}"
+            f"\t{stats['baseline']}\t{stats['candidate']}\t{recall:.1%}\t{exact:.1%}\t{round(stats['max_score_diff'], 3)}"
+        )
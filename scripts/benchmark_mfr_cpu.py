@@ -0,0 +1,104 @@
+# Copyright (c) Opendatalab. All rights reserved.
+"""Compare the latency and the latex of UniMERNet in fp32 and in the cpu
+int8 mode.
+
+The formulas are cropped from the pages of the pdf by the formula
+detections of its model json (the `*_model.json` written by magic-pdf),
+recognized by the fp32 model first and then by the int8 model. The latex of
+the int8 model is compared to the fp32 latex by the normalized edit distance.
+Both modes decode up to the max_seq_len of the model and stop at eos, the
+`capped` column counts the formulas whose decode reached max_seq_len, i.e. that
+are likely truncated. The tokens of a formula are counted on the raw latex of
+the model, whose tokens are separated by spaces.
+
+    python scripts/benchmark_mfr_cpu.py tests/unittest/test_model/assets/test_01.pdf \
+        tests/unittest/test_model/assets/test_01.model.json --weight-dir /tmp/models/MFR/unimernet_small_2501
+"""
+import argparse
+import json
+import os
+import time
+
+from PIL import Image
+
+from magic_pdf.data.dataset import PymuDocDataset
+from magic_pdf.model.sub_modules.mfr.unimernet.Unimernet import (
+    UnimernetModel, latex_rm_whitespace)
+
+CFG_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'magic_pdf', 'resources', 'model_config', 'UniMERNet', 'demo.yaml',
+)
+
+
+def edit_distance(a: str, b: str) -> int:
+    prev = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        cur = [i]
+        for j, char_b in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (char_a != char_b)))
+        prev = cur
+    return prev[-1]
+
+
+def normalized_edit_distance(a: str, b: str) -> float:
+    return edit_distance(a, b) / max(len(a), len(b), 1)
+
+
+def crop_formulas(dataset: PymuDocDataset, model_list: list) -> list:
+    mf_image_list = []
+    for page_model in model_list:
+        page_info = page_model['page_info']
+        img = dataset.get_page(page_info['page_no']).get_image()['img']
+        pil_img = Image.fromarray(img)
+        # the polys are on the page image the model json is inferred on
+        scale_x, scale_y = pil_img.width / page_info['width'], pil_img.height / page_info['height']
+        for det in page_model['layout_dets']:
+            if det['category_id'] not in (13, 14):
+                continue
+            xmin, ymin, xmax, ymax = det['poly'][0], det['poly'][1], det['poly'][4], det['poly'][5]
+            mf_image_list.append(pil_img.crop(
+                (int(xmin * scale_x), int(ymin * scale_y), int(xmax * scale_x), int(ymax * scale_y))
+            ))
+    return mf_image_list
+
+
+def run(model: UnimernetModel, mf_image_list: list, batch_size: int) -> tuple[list, float, int]:
+    # the first batch warms up the model
+    model.recognize(mf_image_list[:batch_size], batch_size, dedupe=False)
+    start = time.time()
+    raw_list = model.recognize(mf_image_list, batch_size, dedupe=False)
+    latency = (time.time() - start) / max(len(mf_image_list), 1)
+    # bos 和 eos 之外最多 max_seq_len - 2 个 token
+    capped = sum(len(raw.split()) >= model.model.max_seq_len - 2 for raw in raw_list)
+    return [latex_rm_whitespace(raw) for raw in raw_list], latency, capped
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('pdf')
+    parser.add_argument('model_json', help='the model json of the pdf, the formulas are cropped by its detections')
+    parser.add_argument('--weight-dir', required=True, help='the directory of the UniMERNet weights')
+    parser.add_argument('--formulas', type=int, default=256, help='the number of formulas to recognize')
+    parser.add_argument('--batch-size', type=int, default=16)
+    args = parser.parse_args()
+
+    with open(args.pdf, 'rb') as f:
+        ds = PymuDocDataset(f.read())
+    with open(args.model_json, 'r', encoding='utf-8') as f:
+        mf_image_list = crop_formulas(ds, json.load(f))[:args.formulas]
+
+    baseline, baseline_latency, baseline_capped = run(
+        UnimernetModel(args.weight_dir, CFG_PATH, 'cpu'), mf_image_list, args.batch_size
+    )
+    int8_res, int8_latency, int8_capped = run(
+        UnimernetModel(args.weight_dir, CFG_PATH, 'cpu', cpu_int8=True), mf_image_list, args.batch_size
+    )
+    distances = [normalized_edit_distance(a, b) for a, b in zip(baseline, int8_res)]
+    exact = sum(a == b for a, b in zip(baseline, int8_res)) / max(len(baseline), 1)
+    print('mode\tformulas\tms/formula\tspeedup\tcapped\texact\tmean_ned')
+    print(f'fp32\t{len(mf_image_list)}\t{round(baseline_latency * 1000, 1)}\t1.0\t{baseline_capped}\t-\t-')
+    print(
+        f'int8\t{len(mf_image_list)}\t{round(int8_latency * 1000, 1)}\t{round(baseline_latency / max(int8_latency, 1e-9), 2)}'
+        f'\t{int8_capped}\t{exact:.1%}\t{round(sum(distances) / max(len(distances), 1), 4)}'
+    )
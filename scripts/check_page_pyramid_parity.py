@@ -0,0 +1,71 @@
+# Copyright (c) Opendatalab. All rights reserved.
+"""Compare the layout_dets of batch doc_analyze with and without the page
+pyramid.
+
+With the page pyramid, layout and formula detection read a page rendered
+natively at their input size instead of a resize of the 200 dpi render, so
+their detections can move slightly. The detections of every page are matched
+to the ones without the pyramid of the same category by IoU, exact means the
+same category and the same poly.
+
+    python scripts/check_page_pyramid_parity.py demo/demo1.pdf --pages 32
+"""
+import argparse
+from collections import Counter
+
+from magic_pdf.data.dataset import PymuDocDataset
+from magic_pdf.libs.boxbase import calculate_iou
+from magic_pdf.model.doc_analyze_by_custom_model import doc_analyze
+
+
+def poly_to_bbox(poly):
+    return [poly[0], poly[1], poly[4], poly[5]]
+
+
+def compare(baseline: list, candidate: list, iou_threshold: float) -> dict:
+    stats = {}
+    for base_res, cand_res in zip(baseline, candidate):
+        unmatched = list(cand_res)
+        for base_det in base_res:
+            category_stats = stats.setdefault(base_det['category_id'], Counter())
+            category_stats['baseline'] += 1
+            best, best_iou = None, iou_threshold
+            for cand_det in unmatched:
+                if cand_det['category_id'] != base_det['category_id']:
+                    continue
+                iou = calculate_iou(poly_to_bbox(base_det['poly']), poly_to_bbox(cand_det['poly']))
+                if iou >= best_iou:
+                    best, best_iou = cand_det, iou
+            if best is None:
+                continue
+            unmatched.remove(best)
+            category_stats['matched'] += 1
+            category_stats['exact'] += int(best['poly'] == base_det['poly'])
+        for cand_det in unmatched:
+            stats.setdefault(cand_det['category_id'], Counter())['extra'] += 1
+    return stats
+
+
+def run(ds: PymuDocDataset, ocr: bool, page_pyramid: bool) -> list:
+    infer_result = ds.apply(doc_analyze, ocr=ocr, page_pyramid=page_pyramid, use_page_cache=False)
+    return [page['layout_dets'] for page in infer_result.get_infer_res()]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('pdf')
+    parser.add_argument('--pages', type=int, default=32, help='the number of pages to analyze')
+    parser.add_argument('--ocr', action='store_true')
+    parser.add_argument('--iou', type=float, default=0.5, help='the IoU a detection is matched at')
+    args = parser.parse_args()
+
+    with open(args.pdf, 'rb') as f:
+        ds = PymuDocDataset(f.read()).select_pages(0, args.pages - 1)
+
+    stats = compare(run(ds, args.ocr, False), run(ds, args.ocr, True), args.iou)
+    print('category\tbaseline\trecall\texact\textra')
+    for category_id, category_stats in sorted(stats.items()):
+        baseline = category_stats['baseline']
+        recall = round(category_stats['matched'] / baseline, 4) if baseline else '-'
+        exact = round(category_stats['exact'] / baseline, 4) if baseline else '-'
+        print(f'{category_id}\t{baseline}\t{recall}\t{exact}\t{category_stats["extra"]}')
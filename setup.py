@@ -49,6 +49,7 @@ if __name__ == '__main__':
                      "einops",  # struct-eqtable依赖
                      "accelerate",  # struct-eqtable依赖
                      "doclayout_yolo==0.0.2b1",  # doclayout_yolo
+                     "onnx",  # doclayout_yolo导出onnx
                      "rapidocr-paddle",  # rapidocr-paddle
                      "rapidocr_onnxruntime",
                      "rapid_table>=1.0.3,<2.0.0",  # rapid_table
@@ -16,7 +16,9 @@ def test_filebased_reader_writer():
     writer = FileBasedDataWriter(sub_dir)
     reader = FileBasedDataReader(sub_dir)
 
+    assert not writer.exists('test.txt')
     writer.write('test.txt', b'hello world')
+    assert writer.exists('test.txt')
     assert reader.read('test.txt') == b'hello world'
 
     writer.write(abs_fn, b'hello world')
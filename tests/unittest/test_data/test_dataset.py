@@ -1,3 +1,4 @@
+import pytest
 
 from magic_pdf.data.dataset import ImageDataset, PymuDocDataset
 
@@ -16,3 +17,101 @@ def test_imagedataset():
     datasets = ImageDataset(bits)
     assert len(datasets) == 1
     assert datasets.get_page(0).get_page_info().w > 100
+
+
+def test_pymudataset_image_cache():
+    with open('tests/unittest/test_data/assets/pdfs/test_01.pdf', 'rb') as f:
+        bits = f.read()
+    datasets = PymuDocDataset(bits)
+    page = datasets.get_page(0)
+    width, height = page.get_image_size()
+    img_dict = page.get_image()
+    assert (img_dict['width'], img_dict['height']) == (width, height)
+    assert img_dict['img'].shape == (height, width, 3)
+    assert page.get_image() is img_dict
+
+    page.draw_rect([0, 0, 10, 10], [1, 0, 0], None, 1, 0.5, True)
+    assert page.get_image() is not img_dict
+
+
+def test_page_image_cache_eviction():
+    import numpy as np
+
+    from magic_pdf.data.image_cache import PageImageCache
+
+    cache = PageImageCache(max_bytes=200)
+    for i in range(3):
+        cache.put(i, {'img': np.zeros(100, dtype=np.uint8), 'width': 100, 'height': 1})
+    assert len(cache) == 2 and 0 not in cache
+    cache.get(1)
+    cache.put(3, {'img': np.zeros(100, dtype=np.uint8), 'width': 100, 'height': 1})
+    assert 1 in cache and 2 not in cache
+    assert cache.nbytes == 200
+
+    cache.put(4, {'img': np.zeros(300, dtype=np.uint8), 'width': 300, 'height': 1})
+    assert 4 not in cache
+
+
+def test_pymudataset_page_infos():
+    with open('tests/unittest/test_data/assets/pdfs/test_01.pdf', 'rb') as f:
+        bits = f.read()
+    datasets = PymuDocDataset(bits)
+    page_infos = datasets.get_page_infos()
+    assert len(page_infos) == len(datasets)
+    assert page_infos is datasets.get_page_infos()
+    page = datasets.get_page(0).get_doc()
+    assert (page_infos[0].w, page_infos[0].h) == (page.rect.width, page.rect.height)
+    assert page_infos[0].rotation == page.rotation
+    assert page_infos[0].mediabox == list(page.mediabox)
+
+
+def test_pymudataset_select_pages():
+    import fitz
+
+    with open('tests/unittest/test_model/assets/test_02.pdf', 'rb') as f:
+        bits = f.read()
+    datasets = PymuDocDataset(bits)
+    view = datasets.select_pages(2, 4)
+    assert len(view) == 3
+    assert view.get_page(0) is datasets.get_page(2)
+    assert [page.get_doc().number for page in view] == [2, 3, 4]
+    assert view.data_bits() is not bits
+    assert len(fitz.open('pdf', view.data_bits())) == 3
+    assert datasets.select_pages().data_bits() is bits
+
+    clone = view.clone()
+    assert len(clone) == 3 and clone.get_page(0) is not view.get_page(0)
+    assert clone.get_page_infos() == view.get_page_infos()
+
+
+def test_pymudataset_from_file():
+    from magic_pdf.libs.hash_utils import compute_md5
+
+    fn = 'tests/unittest/test_model/assets/test_02.pdf'
+    with open(fn, 'rb') as f:
+        bits = f.read()
+    with PymuDocDataset.from_file(fn) as datasets:
+        assert datasets.data_md5() == compute_md5(bits)
+        assert datasets.data_bits() == bits and isinstance(datasets.data_bits(), bytes)
+        assert len(datasets) == len(PymuDocDataset(bits))
+        assert datasets.get_page_infos() == PymuDocDataset(bits).get_page_infos()
+        assert datasets.select_pages(1, 2).data_bits()[:4] == b'%PDF'
+        clone = datasets.clone()
+        assert len(clone) == len(datasets)
+        # the serialized bits of a view differ from run to run, its md5 does not
+        assert datasets.select_pages(1, 2).data_md5() == PymuDocDataset(bits).select_pages(1, 2).data_md5()
+        assert datasets.select_pages(1, 2).data_md5() != datasets.select_pages(1, 3).data_md5()
+    assert datasets._mapped is None
+    # the clone maps the file again and outlives the closed source
+    with clone:
+        assert clone.data_md5() == compute_md5(bits)
+        assert clone.data_bits() == bits
+
+
+def test_pymudataset_from_empty_file(tmp_path):
+    import fitz
+
+    fn = tmp_path / 'empty.pdf'
+    fn.write_bytes(b'')
+    with pytest.raises(fitz.EmptyFileError):
+        PymuDocDataset.from_file(str(fn))
@@ -0,0 +1,43 @@
+import cv2
+import fitz
+import numpy as np
+
+from magic_pdf.data.dataset import PymuDocDataset
+from magic_pdf.data.pyramid import ImagePyramid, PagePyramid
+
+
+def test_page_pyramid():
+    with open('tests/unittest/test_data/assets/pdfs/test_01.pdf', 'rb') as f:
+        bits = f.read()
+    page = PymuDocDataset(bits).get_page(0)
+    page_pyramid = PagePyramid(page)
+    image_pyramid = ImagePyramid(page.get_image()['img'])
+    assert (page_pyramid.width, page_pyramid.height) == (image_pyramid.width, image_pyramid.height)
+
+    level, scale = page_pyramid.get_level(640)
+    assert max(level.shape[:2]) <= 640
+    assert abs(level.shape[1] / page_pyramid.width - scale) < 0.01
+    assert page_pyramid.get_level(640)[0] is level
+    assert image_pyramid.get_level(640)[1] == 1.0
+
+    # the native render is close to a resize of the full resolution image
+    resized = cv2.resize(image_pyramid.get_image(), (level.shape[1], level.shape[0]), interpolation=cv2.INTER_AREA)
+    assert np.abs(level.astype(int) - resized.astype(int)).mean() < 8
+
+    for bbox in ([100, 100, 300, 250], [-20, -10, 50, 60], [page_pyramid.width - 30, 0, page_pyramid.width + 30, 40]):
+        page_crop = page_pyramid.crop(bbox)
+        image_crop = image_pyramid.crop(bbox)
+        assert page_crop.shape == image_crop.shape == (bbox[3] - bbox[1], bbox[2] - bbox[0], 3)
+        assert np.abs(page_crop.astype(int) - image_crop.astype(int)).max() <= 16
+
+
+def test_page_pyramid_crop_on_rotated_page():
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 100), 'rotated page', fontsize=24)
+    page.set_rotation(90)
+    page = PymuDocDataset(doc.tobytes()).get_page(0)
+    page_pyramid = PagePyramid(page)
+    image_pyramid = ImagePyramid(page.get_image()['img'])
+    for bbox in ([100, 100, 300, 250], [-20, -10, 50, 60]):
+        assert np.array_equal(page_pyramid.crop(bbox), image_pyramid.crop(bbox))
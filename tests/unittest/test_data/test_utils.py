@@ -0,0 +1,27 @@
+import numpy as np
+
+from magic_pdf.data.utils import (fitz_doc_to_image_size, iter_images_from_pdf,
+                                  load_images_from_pdf)
+
+
+def test_load_images_from_pdf_parallel():
+    with open('tests/unittest/test_data/assets/pdfs/test_02.pdf', 'rb') as f:
+        bits = f.read()
+    images = load_images_from_pdf(bits, dpi=72)
+    parallel_images = load_images_from_pdf(bits, dpi=72, num_workers=2)
+    assert len(images) == len(parallel_images)
+    for img_dict, parallel_img_dict in zip(images, parallel_images):
+        assert np.array_equal(img_dict['img'], parallel_img_dict['img'])
+
+
+def test_iter_images_from_pdf():
+    import fitz
+
+    with open('tests/unittest/test_model/assets/test_02.pdf', 'rb') as f:
+        bits = f.read()
+    doc = fitz.open('pdf', bits)
+    page_ids = list(range(len(doc)))[::-1]
+    windows = list(iter_images_from_pdf(bits, page_ids, dpi=72, window_size=2, num_workers=2))
+    assert [len(window) for window in windows] == [len(page_ids[i: i + 2]) for i in range(0, len(page_ids), 2)]
+    for page_id, img_dict in zip(page_ids, sum(windows, [])):
+        assert (img_dict['width'], img_dict['height']) == fitz_doc_to_image_size(doc[page_id], dpi=72)
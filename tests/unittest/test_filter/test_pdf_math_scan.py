@@ -0,0 +1,48 @@
+import fitz
+
+from magic_pdf.filter.pdf_math_scan import page_may_contain_math
+
+PROSE = 'This agreement is made between the parties named below and governs the terms. '
+
+
+def new_page(text: str, fontname: str = 'helv') -> fitz.Page:
+    doc = fitz.open()
+    page = doc.new_page()
+    if text:
+        page.insert_textbox(fitz.Rect(50, 50, 550, 800), text, fontsize=8, fontname=fontname)
+    return page
+
+
+def test_prose_page_has_no_math():
+    assert not page_may_contain_math(new_page(PROSE * 3))
+
+
+def test_operators_mark_math():
+    assert page_may_contain_math(new_page(PROSE + 'where a = b + c and x^2 > y. ' + PROSE))
+
+
+def test_math_codepoints_mark_math():
+    assert page_may_contain_math(new_page(PROSE + 'for all α ∈ β we have ∑ of the terms. ', fontname='china-s'))
+
+
+def test_empty_page_may_contain_math():
+    assert page_may_contain_math(new_page(''))
+
+
+def test_plain_font_equation_in_long_prose_marks_math():
+    # 约2000个字符中唯一的公式，运算符密度低于 MIN_OPERATOR_DENSITY
+    assert page_may_contain_math(new_page(PROSE * 12 + 'so that E = mc2 holds. ' + PROSE * 12))
+
+
+def test_vector_and_image_equations_are_missed():
+    # 矢量路径或图片形式的公式在文本层中没有痕迹，所以页面过滤默认关闭
+    page = new_page(PROSE * 12)
+    shape = page.new_shape()
+    shape.draw_line((100, 700), (200, 700))
+    shape.draw_bezier((100, 650), (120, 600), (180, 700), (200, 650))
+    shape.finish()
+    shape.commit()
+    pix = fitz.Pixmap(fitz.csGRAY, fitz.IRect(0, 0, 40, 20), False)
+    pix.clear_with(0)
+    page.insert_image(fitz.Rect(300, 650, 400, 700), pixmap=pix)
+    assert not page_may_contain_math(page)
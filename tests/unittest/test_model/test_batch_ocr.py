@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('torch')
+pytest.importorskip('paddleocr')
+
+from magic_pdf.model.sub_modules.ocr.paddleocr.ppocr_273_mod import \
+    ModifiedPaddleOCR  # noqa: E402
+
+
+def new_ocr_model(lines_per_image: list) -> ModifiedPaddleOCR:
+    # 检测和识别都用桩代替，只验证批量识别结果如何分回每张图片
+    ocr_model = ModifiedPaddleOCR.__new__(ModifiedPaddleOCR)
+    ocr_model.drop_score = 0.5
+    detections = iter(lines_per_image)
+    rec_calls = []
+
+    def det_and_crop(img, mfd_res=None):
+        lines = next(detections)
+        if lines is None:
+            return None, []
+        dt_boxes = [np.array([[0, index], [10, index], [10, index + 1], [0, index + 1]]) for index in range(len(lines))]
+        return dt_boxes, list(lines)
+
+    def rec_crops(img_crop_list, cls=True, rec_batch_num=None):
+        rec_calls.append(len(img_crop_list))
+        return [(text, 0.1 if text.startswith('low') else 0.9) for text in img_crop_list]
+
+    ocr_model._det_and_crop = det_and_crop
+    ocr_model._rec_crops = rec_crops
+    ocr_model.rec_calls = rec_calls
+    return ocr_model
+
+
+def test_batch_ocr_scatters_lines_back_to_images():
+    ocr_model = new_ocr_model([['a0', 'a1'], None, ['low c0'], ['d0', 'low d1', 'd2']])
+    imgs = [np.full((20, 20, 3), 255, dtype=np.uint8) for _ in range(4)]
+    ocr_res = ocr_model.batch_ocr(imgs, mfd_res_list=[[], [], [], []])
+
+    # 所有图片的文本行一起识别一次
+    assert ocr_model.rec_calls == [6]
+    assert [[text for _, (text, _) in res] if res else res for res in ocr_res] == [
+        ['a0', 'a1'], None, None, ['d0', 'd2'],
+    ]
+    assert ocr_res[3][1][0] == [[0, 2], [10, 2], [10, 3], [0, 3]]
+
+
+def test_batch_ocr_without_images():
+    assert new_ocr_model([]).batch_ocr([]) == []
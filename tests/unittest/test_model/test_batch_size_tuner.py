@@ -0,0 +1,37 @@
+import json
+import time
+
+from magic_pdf.model.batch_size_tuner import BatchSizeTuner
+
+
+def fake_model(max_batch_size):
+    def run(batch):
+        if len(batch) > max_batch_size:
+            raise RuntimeError('CUDA out of memory. Tried to allocate 2.00 GiB')
+        # a fixed overhead per call makes larger batches faster per item
+        time.sleep(0.005 + 0.0001 * len(batch))
+        return batch
+    return run
+
+
+def test_tune_stops_at_out_of_memory_and_persists(tmp_path):
+    cache_path = str(tmp_path / 'batch_size.json')
+    tuner = BatchSizeTuner('cuda-test', cache_path=cache_path, max_batch_size=64)
+    assert tuner.tune('layout', fake_model(8), sample=0) == 8
+
+    with open(cache_path) as f:
+        assert json.load(f) == {'cuda-test': {'layout': 8}}
+    # the cached value is reused without calibration
+    assert BatchSizeTuner('cuda-test', cache_path=cache_path).tune('layout', None, sample=0) == 8
+    assert BatchSizeTuner('cpu-4threads', cache_path=cache_path).get('layout') is None
+
+
+def test_run_with_backoff(tmp_path):
+    tuner = BatchSizeTuner('cuda-test', cache_path=str(tmp_path / 'batch_size.json'))
+    items = list(range(10))
+
+    def run(batch_size):
+        return [fake_model(3)(items[i: i + batch_size]) for i in range(0, len(items), batch_size)]
+
+    assert len(tuner.run_with_backoff('mfr', run, 16)) == 5
+    assert tuner.get('mfr') == 2
@@ -0,0 +1,65 @@
+import fitz
+
+from magic_pdf.data.data_reader_writer import FileBasedDataReader, FileBasedDataWriter
+from magic_pdf.data.dataset import PymuDocDataset
+from magic_pdf.model.checkpoint import DocAnalyzeCheckpoint, get_checkpoint_key
+
+
+def new_checkpoint(tmp_path, interval=2):
+    return DocAnalyzeCheckpoint(
+        FileBasedDataWriter(str(tmp_path)), FileBasedDataReader(str(tmp_path)), 'doc_checkpoint', interval
+    )
+
+
+def layout_dets(index):
+    return [{'category_id': 1, 'poly': [index, 0, 10, 0, 10, 10, index, 10], 'score': 0.9}]
+
+
+def test_resume_from_flushed_pages(tmp_path):
+    checkpoint = new_checkpoint(tmp_path)
+    assert checkpoint.load('key') == {}
+    for index in range(3):
+        checkpoint.add(index, layout_dets(index))
+    # 第三页还没有写入，中断后只有前两页可以恢复
+    assert new_checkpoint(tmp_path).load('key') == {0: layout_dets(0), 1: layout_dets(1)}
+
+    checkpoint.flush()
+    resumed = new_checkpoint(tmp_path)
+    assert resumed.load('key') == {index: layout_dets(index) for index in range(3)}
+    resumed.add(3, layout_dets(3))
+    resumed.flush()
+    assert new_checkpoint(tmp_path).load('key') == {index: layout_dets(index) for index in range(4)}
+
+
+def test_start_over_with_another_key(tmp_path):
+    checkpoint = new_checkpoint(tmp_path)
+    checkpoint.load('key')
+    checkpoint.add(0, layout_dets(0))
+    checkpoint.flush()
+
+    restarted = new_checkpoint(tmp_path)
+    assert restarted.load('another key') == {}
+    restarted.add(5, layout_dets(5))
+    restarted.flush()
+    assert new_checkpoint(tmp_path).load('key') == {}
+    assert new_checkpoint(tmp_path).load('another key') == {5: layout_dets(5)}
+
+
+def test_resume_ranged_dataset(tmp_path):
+    doc = fitz.open()
+    for index in range(4):
+        doc.new_page().insert_text((72, 100), f'page {index}')
+    pdf_bytes = doc.tobytes()
+
+    def ranged_key(start_page_id, end_page_id):
+        # 每次运行重新打开文档，页面范围视图的序列化结果每次都不同
+        dataset = PymuDocDataset(pdf_bytes).select_pages(start_page_id, end_page_id)
+        return get_checkpoint_key(dataset, 'models', [True, True], [None, None])
+
+    checkpoint = new_checkpoint(tmp_path)
+    checkpoint.load(ranged_key(1, 2))
+    checkpoint.add(0, layout_dets(0))
+    checkpoint.flush()
+
+    assert new_checkpoint(tmp_path).load(ranged_key(1, 2)) == {0: layout_dets(0)}
+    assert new_checkpoint(tmp_path).load(ranged_key(2, 3)) == {}
@@ -0,0 +1,83 @@
+import json
+
+import fitz
+import pytest
+
+pytest.importorskip('torch')
+pytest.importorskip('paddle')
+
+from magic_pdf.data.dataset import PymuDocDataset  # noqa: E402
+from magic_pdf.libs import config_reader  # noqa: E402
+from magic_pdf.model import doc_analyze_by_custom_model as doc_analyze_module  # noqa: E402
+
+
+def new_dataset(texts: list) -> PymuDocDataset:
+    doc = fitz.open()
+    for index, text in enumerate(texts):
+        # 页面大小不同，page_info可以区分页面
+        doc.new_page(width=300 + 10 * len(text), height=400 + index).insert_text((20, 50), text)
+    return PymuDocDataset(doc.tobytes())
+
+
+class StubBatchModel:
+    table_time_budget = 0
+
+    def __init__(self):
+        self.windows = []
+
+    def __call__(self, images, table_budget=None, formula_flags=None, text_lines=None):
+        self.windows.append(len(images))
+        return [[{'category_id': 1, 'shape': list(img.shape[:2])}] for img in images]
+
+
+@pytest.fixture
+def batch_model(tmp_path, monkeypatch):
+    config_path = tmp_path / 'magic-pdf.json'
+    config_path.write_text(json.dumps({'device-mode': 'cpu', 'models-dir': str(tmp_path / 'models')}))
+    monkeypatch.setattr(config_reader, 'CONFIG_FILE_NAME', str(config_path))
+    monkeypatch.setenv('MINERU_PAGE_CACHE_PATH', str(tmp_path / 'page_cache.sqlite'))
+    stub = StubBatchModel()
+    monkeypatch.setattr(doc_analyze_module.ModelSingleton, 'get_model', lambda self, *args, **kwargs: object())
+    monkeypatch.setattr(doc_analyze_module, 'get_batch_model', lambda custom_model, device: stub)
+    return stub
+
+
+def analyze(datasets, use_page_cache=False):
+    return doc_analyze_module.doc_analyze_many(
+        datasets,
+        window_size=2,
+        page_pyramid=False,
+        formula_page_filter=False,
+        text_layer_det=False,
+        use_page_cache=use_page_cache,
+    )
+
+
+def test_pages_of_the_datasets_share_windows(batch_model):
+    datasets = [new_dataset(['a', 'bb', 'ccc']), new_dataset(['dddd', 'eeeee'])]
+    infer_results = analyze(datasets)
+
+    # 5 pages of the 2 datasets in windows of 2
+    assert batch_model.windows == [2, 2, 1]
+    assert len(infer_results) == 2
+    for dataset, infer_result in zip(datasets, infer_results):
+        model_list = infer_result.get_infer_res()
+        assert [page['page_info']['page_no'] for page in model_list] == list(range(len(dataset)))
+        for index, page in enumerate(model_list):
+            width, height = dataset.get_page(index).get_image_size()
+            assert (page['page_info']['width'], page['page_info']['height']) == (width, height)
+            assert page['layout_dets'] == [{'category_id': 1, 'shape': [height, width]}]
+
+
+def test_page_cache_dedupes_pages_across_datasets(batch_model):
+    datasets = [new_dataset(['cover', 'body']), new_dataset(['cover']), new_dataset(['cover', 'tail'])]
+    infer_results = analyze(datasets, use_page_cache=True)
+
+    # the cover page is analyzed once for the three datasets
+    assert sum(batch_model.windows) == 3
+    covers = [infer_result.get_infer_res()[0]['layout_dets'] for infer_result in infer_results]
+    assert covers[0] == covers[1] == covers[2]
+
+    batch_model.windows.clear()
+    analyze(datasets, use_page_cache=True)
+    assert batch_model.windows == []
@@ -0,0 +1,32 @@
+from magic_pdf.libs.hash_utils import compute_md5
+from magic_pdf.model.sub_modules.layout.doclayout_yolo.onnx_backend import \
+    _hash_calibration_dir, export_onnx
+
+
+def test_export_onnx_uses_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv('MINERU_ONNX_CACHE_DIR', str(tmp_path / 'onnx'))
+    weight = tmp_path / 'layout.pt'
+    weight.write_bytes(b'weights')
+    # the exported model is keyed by the content of the weights, a cached one is not exported again
+    cached = tmp_path / 'onnx' / f"layout-{compute_md5(b'weights')[:16].lower()}" / 'layout-64-int8-dynamic.onnx'
+    cached.parent.mkdir(parents=True)
+    cached.write_bytes(b'onnx')
+    assert export_onnx(str(weight), 64, quantize='dynamic') == str(cached)
+
+
+def test_static_cache_is_keyed_by_calibration_images(tmp_path, monkeypatch):
+    monkeypatch.setenv('MINERU_ONNX_CACHE_DIR', str(tmp_path / 'onnx'))
+    weight = tmp_path / 'layout.pt'
+    weight.write_bytes(b'weights')
+    calibration_dir = tmp_path / 'calibration'
+    calibration_dir.mkdir()
+    (calibration_dir / 'page_0.png').write_bytes(b'page 0')
+    cache_dir = tmp_path / 'onnx' / f"layout-{compute_md5(b'weights')[:16].lower()}"
+    cache_dir.mkdir(parents=True)
+    cached = cache_dir / f'layout-64-int8-static-{_hash_calibration_dir(str(calibration_dir))}.onnx'
+    cached.write_bytes(b'onnx')
+    assert export_onnx(str(weight), 64, quantize='static', calibration_dir=str(calibration_dir)) == str(cached)
+
+    # 校准图片变化后不使用旧的量化模型
+    (calibration_dir / 'page_0.png').write_bytes(b'page 0 edited')
+    assert _hash_calibration_dir(str(calibration_dir)) not in cached.name
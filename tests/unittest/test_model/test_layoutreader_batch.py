@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+torch = pytest.importorskip('torch')
+transformers = pytest.importorskip('transformers')
+
+from magic_pdf.config.ocr_content_type import BlockType  # noqa: E402
+from magic_pdf.model.sub_modules.reading_oreder.layoutreader.helpers import (  # noqa: E402
+    MAX_LEN, batch_boxes2inputs)
+from magic_pdf.pdf_parse_union_core_v2 import (  # noqa: E402
+    LAYOUTREADER_MAX_LINES, ModelSingleton, do_predict,
+    predict_reading_orders, prepare_lines_for_model)
+
+
+@pytest.fixture(scope='module')
+def tiny_layoutreader():
+    # 随机初始化的小模型，只比较batch和逐页的结果是否一致
+    torch.manual_seed(0)
+    config = transformers.LayoutLMv3Config(
+        vocab_size=8,
+        hidden_size=48,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=64,
+        coordinate_size=8,
+        shape_size=8,
+        num_labels=MAX_LEN,
+        visual_embed=False,
+    )
+    return transformers.LayoutLMv3ForTokenClassification(config).eval()
+
+
+@pytest.fixture
+def forward_calls(monkeypatch, tiny_layoutreader):
+    calls = []
+    handle = tiny_layoutreader.register_forward_hook(lambda module, args, output: calls.append(1))
+    monkeypatch.setattr(ModelSingleton, 'get_model', lambda self, model_name: tiny_layoutreader)
+    yield calls
+    handle.remove()
+
+
+def random_boxes(line_count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    boxes = []
+    for _ in range(line_count):
+        left, top = rng.randint(0, 900), rng.randint(0, 980)
+        boxes.append([left, top, left + rng.randint(20, 100), top + rng.randint(5, 20)])
+    return boxes
+
+
+def test_batch_inputs_mask_the_padding():
+    inputs = batch_boxes2inputs([random_boxes(2, 0), random_boxes(4, 1)])
+    assert inputs['bbox'].shape == (2, 6, 4)
+    assert inputs['attention_mask'].tolist() == [[1, 1, 1, 1, 0, 0], [1, 1, 1, 1, 1, 1]]
+
+
+def test_padded_batch_matches_per_page_predict(tiny_layoutreader, forward_calls):
+    boxes_list = [random_boxes(line_count, seed) for seed, line_count in enumerate([3, 12, 1, 7])]
+    with torch.no_grad():
+        expected = [do_predict(boxes, tiny_layoutreader) for boxes in boxes_list]
+    assert predict_reading_orders(boxes_list, batch_size=16) == expected
+    assert predict_reading_orders(boxes_list, batch_size=3) == expected
+
+
+def test_empty_and_xycut_pages_skip_the_model(forward_calls):
+    line_height = 10
+    blocks = [
+        {'type': BlockType.Text, 'bbox': [50, index * 3, 550, index * 3 + 2], 'lines': [
+            {'bbox': [50, index * 3, 550, index * 3 + 2], 'spans': []}
+        ]}
+        for index in range(LAYOUTREADER_MAX_LINES + 1)
+    ]
+    page_line_list, boxes = prepare_lines_for_model(blocks, 600, 800, line_height)
+    assert len(page_line_list) == LAYOUTREADER_MAX_LINES + 1
+    assert boxes is None
+
+    assert predict_reading_orders([[], None]) == [[], None]
+    assert forward_calls == []
+
+
+def test_repeated_box_sets_hit_the_memo(tiny_layoutreader, forward_calls):
+    template, other = random_boxes(5, 10), random_boxes(8, 11)
+    memo = {}
+    orders = predict_reading_orders([template, other, template], memo=memo, batch_size=16)
+    assert orders[0] == orders[2]
+    assert len(forward_calls) == 1
+
+    # 同一文档后面的页面直接使用memo
+    assert predict_reading_orders([other, template], memo=memo) == [orders[1], orders[0]]
+    assert len(forward_calls) == 1
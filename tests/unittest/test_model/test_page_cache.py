@@ -0,0 +1,77 @@
+import fitz
+
+from magic_pdf.model.page_cache import (PageCache, compute_page_hash,
+                                        compute_page_key)
+
+
+def new_doc(text: str) -> fitz.Document:
+    doc = fitz.open()
+    # a blank page first, so the object numbers of the text page differ from a one page document
+    doc.new_page()
+    page = doc.new_page()
+    page.insert_text((72, 100), text, fontsize=10)
+    return doc
+
+
+def test_page_hash_is_content_addressed():
+    page_hash = compute_page_hash(new_doc('Cover sheet')[1])
+    single = fitz.open()
+    single.new_page().insert_text((72, 100), 'Cover sheet', fontsize=10)
+    assert compute_page_hash(single[0]) == page_hash
+    assert compute_page_hash(new_doc('Cover sheet.')[1]) != page_hash
+
+
+def test_page_hash_tells_small_edits_and_render_dpi_apart():
+    page = new_doc('The rate is 0.5% per annum, see clause 12.')[1]
+    page_hash = compute_page_hash(page)
+    # a glyph-sized edit in small text
+    assert compute_page_hash(new_doc('The rate is 0.6% per annum, see clause 12.')[1]) != page_hash
+    assert compute_page_hash(page, dpi=144) != page_hash
+    page.set_rotation(90)
+    assert compute_page_hash(page) != page_hash
+
+
+def test_page_hash_covers_the_images():
+    hashes = []
+    for value in (0, 1):
+        doc = fitz.open()
+        pix = fitz.Pixmap(fitz.csGRAY, fitz.IRect(0, 0, 16, 16), False)
+        pix.clear_with(value)
+        doc.new_page().insert_image(fitz.Rect(72, 72, 144, 144), pixmap=pix)
+        hashes.append(compute_page_hash(doc[0]))
+    assert hashes[0] != hashes[1]
+
+
+def test_page_key_depends_on_fingerprint_and_hints():
+    key = compute_page_key('page', 'models', [True, None])
+    assert key == compute_page_key('page', 'models', [True, None])
+    assert key != compute_page_key('page', 'other models', [True, None])
+    assert key != compute_page_key('page', 'models', [False, None])
+
+
+def test_page_cache_round_trip_and_stats(tmp_path):
+    cache = PageCache(str(tmp_path / 'cache.sqlite'), max_bytes=1024 * 1024)
+    layout_dets = [{'category_id': 1, 'poly': [0, 0, 10, 0, 10, 10, 0, 10], 'score': 0.9}]
+    cache.put('a', layout_dets)
+    assert cache.get_many(['a', 'b', 'a']) == {'a': layout_dets}
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['pages']) == (1, 1, 1)
+    # 覆盖写入同一页面，累计的大小不重复计算
+    cache.put('a', layout_dets * 2)
+    assert cache._size == cache.size() > stats['bytes']
+    assert cache.stats()['pages'] == 1
+    cache.close()
+
+
+def test_page_cache_evicts_least_recently_used(tmp_path):
+    cache = PageCache(str(tmp_path / 'cache.sqlite'), max_bytes=1024 * 1024)
+    layout_dets = [{'category_id': 15, 'poly': [index] * 8, 'text': str(index) * 100} for index in range(20)]
+    cache.put('old', layout_dets)
+    cache.put('new', layout_dets)
+    cache.get_many(['old'])
+    # room for two and a half results
+    cache.max_bytes = cache.size() * 5 // 4
+    cache.put('newest', layout_dets)
+    assert set(cache.get_many(['old', 'new', 'newest'])) == {'old', 'newest'}
+    assert cache.stats()['evictions'] == 1
+    cache.close()
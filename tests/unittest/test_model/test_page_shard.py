@@ -0,0 +1,46 @@
+import pytest
+
+from magic_pdf.data.dataset import PymuDocDataset
+from magic_pdf.model import page_shard
+
+
+def test_shard_round_trip_through_shared_memory(monkeypatch):
+    with open('tests/unittest/test_model/assets/test_02.pdf', 'rb') as f:
+        ds = PymuDocDataset(f.read())
+    monkeypatch.setattr(page_shard, '_worker_batch_model', None)
+    monkeypatch.setattr(page_shard, '_worker_model', lambda img: [{'shape': img.shape, 'mean': float(img.mean())}])
+
+    page_ids = [1, 2, 5]
+    shm, shapes = page_shard._put_shard(ds, page_ids)
+    try:
+        result = page_shard._analyze_shard(shm.name, shapes)
+    finally:
+        shm.close()
+        shm.unlink()
+
+    for page_id, layout_dets in zip(page_ids, result):
+        img = ds.get_page(page_id).get_image()['img']
+        assert layout_dets == [{'shape': img.shape, 'mean': float(img.mean())}]
+
+
+def test_workers_take_the_model_mode_of_the_caller(monkeypatch):
+    import magic_pdf.model as model_config
+
+    class PoolCreated(Exception):
+        pass
+
+    pool_kwargs = {}
+
+    def new_pool(**kwargs):
+        pool_kwargs.update(kwargs)
+        raise PoolCreated
+
+    monkeypatch.setattr(model_config, '__model_mode__', 'lite')
+    monkeypatch.setattr(model_config, '__use_inside_model__', False)
+    monkeypatch.setattr(page_shard, 'ProcessPoolExecutor', new_pool)
+    with open('tests/unittest/test_model/assets/test_02.pdf', 'rb') as f:
+        ds = PymuDocDataset(f.read())
+    with pytest.raises(PoolCreated):
+        page_shard.analyze_pages_sharded(ds, [0, 1], 2, {'ocr': False})
+    assert pool_kwargs['initargs'][2:4] == ('lite', False)
+
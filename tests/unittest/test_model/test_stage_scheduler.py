@@ -0,0 +1,47 @@
+import threading
+import time
+
+import pytest
+
+from magic_pdf.model.stage_scheduler import PipelineStage, StagePipeline
+
+
+def test_stage_pipeline_keeps_order_and_overlaps_stages():
+    active = set()
+    overlapped = threading.Event()
+    lock = threading.Lock()
+
+    def make_stage(name, fn):
+        def run(item):
+            with lock:
+                active.add(name)
+                if len(active) > 1:
+                    overlapped.set()
+            time.sleep(0.01)
+            with lock:
+                active.discard(name)
+            return fn(item)
+        return run
+
+    pipeline = StagePipeline([
+        PipelineStage('add', make_stage('add', lambda x: x + 1)),
+        PipelineStage('double', make_stage('double', lambda x: x * 2), workers=3),
+    ])
+    assert pipeline.run(list(range(20))) == [(x + 1) * 2 for x in range(20)]
+    assert overlapped.is_set()
+
+    report = pipeline.report()
+    assert report['add']['items'] == report['double']['items'] == 20
+    assert report['double']['workers'] == 3
+    assert 0 < report['add']['utilization'] <= 1
+
+
+def test_stage_pipeline_raises_stage_error():
+    def fail(x):
+        if x == 5:
+            raise ValueError('bad item')
+        return x
+
+    pipeline = StagePipeline([PipelineStage('fail', fail), PipelineStage('identity', lambda x: x)])
+    with pytest.raises(ValueError):
+        pipeline.run(list(range(50)))
@@ -0,0 +1,28 @@
+import fitz
+
+from magic_pdf.model.sub_modules.ocr.text_layer import (get_page_text_lines,
+                                                        get_region_text_lines)
+
+
+def new_page() -> fitz.Page:
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 100), 'First line of text', fontsize=10)
+    page.insert_text((72, 120), 'Second line', fontsize=10)
+    page.insert_text((300, 400), '   ', fontsize=10)
+    return page
+
+
+def test_page_text_lines_are_scaled_and_skip_blank_lines():
+    text_lines = get_page_text_lines(new_page(), 2.0)
+    assert len(text_lines) == 2
+    assert text_lines[0][0] == 144
+    assert text_lines[0][3] < text_lines[1][1]
+
+
+def test_region_text_lines_are_clipped_to_the_region():
+    text_lines = get_page_text_lines(new_page(), 2.0)
+    region_lines = get_region_text_lines([140, 180, 400, 230], text_lines)
+    assert len(region_lines) == 1
+    assert region_lines[0][1] == 180
+    assert get_region_text_lines([0, 600, 100, 700], text_lines) == []
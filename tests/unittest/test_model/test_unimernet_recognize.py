@@ -0,0 +1,62 @@
+import pytest
+
+torch = pytest.importorskip('torch')
+pytest.importorskip('unimernet')
+
+from PIL import Image  # noqa: E402
+
+from magic_pdf.model.sub_modules.mfr.unimernet.Unimernet import (  # noqa: E402
+    UnimernetModel, get_size_order)
+
+
+def formula_image(width: int, height: int, value: int) -> Image.Image:
+    return Image.new('RGB', (width, height), (value, value, value))
+
+
+def image_label(width, height, value) -> str:
+    return f'{int(width)}x{int(height)}:{int(value)}'
+
+
+class StubModel:
+    def __init__(self):
+        self.batches = []
+
+    def generate(self, samples):
+        # 每个公式的“识别结果”就是它的尺寸和像素值
+        images = samples['image']
+        self.batches.append(len(images))
+        return {'pred_str': [image_label(*row.tolist()) for row in images]}
+
+
+def new_model() -> UnimernetModel:
+    model = UnimernetModel.__new__(UnimernetModel)
+    model.device = 'cpu'
+    model.model = StubModel()
+    model.mfr_transform = lambda img: torch.tensor([img.width, img.height, img.getpixel((0, 0))[0]])
+    return model
+
+
+def test_size_order_buckets_by_aspect_ratio():
+    images = [
+        formula_image(400, 50, 0),  # wide display equation
+        formula_image(20, 20, 0),  # inline symbol
+        formula_image(40, 40, 0),
+        formula_image(200, 25, 0),
+    ]
+    order = get_size_order(images)
+    # the square crops are batched together, then the wide ones, each by area
+    assert order == [1, 2, 3, 0]
+
+
+def test_recognize_dedupes_and_keeps_input_order():
+    specs = [(400, 50, 10), (20, 20, 20), (400, 50, 10), (40, 40, 30), (20, 20, 20), (20, 20, 40)]
+    model = new_model()
+    res = model.recognize([formula_image(*spec) for spec in specs], batch_size=2)
+
+    assert res == [image_label(*spec) for spec in specs]
+    # 4 unique crops in batches of 2
+    assert model.model.batches == [2, 2]
+
+    model = new_model()
+    assert model.recognize([formula_image(*spec) for spec in specs], batch_size=4, dedupe=False) == res
+    assert sum(model.model.batches) == len(specs)
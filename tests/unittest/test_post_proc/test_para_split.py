@@ -0,0 +1,69 @@
+import copy
+
+import pytest
+
+from magic_pdf.config.constants import LINES_DELETED
+from magic_pdf.post_proc.para_split_v3 import para_split, para_split_stream
+
+
+def make_block(text, y0):
+    # 多于3行的block才会作为文本段落合并
+    lines = []
+    for index, content in enumerate([text, 'and some more words', 'and some more words', 'and the last words']):
+        line_bbox = [50, y0 + 12 * index, 550, y0 + 12 * index + 10]
+        lines.append({'bbox': line_bbox, 'spans': [{'bbox': line_bbox, 'type': 'text', 'content': content}]})
+    return {'type': 'text', 'bbox': [50, y0, 550, y0 + 46], 'lines': lines}
+
+
+def make_pages():
+    # 每页末尾的段落在下一页以小写字母继续
+    texts = [
+        ['Alpha starts here.', 'the first paragraph continues on the next'],
+        ['page and ends here.', 'Beta is a second paragraph that goes on'],
+        ['across the break and ends.', 'Gamma stands alone.'],
+        ['Delta stands alone too.'],
+    ]
+    return {
+        f'page_{page_id}': {
+            'preproc_blocks': [make_block(text, 100 + 60 * index) for index, text in enumerate(page_texts)],
+            'page_size': [600, 800],
+        }
+        for page_id, page_texts in enumerate(texts)
+    }
+
+
+def page_contents(pdf_info_dict):
+    return {
+        page_num: [
+            [span['content'] for line in block['lines'] for span in line['spans']]
+            for block in page['para_blocks']
+        ]
+        for page_num, page in pdf_info_dict.items()
+    }
+
+
+@pytest.mark.parametrize('lookahead', [1, 2, 10])
+def test_para_split_stream_matches_para_split(lookahead):
+    expected = make_pages()
+    para_split(expected)
+
+    pages = make_pages()
+    released = list(para_split_stream(pages.items(), lookahead=lookahead))
+    assert [page_num for page_num, _ in released] == list(pages)
+    assert page_contents(pages) == page_contents(expected)
+    assert page_contents(pages)['page_1'][0] == []
+    assert pages['page_1']['para_blocks'][0][LINES_DELETED]
+
+
+def test_para_split_stream_without_lookahead():
+    pages = make_pages()
+    origin_pages = copy.deepcopy(pages)
+    list(para_split_stream(pages.items(), lookahead=0))
+    # every page is split alone, no line is lost or duplicated
+    for page_num, page in pages.items():
+        assert sorted(sum(page_contents(pages)[page_num], [])) == sorted(
+            span['content']
+            for block in origin_pages[page_num]['preproc_blocks']
+            for line in block['lines']
+            for span in line['spans']
+        )
@@ -0,0 +1,37 @@
+import multiprocessing
+
+from magic_pdf.model.sub_modules.table.table_utils import (
+    SharedTableTimeBudget, TableTimeBudget, paddle_to_rapid_ocr_result)
+
+
+def test_table_time_budget():
+    budget = TableTimeBudget(10)
+    assert not budget.exhausted()
+    budget.consume(6)
+    assert not budget.exhausted()
+    budget.consume(6)
+    assert budget.exhausted()
+    budget.skip(3)
+    assert budget.skipped == 3
+
+    unlimited = TableTimeBudget(0)
+    unlimited.consume(1e6)
+    assert not unlimited.exhausted()
+
+
+def test_shared_table_time_budget():
+    used = multiprocessing.get_context('spawn').Value('d', 0.0)
+    # the budgets of two workers charge the same counter
+    worker_budgets = [SharedTableTimeBudget(10, used), SharedTableTimeBudget(10, used)]
+    worker_budgets[0].consume(6)
+    assert not worker_budgets[1].exhausted()
+    worker_budgets[1].consume(6)
+    assert worker_budgets[0].exhausted() and worker_budgets[1].exhausted()
+    assert used.value == 12
+
+
+def test_paddle_to_rapid_ocr_result():
+    box = [[0, 0], [10, 0], [10, 5], [0, 5]]
+    assert paddle_to_rapid_ocr_result([[box, ('cell', 0.9)]]) == [[box, 'cell', 0.9]]
+    assert paddle_to_rapid_ocr_result(None) is None
+    assert paddle_to_rapid_ocr_result([]) is None
@@ -1,7 +1,10 @@
 import os
 
+import fitz
+import numpy as np
 import pytest
 
+from magic_pdf.data.data_reader_writer import FileBasedDataWriter
 from magic_pdf.libs.boxbase import (__is_overlaps_y_exceeds_threshold,
                                     _is_bottom_full_overlap, _is_in,
                                     _is_in_or_part_overlap,
@@ -21,6 +24,7 @@ from magic_pdf.libs.boxbase import (__is_overlaps_y_exceeds_threshold,
 from magic_pdf.libs.commons import get_top_percent_list, join_path, mymax
 from magic_pdf.libs.config_reader import get_s3_config
 from magic_pdf.libs.path_utils import parse_s3path
+from magic_pdf.libs.pdf_image_tools import cut_images, cut_images_to_ndarray
 
 
 # 输入一个列表，如果列表空返回0，否则返回最大元素
@@ -527,6 +531,40 @@ def test_bbox_distance(box1: tuple, box2: tuple, target_num: float) -> None:
     assert target_num - bbox_distance(box1, box2) < 1
 
 
+# 一次渲染裁剪多个bbox，与逐个bbox渲染的结果一致
+@pytest.mark.parametrize('rotation', [0, 90])
+def test_cut_images_to_ndarray(rotation: int) -> None:
+    doc = fitz.open('tests/unittest/test_data/assets/pdfs/test_01.pdf')
+    page = doc[0]
+    page.set_rotation(rotation)
+    bboxes = [(50.3, 60.7, 200.2, 180.9), (300, 400, 500, 700.5), (10, 10, 40, 30)]
+    for bbox, img in zip(bboxes, cut_images_to_ndarray(bboxes, page)):
+        pix = page.get_pixmap(clip=fitz.Rect(*bbox), matrix=fitz.Matrix(3, 3))
+        assert img.shape == (pix.h, pix.w, 3)
+        assert np.array_equal(img, np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w, 3))
+
+
+# 内容相同的图片只写入一次，返回相同的路径
+def test_cut_images_dedupe(tmp_path) -> None:
+    class CountingWriter(FileBasedDataWriter):
+        writes = 0
+
+        def write(self, path: str, data: bytes) -> None:
+            self.writes += 1
+            super().write(path, data)
+
+    page = fitz.open('tests/unittest/test_data/assets/pdfs/test_01.pdf')[0]
+    bboxes = [(0, 0, 40, 40), (0, 0, 40, 40), (100, 100, 300, 250)]
+    writer = CountingWriter(str(tmp_path))
+    paths = cut_images(bboxes, page, writer)
+    assert paths[0] == paths[1] != paths[2]
+    assert writer.writes == 2
+    other_writer = CountingWriter(str(tmp_path))
+    assert cut_images(bboxes, page, other_writer) == paths
+    assert other_writer.writes == 0
+    assert sorted(os.listdir(tmp_path)) == sorted(set(paths))
+
+
 @pytest.mark.skip(reason='skip')
 # 根据bucket_name获取s3配置ak,sk,endpoint
 def test_get_s3_config() -> None: